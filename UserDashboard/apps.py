@@ -12,6 +12,6 @@ class UserDashboardConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'UserDashboard'
     
-   # def ready(self):
-        #import UserDashboard.signals    
+    def ready(self):
+        import UserDashboard.signals  # noqa: F401
     
@@ -0,0 +1,61 @@
+# carriers.py
+import threading
+import time
+import uuid
+from collections import namedtuple
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+CarrierResult = namedtuple('CarrierResult', ['ok', 'sid', 'error_code', 'error_message'])
+
+
+class CarrierError(Exception):
+    """Transient carrier failure; the message goes back on the queue"""
+    pass
+
+
+class BaseCarrierClient:
+    """Sends one outbound SMS to a carrier; subclasses implement send()"""
+
+    def send(self, message):
+        """Submit an SMSMessage and return a CarrierResult"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class FakeCarrierClient(BaseCarrierClient):
+    """
+    Offline carrier for development and tests. Accepts everything except
+    receivers listed in settings.FAKE_CARRIER_FAIL_NUMBERS, optionally
+    sleeping `latency` seconds per message, and records what it sent.
+    """
+
+    def __init__(self, latency=None, fail_numbers=None):
+        self.latency = latency if latency is not None else getattr(
+            settings, 'FAKE_CARRIER_LATENCY', 0
+        )
+        self.fail_numbers = set(fail_numbers if fail_numbers is not None else getattr(
+            settings, 'FAKE_CARRIER_FAIL_NUMBERS', []
+        ))
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send(self, message):
+        if self.latency:
+            time.sleep(self.latency)
+
+        if message.receiver in self.fail_numbers:
+            return CarrierResult(False, None, 21610, 'Attempt to send to unsubscribed recipient')
+
+        with self._lock:
+            self.sent.append(message.pk)
+        return CarrierResult(True, message.twilio_sid or f"SM{uuid.uuid4().hex.upper()}", None, None)
+
+
+def get_carrier_client():
+    """Instantiate the backend named by settings.SMS_CARRIER_BACKEND"""
+    backend = getattr(settings, 'SMS_CARRIER_BACKEND', 'UserDashboard.carriers.FakeCarrierClient')
+    return import_string(backend)()
@@ -0,0 +1,106 @@
+# counters.py
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.utils import timezone
+
+from .models import (
+    UserUsageCounter, UserPhoneNumber, SMSMessage, CallLog,
+    Notification, WalletTransaction
+)
+
+
+def compute_counts(user_ids):
+    """Count dashboard stats from the raw tables for a set of users"""
+    user_ids = list(user_ids)
+    counts = {
+        user_id: dict.fromkeys(UserUsageCounter.COUNTER_FIELDS, 0)
+        for user_id in user_ids
+    }
+
+    queries = (
+        ('active_numbers', UserPhoneNumber.objects.filter(status='active')),
+        ('total_sms', SMSMessage.objects.all()),
+        ('total_calls', CallLog.objects.all()),
+        ('unread_notifications', Notification.objects.filter(is_read=False)),
+        ('pending_transactions', WalletTransaction.objects.filter(status='pending')),
+    )
+
+    for field, queryset in queries:
+        rows = queryset.filter(user_id__in=user_ids).order_by().values(
+            'user_id'
+        ).annotate(total=Count('pk'))
+        for row in rows:
+            counts[row['user_id']][field] = row['total']
+
+    return counts
+
+
+def get_counter(user):
+    """Return the user's counter row, building it from scratch on first use"""
+    user_id = getattr(user, 'pk', user)
+
+    try:
+        return UserUsageCounter.objects.get(user_id=user_id)
+    except UserUsageCounter.DoesNotExist:
+        pass
+
+    counts = compute_counts([user_id])[user_id]
+    try:
+        with transaction.atomic():
+            return UserUsageCounter.objects.create(user_id=user_id, **counts)
+    except IntegrityError:
+        # Another request built it first
+        return UserUsageCounter.objects.get(user_id=user_id)
+
+
+def adjust(user_id, create=True, **deltas):
+    """Apply deltas to a user's counters with a single conditional UPDATE"""
+    deltas = {field: delta for field, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    updates = {field: F(field) + delta for field, delta in deltas.items()}
+    updated = UserUsageCounter.objects.filter(user_id=user_id).update(
+        updated_at=timezone.now(), **updates
+    )
+
+    # A freshly built counter already includes the row being written
+    if not updated and create:
+        get_counter(user_id)
+
+
+def rebuild(user_ids, verify_only=False):
+    """Recount users from the raw tables, returning the ones that drifted"""
+    user_ids = list(user_ids)
+    expected = compute_counts(user_ids)
+    existing = UserUsageCounter.objects.in_bulk(user_ids, field_name='user_id')
+
+    drifted = []
+    to_create = []
+    to_update = []
+
+    for user_id in user_ids:
+        counts = expected[user_id]
+        counter = existing.get(user_id)
+
+        if counter is None:
+            drifted.append((user_id, None, counts))
+            to_create.append(UserUsageCounter(user_id=user_id, **counts))
+            continue
+
+        current = {field: getattr(counter, field) for field in counts}
+        if current != counts:
+            drifted.append((user_id, current, counts))
+            for field, value in counts.items():
+                setattr(counter, field, value)
+            counter.updated_at = timezone.now()
+            to_update.append(counter)
+
+    if not verify_only:
+        with transaction.atomic():
+            UserUsageCounter.objects.bulk_create(to_create, ignore_conflicts=True)
+            UserUsageCounter.objects.bulk_update(
+                to_update, list(UserUsageCounter.COUNTER_FIELDS) + ['updated_at']
+            )
+
+    return drifted
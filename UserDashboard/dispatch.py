@@ -0,0 +1,249 @@
+# dispatch.py
+import logging
+import threading
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from . import ledger
+from .carriers import CarrierError, get_carrier_client
+from .models import SMSMessage
+
+logger = logging.getLogger(__name__)
+
+
+def max_attempts():
+    """Deferred sends after which a message is failed"""
+    return getattr(settings, 'SMS_DISPATCH_MAX_ATTEMPTS', 5)
+
+
+def backoff(attempts):
+    """Seconds to wait before send number `attempts` + 1: doubling from a base, capped"""
+    base = getattr(settings, 'SMS_DISPATCH_BACKOFF', 15)
+    cap = getattr(settings, 'SMS_DISPATCH_BACKOFF_MAX', 3600)
+    return min(cap, base * 2 ** max(attempts - 1, 0))
+
+
+def lease_seconds():
+    """How long a claim on one message holds before another worker may take it"""
+    return getattr(settings, 'SMS_DISPATCH_LEASE', 120)
+
+
+def outbound_queue(now=None):
+    now = now or timezone.now()
+    return SMSMessage.objects.filter(direction='outbound', status='queued').filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+    )
+
+
+def claim_batch(batch_size, using='default', lease=None):
+    """
+    Move up to `batch_size` due messages to 'sending' under a fresh claim
+    token and lease, and return them.
+
+    With SKIP LOCKED (PostgreSQL, MySQL 8) concurrent workers claim
+    disjoint batches without waiting on each other. Elsewhere each row is
+    claimed with its own conditional UPDATE, which only one worker can win.
+    """
+    now = timezone.now()
+    token = uuid.uuid4()
+    claim = dict(
+        status='sending', claim_token=token, updated_at=now,
+        lease_expires_at=now + timedelta(seconds=lease or lease_seconds()),
+    )
+    queue = outbound_queue(now).using(using).order_by('created_at')
+
+    if connections[using].features.has_select_for_update_skip_locked:
+        with transaction.atomic(using=using):
+            ids = list(
+                queue.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size]
+            )
+            SMSMessage.objects.using(using).filter(pk__in=ids).update(**claim)
+    else:
+        for pk in queue.values_list('pk', flat=True)[:batch_size]:
+            SMSMessage.objects.using(using).filter(pk=pk, status='queued').update(**claim)
+
+    return list(SMSMessage.objects.using(using).filter(claim_token=token).order_by('created_at'))
+
+
+def _claimed(message, using):
+    """The message's row, only while this worker still holds its claim"""
+    return SMSMessage.objects.using(using).filter(pk=message.pk, claim_token=message.claim_token)
+
+
+def _renew(message, using, lease=None):
+    """Extend the claim just before sending; False if it was lost (lease expired and re-queued)"""
+    now = timezone.now()
+    return bool(_claimed(message, using).filter(status='sending').update(
+        lease_expires_at=now + timedelta(seconds=lease or lease_seconds()), updated_at=now
+    ))
+
+
+def _record(message, using, status, **fields):
+    """
+    Store one send's outcome and release the claim. The status only moves
+    on from 'sending', so a status callback that already advanced the row
+    (e.g. to 'delivered') is not reverted.
+    """
+    return _claimed(message, using).update(
+        status=Case(When(status='sending', then=Value(status)), default=F('status')),
+        claim_token=None, lease_expires_at=None, updated_at=timezone.now(),
+        **fields
+    )
+
+
+def refund_reference(message):
+    """Ledger reference of a message's refund; unique, so it is refunded at most once"""
+    return f'SMS-REFUND-{message.pk}'
+
+
+def _refund(message):
+    """Return the charge taken when the message was queued"""
+    if message.price:
+        ledger.credit_once(
+            message.user_id, message.price, 'refund', refund_reference(message),
+            metadata={'sms_id': str(message.pk), 'message_sid': message.twilio_sid},
+        )
+
+
+def _fail(message, using, **fields):
+    """
+    Fail a claimed message and refund it in the same transaction. Only a
+    row still 'sending' is failed and refunded; one a status callback has
+    already moved on just has its claim released.
+    """
+    with transaction.atomic(using=using):
+        failed = _claimed(message, using).filter(status='sending').update(
+            status='failed', claim_token=None, lease_expires_at=None,
+            updated_at=timezone.now(), **fields
+        )
+        if failed:
+            _refund(message)
+        else:
+            _record(message, using, 'failed', **fields)
+    return failed
+
+
+def _defer(message, using, exc):
+    """Put a message back on the queue with backoff, or fail it once out of attempts"""
+    attempts = message.send_attempts + 1
+    if attempts >= max_attempts():
+        _fail(message, using, send_attempts=attempts,
+              error_message=f'Gave up after {attempts} attempts: {exc}'[:255])
+        return False
+    _claimed(message, using).filter(status='sending').update(
+        status='queued', send_attempts=attempts, claim_token=None, lease_expires_at=None,
+        next_attempt_at=timezone.now() + timedelta(seconds=backoff(attempts)),
+        updated_at=timezone.now(),
+    )
+    return True
+
+
+def dispatch_batch(client, batch_size=100, using='default', lease=None):
+    """
+    Claim a batch and hand each message to the carrier, recording each
+    outcome as soon as the carrier answers so a crash later in the batch
+    cannot lose a SID or send a message twice.
+    """
+    messages = claim_batch(batch_size, using=using, lease=lease)
+    if not messages:
+        return 0, 0
+
+    sent = failed = 0
+    for message in messages:
+        if not _renew(message, using, lease):
+            logger.warning('Lost the claim on %s; skipping it', message.pk)
+            continue
+        try:
+            result = client.send(message)
+        except CarrierError as exc:
+            logger.warning('Carrier deferred %s: %s', message.twilio_sid, exc)
+            if not _defer(message, using, exc):
+                failed += 1
+            continue
+        except Exception as exc:
+            logger.exception('Carrier rejected %s', message.twilio_sid)
+            _fail(message, using, error_message=str(exc)[:255])
+            failed += 1
+            continue
+
+        if result.ok:
+            fields = {'twilio_sid': result.sid} if result.sid else {}
+            _record(message, using, 'sent', **fields)
+            sent += 1
+        else:
+            _fail(message, using, error_code=result.error_code,
+                  error_message=(result.error_message or '')[:255])
+            failed += 1
+
+    return sent, failed
+
+
+def requeue_stale(using='default'):
+    """
+    Release messages whose claim lease has run out (the worker died or
+    hung): back on the queue as a used attempt, or failed and refunded
+    once out of attempts. Returns the rows released.
+    """
+    now = timezone.now()
+    expired = SMSMessage.objects.using(using).filter(
+        direction='outbound', status='sending', lease_expires_at__lt=now
+    )
+    released = dict(claim_token=None, lease_expires_at=None, updated_at=now)
+    failed = 0
+    for message in expired.filter(send_attempts__gte=max_attempts() - 1):
+        with transaction.atomic(using=using):
+            # Per row, so each refund commits with the update that failed it
+            if expired.filter(pk=message.pk).update(
+                status='failed', send_attempts=F('send_attempts') + 1,
+                error_message='Gave up after the sender repeatedly stopped mid-send', **released
+            ):
+                _refund(message)
+                failed += 1
+    return failed + expired.update(
+        status='queued', send_attempts=F('send_attempts') + 1, next_attempt_at=now, **released
+    )
+
+
+class DispatchWorker(threading.Thread):
+    """One dispatcher thread: claim, send, repeat until stopped"""
+
+    def __init__(self, stop_event, batch_size=100, poll_interval=1.0, once=False,
+                 client=None, using='default', lease=None):
+        super().__init__(daemon=True)
+        self.stop_event = stop_event
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.once = once
+        self.client = client or get_carrier_client()
+        self.using = using
+        self.lease = lease
+        self.sent = 0
+        self.failed = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    sent, failed = dispatch_batch(
+                        self.client, self.batch_size, self.using, self.lease
+                    )
+                except Exception:
+                    logger.exception('Dispatch batch failed')
+                    sent = failed = 0
+                    self.stop_event.wait(self.poll_interval)
+                self.sent += sent
+                self.failed += failed
+
+                if not sent and not failed:
+                    if self.once:
+                        break
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            self.client.close()
+            connections.close_all()
@@ -0,0 +1,5 @@
+# dispatch_signals.py
+from django.dispatch import Signal
+
+# Sent by bulk_create paths, which skip post_save: sender=model, instances=[...]
+rows_bulk_created = Signal()
@@ -0,0 +1,122 @@
+# exports.py
+import csv
+import io
+import json
+import re
+import zlib
+from datetime import date, datetime
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+
+# Columns written for each export, in order
+SMS_EXPORT_FIELDS = [
+    'created_at', 'direction', 'status', 'sender', 'receiver', 'body', 'segments',
+    'price', 'price_unit', 'error_code', 'error_message', 'twilio_sid',
+]
+CALL_EXPORT_FIELDS = [
+    'start_time', 'end_time', 'direction', 'status', 'from_number', 'to_number',
+    'duration', 'price', 'price_unit', 'twilio_sid',
+]
+WALLET_EXPORT_FIELDS = [
+    'created_at', 'tx_type', 'amount', 'status', 'balance_after', 'reference',
+]
+
+FORMATS = {
+    'csv': ('text/csv', 'csv'),
+    'jsonl': ('application/x-ndjson', 'jsonl'),
+}
+
+# Rows are joined into blocks of about this many bytes before being yielded
+FLUSH_BYTES = 64 * 1024
+
+
+# Leading characters that make a spreadsheet treat a text cell as a formula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Values that start with one of those but are plain data: E.164 numbers
+# and signed numbers such as a negative price
+INERT_VALUE_RE = re.compile(r'\+\d{6,15}|[+-]?\d+(?:\.\d+)?')
+
+
+def _cell(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) and not INERT_VALUE_RE.fullmatch(value):
+        # Message bodies and numbers are user-controlled; keep them inert
+        return "'" + value
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def _jsonable(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    return value
+
+
+def iter_csv(rows, fields):
+    """Encode tuples as CSV, a block of lines at a time"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(fields)
+    for row in rows:
+        writer.writerow([_cell(value) for value in row])
+        if buffer.tell() >= FLUSH_BYTES:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+def iter_jsonl(rows, fields):
+    """Encode tuples as one JSON object per line, a block of lines at a time"""
+    lines, size = [], 0
+    for row in rows:
+        line = json.dumps({field: _jsonable(value) for field, value in zip(fields, row)})
+        lines.append(line)
+        size += len(line) + 1
+        if size >= FLUSH_BYTES:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines, size = [], 0
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def gzip_stream(chunks, level=6):
+    """Compress a byte stream into a single gzip member on the fly"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_response(queryset, fields, filename, fmt='csv', compress=False, chunk_size=None):
+    """
+    Stream `queryset` as a CSV or JSON Lines download. Rows come from
+    values_list().iterator(), so memory stays flat however many there are
+    and no model instances are built.
+    """
+    content_type, extension = FORMATS.get(fmt, FORMATS['csv'])
+    encode = iter_jsonl if fmt == 'jsonl' else iter_csv
+    chunk_size = chunk_size or getattr(settings, 'EXPORT_CHUNK_SIZE', 2000)
+
+    rows = queryset.values_list(*fields).iterator(chunk_size=chunk_size)
+    stream = encode(rows, fields)
+    filename = f'{filename}.{extension}'
+    if compress:
+        stream = gzip_stream(stream)
+        content_type = 'application/gzip'
+        filename += '.gz'
+
+    response = StreamingHttpResponse(stream, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    return response
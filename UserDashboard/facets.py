@@ -0,0 +1,112 @@
+# facets.py
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+
+from .models import AvailablePhoneNumber, MarketplaceFacet
+
+FACETS_CACHE_KEY = 'marketplace-facets'
+FACETS_CACHE_TIMEOUT = 3600
+
+
+def _cache():
+    """
+    (cache, timeout) holding the facets. A shared cache named by
+    MARKETPLACE_FACETS_CACHE sees every process's invalidation, so entries
+    live an hour; the per-process default cache only sees this process's,
+    so entries there expire within seconds.
+    """
+    alias = getattr(settings, 'MARKETPLACE_FACETS_CACHE', None)
+    if alias:
+        return caches[alias], FACETS_CACHE_TIMEOUT
+    return caches['default'], getattr(settings, 'MARKETPLACE_FACETS_LOCAL_TTL', 10)
+
+
+def _facet_keys(iso_country, locality):
+    """Facet rows an available number counts towards: its country, and its locality if any"""
+    keys = [(iso_country, '')]
+    if locality:
+        keys.append((iso_country, locality))
+    return keys
+
+
+def adjust_facets(iso_country, locality, delta):
+    """Add `delta` available numbers to a country (and locality) facet"""
+    if not delta or not iso_country:
+        return
+    for country, place in _facet_keys(iso_country, locality):
+        updated = MarketplaceFacet.objects.filter(
+            iso_country=country, locality=place
+        ).update(available_count=F('available_count') + delta)
+        if not updated and delta > 0:
+            try:
+                with transaction.atomic():
+                    MarketplaceFacet.objects.create(
+                        iso_country=country, locality=place, available_count=delta
+                    )
+            except IntegrityError:
+                MarketplaceFacet.objects.filter(
+                    iso_country=country, locality=place
+                ).update(available_count=F('available_count') + delta)
+    invalidate()
+
+
+def rebuild_facets(countries=None):
+    """Recount facets from inventory, for all countries or just the given ones"""
+    available = AvailablePhoneNumber.objects.filter(is_available=True).order_by()
+    if countries is not None:
+        countries = list(countries)
+        available = available.filter(iso_country__in=countries)
+
+    rows = []
+    totals = {}
+    for row in available.values('iso_country', 'locality').annotate(total=Count('pk')):
+        totals[row['iso_country']] = totals.get(row['iso_country'], 0) + row['total']
+        if row['locality']:
+            rows.append(MarketplaceFacet(
+                iso_country=row['iso_country'], locality=row['locality'],
+                available_count=row['total'],
+            ))
+    rows.extend(
+        MarketplaceFacet(iso_country=country, locality='', available_count=total)
+        for country, total in totals.items()
+    )
+
+    with transaction.atomic():
+        stale = MarketplaceFacet.objects.all()
+        if countries is not None:
+            stale = stale.filter(iso_country__in=countries)
+        stale.delete()
+        MarketplaceFacet.objects.bulk_create(rows, batch_size=1000)
+    invalidate()
+    return len(rows)
+
+
+def invalidate():
+    """Drop the cached facets once the current transaction commits"""
+    transaction.on_commit(lambda: _cache()[0].delete(FACETS_CACHE_KEY))
+
+
+def get_facets():
+    """
+    Countries and localities that currently have available numbers, with
+    counts: {'countries': [(code, n)], 'localities': {code: [(name, n)]}}.
+    Served from the cache; a miss reads the small facet table, never inventory.
+    """
+    cache, timeout = _cache()
+    facets = cache.get(FACETS_CACHE_KEY)
+    if facets is not None:
+        return facets
+
+    facets = {'countries': [], 'localities': {}}
+    for country, locality, count in MarketplaceFacet.objects.filter(
+        available_count__gt=0
+    ).order_by('iso_country', 'locality').values_list('iso_country', 'locality', 'available_count'):
+        if locality:
+            facets['localities'].setdefault(country, []).append((locality, count))
+        else:
+            facets['countries'].append((country, count))
+
+    cache.set(FACETS_CACHE_KEY, facets, timeout)
+    return facets
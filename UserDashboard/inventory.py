@@ -0,0 +1,240 @@
+# inventory.py
+import csv
+import json
+from datetime import timedelta
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import facets, vanity
+from .models import AvailablePhoneNumber, UserPhoneNumber
+from .phone import normalize_e164
+
+CAPABILITY_FLAGS = {
+    'sms': 'supports_sms',
+    'mms': 'supports_mms',
+    'voice': 'supports_voice',
+    'fax': 'supports_fax',
+}
+
+# Columns compared against the stored row to decide whether it needs rewriting
+COMPARED_FIELDS = [
+    'iso_country', 'locality', 'region', 'postal_code', 'capabilities',
+    'supports_sms', 'supports_mms', 'supports_voice', 'supports_fax',
+    'twilio_price', 'your_price', 'monthly_price', 'is_featured',
+]
+
+TRUE_VALUES = {'1', 'true', 'yes', 'y', 't'}
+
+
+class InventoryRowError(ValueError):
+    pass
+
+
+class InvalidRecord:
+    """
+    Stands in for a feed line that could not be read, so parse_row()
+    reports it as a row error (skipped, or fatal under --strict) rather
+    than ending the stream
+    """
+
+    def __init__(self, error):
+        self.error = error
+
+
+def _as_bool(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+def _as_decimal(value, field):
+    try:
+        return Decimal(str(value).strip()).quantize(Decimal('0.01'))
+    except (InvalidOperation, ValueError):
+        raise InventoryRowError(f'Invalid {field}: {value!r}')
+
+
+def capability_flags(capabilities):
+    """supports_* values from a Twilio-style capabilities dict ({'SMS': true, 'voice': true, ...})"""
+    normalized = {str(key).lower(): _as_bool(value) for key, value in (capabilities or {}).items()}
+    return {flag: normalized.get(key, False) for key, flag in CAPABILITY_FLAGS.items()}
+
+
+def parse_row(raw):
+    """Turn one feed record (JSON object or CSV dict) into AvailablePhoneNumber field values"""
+    if isinstance(raw, InvalidRecord):
+        raise InventoryRowError(raw.error)
+    if not isinstance(raw, dict):
+        raise InventoryRowError(f'Expected an object, got {type(raw).__name__}')
+    phone_number = (raw.get('phone_number') or '').strip()
+    if not normalize_e164(phone_number):
+        raise InventoryRowError(f'Invalid phone_number: {phone_number!r}')
+    iso_country = (raw.get('iso_country') or '').strip().upper()
+    if not iso_country:
+        raise InventoryRowError(f'Missing iso_country for {phone_number}')
+
+    capabilities = raw.get('capabilities') or {}
+    if isinstance(capabilities, str):
+        try:
+            capabilities = json.loads(capabilities)
+        except ValueError:
+            raise InventoryRowError(f'Invalid capabilities for {phone_number}')
+    if not capabilities:
+        # CSV feeds may carry one column per capability instead
+        capabilities = {key: _as_bool(raw[key]) for key in CAPABILITY_FLAGS if raw.get(key) not in (None, '')}
+
+    twilio_price = _as_decimal(raw.get('twilio_price'), 'twilio_price')
+    your_price = raw.get('your_price')
+    monthly_price = raw.get('monthly_price')
+
+    values = {
+        'phone_number': phone_number,
+        'iso_country': iso_country,
+        'locality': (raw.get('locality') or '').strip() or None,
+        'region': (raw.get('region') or '').strip() or None,
+        'postal_code': (raw.get('postal_code') or '').strip() or None,
+        'capabilities': capabilities,
+        'twilio_price': twilio_price,
+        'your_price': _as_decimal(your_price, 'your_price') if your_price not in (None, '') else twilio_price,
+        'monthly_price': _as_decimal(monthly_price, 'monthly_price') if monthly_price not in (None, '') else Decimal('0.00'),
+        'is_featured': _as_bool(raw.get('is_featured', False)),
+    }
+    values.update(capability_flags(capabilities))
+    return values
+
+
+def iter_jsonl(stream):
+    """Records of a JSON Lines stream; unreadable lines come through as InvalidRecord"""
+    for line_no, line in enumerate(stream, start=1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield InvalidRecord(f'Line {line_no}: invalid JSON ({getattr(exc, "msg", exc)})')
+            continue
+        if not isinstance(record, dict):
+            yield InvalidRecord(f'Line {line_no}: expected an object, got {type(record).__name__}')
+            continue
+        yield record
+
+
+def iter_csv(stream):
+    yield from csv.DictReader(stream)
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+class InventoryWriter:
+    """
+    Upserts parsed inventory rows in batches keyed on phone_number.
+
+    Rows are diffed against what is stored: new numbers are bulk-created,
+    changed ones bulk-updated, unchanged ones only get their fetched_at
+    stamped (one UPDATE per batch, when `touch_unchanged`). With
+    `touch_after` seconds, an unchanged row stamped more recently than
+    that is left alone, so a refresh does not rewrite the whole table to
+    move timestamps forward by a few minutes. Numbers that were sold are
+    never put back on sale.
+    """
+
+    def __init__(self, seen_at=None, touch_unchanged=True, touch_after=0):
+        self.seen_at = seen_at or timezone.now()
+        self.touch_unchanged = touch_unchanged
+        self.fresh_after = self.seen_at - timedelta(seconds=touch_after)
+        self.countries = set()
+        self.stats = dict.fromkeys(['created', 'updated', 'unchanged', 'skipped'], 0)
+
+    def write(self, rows):
+        """Apply one batch of parse_row() values"""
+        by_number = {row['phone_number']: row for row in rows}
+        existing = {
+            row['phone_number']: row
+            for row in AvailablePhoneNumber.objects.filter(
+                phone_number__in=list(by_number)
+            ).values('id', 'phone_number', 'is_available', 'fetched_at', *COMPARED_FIELDS)
+        }
+
+        # Unavailable numbers that are owned by a customer stay off the market
+        withdrawn = [number for number, row in existing.items() if not row['is_available']]
+        owned = set()
+        if withdrawn:
+            owned = set(
+                UserPhoneNumber.objects.filter(
+                    phone_e164__in=[normalize_e164(number) for number in withdrawn]
+                ).exclude(status='cancelled').values_list('phone_e164', flat=True)
+            )
+
+        to_create, to_update, unchanged_ids, stale_ids, relisted = [], [], [], [], []
+        for number, values in by_number.items():
+            self.countries.add(values['iso_country'])
+            current = existing.get(number)
+
+            if current is None:
+                to_create.append(AvailablePhoneNumber(is_available=True, **values))
+                continue
+
+            if not current['is_available'] and normalize_e164(number) in owned:
+                self.stats['skipped'] += 1
+                continue
+
+            changed = any(current[field] != values[field] for field in COMPARED_FIELDS)
+            if changed or not current['is_available']:
+                self.countries.add(current['iso_country'])
+                number_row = AvailablePhoneNumber(
+                    id=current['id'], is_available=True, fetched_at=self.seen_at, **values
+                )
+                to_update.append(number_row)
+                if not current['is_available']:
+                    relisted.append(number_row)
+            else:
+                unchanged_ids.append(current['id'])
+                if current['fetched_at'] < self.fresh_after:
+                    stale_ids.append(current['id'])
+
+        with transaction.atomic():
+            if to_create:
+                AvailablePhoneNumber.objects.bulk_create(to_create, batch_size=1000)
+            if to_update:
+                AvailablePhoneNumber.objects.bulk_update(
+                    to_update, COMPARED_FIELDS + ['is_available', 'fetched_at'], batch_size=500
+                )
+            if stale_ids and self.touch_unchanged:
+                AvailablePhoneNumber.objects.filter(pk__in=stale_ids).update(fetched_at=self.seen_at)
+            if to_create or relisted:
+                vanity.index_numbers(to_create + relisted)
+
+        self.stats['created'] += len(to_create)
+        self.stats['updated'] += len(to_update)
+        self.stats['unchanged'] += len(unchanged_ids)
+        return len(to_create), len(to_update), len(unchanged_ids)
+
+    def mark_missing(self, countries=None):
+        """
+        Take numbers not seen in this run off the market, in one UPDATE.
+        Rows left unstamped under `touch_after` are still fresher than the
+        cutoff, so they are never taken for missing.
+        """
+        countries = self.countries if countries is None else countries
+        missing = AvailablePhoneNumber.objects.filter(
+            is_available=True, fetched_at__lt=self.fresh_after, iso_country__in=list(countries)
+        )
+        with transaction.atomic():
+            vanity.unindex(missing.values('pk'))
+            return missing.update(is_available=False)
+
+    def finish(self):
+        """Refresh derived data that bulk writes bypassed"""
+        if self.countries:
+            facets.rebuild_facets(self.countries)
@@ -0,0 +1,137 @@
+# inventory_sources.py
+import http.client
+import json
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .inventory import iter_jsonl
+
+
+class InventorySourceError(Exception):
+    """A page could not be fetched; the refresher records it and moves on"""
+    pass
+
+
+class BaseInventorySource:
+    """
+    A paged provider inventory. page_keys() lists the pages to fetch and
+    fetch(key) returns that page's raw records (as accepted by
+    inventory.parse_row). fetch() is called from several threads at once.
+    """
+
+    def page_keys(self):
+        raise NotImplementedError
+
+    def fetch(self, key):
+        raise NotImplementedError
+
+    def close(self):
+        """Release connections opened by fetches; the source can be fetched from again"""
+        pass
+
+
+class FixtureInventorySource(BaseInventorySource):
+    """
+    Offline source for development and tests: serves `records`, or the
+    lines of a JSON Lines file, in pages of `page_size`, optionally
+    sleeping `latency` seconds per page to stand in for the network.
+    """
+
+    def __init__(self, records=None, path=None, page_size=500, latency=0):
+        if records is None:
+            with open(path, encoding='utf-8') as stream:
+                records = list(iter_jsonl(stream))
+        self.records = list(records)
+        self.page_size = page_size
+        self.latency = latency
+
+    def page_keys(self):
+        return range((len(self.records) + self.page_size - 1) // self.page_size)
+
+    def fetch(self, key):
+        if self.latency:
+            time.sleep(self.latency)
+        start = key * self.page_size
+        return self.records[start:start + self.page_size]
+
+
+class HTTPInventorySource(BaseInventorySource):
+    """
+    JSON inventory API paged as GET <url>?page=N&page_size=M, answering
+    {"numbers": [...], "num_pages": K}. Each worker thread keeps one
+    persistent (keep-alive) connection and reuses it for every page of a
+    pass; close() drops them all once the pass's threads are done.
+    """
+
+    def __init__(self, url, page_size=500, headers=None, timeout=30):
+        parts = urlsplit(url)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.path = parts.path or '/'
+        self.page_size = page_size
+        self.headers = dict(headers or {})
+        self.timeout = timeout
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self._first_page = None
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn_class = http.client.HTTPSConnection if self.scheme == 'https' else http.client.HTTPConnection
+            conn = conn_class(self.host, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._connections.append(conn)
+        return conn
+
+    def _get(self, page):
+        query = urlencode({'page': page, 'page_size': self.page_size})
+        headers = {'Accept': 'application/json', 'Connection': 'keep-alive', **self.headers}
+        for attempt in range(2):
+            conn = self._connection()
+            try:
+                conn.request('GET', f'{self.path}?{query}', headers=headers)
+                response = conn.getresponse()
+                body = response.read()
+            except (http.client.HTTPException, OSError) as exc:
+                # The server may have dropped an idle keep-alive connection; reconnect once
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise InventorySourceError(f'Page {page}: {exc}')
+                continue
+            if response.status != 200:
+                raise InventorySourceError(f'Page {page}: HTTP {response.status}')
+            return json.loads(body)
+
+    def page_keys(self):
+        self._first_page = self._get(0)
+        return range(int(self._first_page.get('num_pages', 1)))
+
+    def fetch(self, key):
+        if key == 0 and self._first_page is not None:
+            page, self._first_page = self._first_page, None
+        else:
+            page = self._get(key)
+        return page.get('numbers', [])
+
+    def close(self):
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections = []
+            # Threads reconnect from scratch rather than reviving an untracked connection
+            self._local = threading.local()
+
+
+def get_inventory_source():
+    """Instantiate settings.INVENTORY_SOURCE with settings.INVENTORY_SOURCE_OPTIONS"""
+    backend = getattr(settings, 'INVENTORY_SOURCE', 'UserDashboard.inventory_sources.FixtureInventorySource')
+    options = getattr(settings, 'INVENTORY_SOURCE_OPTIONS', {'records': []})
+    return import_string(backend)(**options)
@@ -0,0 +1,135 @@
+# ledger.py
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.db.models.functions import Round
+from django.utils import timezone
+
+from .models import Wallet, WalletTransaction
+from .dispatch_signals import rows_bulk_created
+
+CREDIT_TYPES = frozenset(['fund', 'refund', 'commission'])
+DEBIT_TYPES = frozenset(['purchase', 'sms', 'mms', 'call', 'renewal', 'withdrawal'])
+
+
+class LedgerError(Exception):
+    pass
+
+
+class InsufficientFunds(LedgerError):
+    pass
+
+
+def signed_amount(tx_type, amount):
+    """Amount as it moves the balance: positive for credits, negative for debits"""
+    return amount if tx_type in CREDIT_TYPES else -amount
+
+
+def _reference(prefix):
+    return f"{prefix}-{uuid.uuid4().hex[:12].upper()}"
+
+
+def _apply(user_id, delta):
+    """
+    Move the wallet balance by `delta` with one conditional UPDATE and
+    return the new balance. Must run inside a transaction: the updated row
+    stays locked until commit, so the balance read back is our own.
+    """
+    wallets = Wallet.objects.filter(user_id=user_id)
+    guarded = wallets.filter(balance__gte=-delta) if delta < 0 else wallets
+    # Round keeps SQLite, which does decimal arithmetic in floats, on whole cents
+    if not guarded.update(balance=Round(F('balance') + delta, 2), updated_at=timezone.now()):
+        if not wallets.exists():
+            raise LedgerError('Wallet not found')
+        raise InsufficientFunds('Insufficient balance')
+    return wallets.values_list('balance', flat=True).get()
+
+
+def debit(user, amount, tx_type, reference=None, metadata=None):
+    """Charge the wallet and record the entry, or raise InsufficientFunds"""
+    return _post(user, Decimal(amount), tx_type, reference, metadata)
+
+
+def credit(user, amount, tx_type='fund', reference=None, metadata=None):
+    """Add funds to the wallet and record the entry"""
+    return _post(user, Decimal(amount), tx_type, reference, metadata)
+
+
+def credit_once(user, amount, tx_type, reference, metadata=None):
+    """
+    credit() keyed on `reference`: the entry is posted at most once, and a
+    repeat returns None without touching the balance
+    """
+    try:
+        with transaction.atomic():
+            return _post(user, Decimal(amount), tx_type, reference, metadata)
+    except IntegrityError:
+        if not WalletTransaction.objects.filter(reference=reference).exists():
+            raise
+        return None
+
+
+def _post(user, amount, tx_type, reference, metadata):
+    if amount <= 0:
+        raise LedgerError('Amount must be greater than 0')
+    user_id = getattr(user, 'pk', user)
+    with transaction.atomic():
+        balance = _apply(user_id, signed_amount(tx_type, amount))
+        return WalletTransaction.objects.create(
+            user_id=user_id,
+            tx_type=tx_type,
+            amount=amount,
+            reference=reference or _reference(tx_type.upper()),
+            status='success',
+            balance_after=balance,
+            metadata=metadata or {},
+        )
+
+
+def debit_many(user, transactions, batch_size=None):
+    """
+    Charge several unsaved WalletTransaction debits with a single balance
+    update, stamping each with its running balance_after.
+    """
+    user_id = getattr(user, 'pk', user)
+    total = sum((tx.amount for tx in transactions), Decimal('0.00'))
+    batch_size = batch_size or getattr(settings, 'SMS_BULK_CHUNK_SIZE', 1000)
+
+    with transaction.atomic():
+        balance = _apply(user_id, -total) + total
+        for tx in transactions:
+            balance -= tx.amount
+            tx.user_id = user_id
+            tx.status = 'success'
+            tx.balance_after = balance
+        WalletTransaction.objects.bulk_create(transactions, batch_size=batch_size)
+        rows_bulk_created.send(sender=WalletTransaction, instances=transactions)
+    return transactions
+
+
+def settle_pending(wallet_transaction, success=True):
+    """Complete a pending entry (e.g. a funding payment), moving the balance if it succeeded"""
+    with transaction.atomic():
+        tx = WalletTransaction.objects.select_for_update().get(pk=wallet_transaction.pk)
+        if tx.status != 'pending':
+            raise LedgerError(f'Transaction is already {tx.status}')
+        if success:
+            tx.balance_after = _apply(tx.user_id, signed_amount(tx.tx_type, tx.amount))
+            tx.status = 'success'
+        else:
+            tx.status = 'failed'
+        tx.save(update_fields=['status', 'balance_after'])
+        return tx
+
+
+def balance_history(user, since=None):
+    """(created_at, balance_after) pairs straight off the (user, created_at) index"""
+    entries = WalletTransaction.objects.filter(
+        user=user, balance_after__isnull=False
+    )
+    if since is not None:
+        entries = entries.filter(created_at__gte=since)
+    return entries.order_by('created_at').values_list('created_at', 'balance_after')
@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand
+
+from UserDashboard import retention
+
+
+class Command(BaseCommand):
+    help = 'Move processed Twilio webhook logs older than the retention period into gzipped JSONL archives'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=None,
+                            help='Keep this many days in the table (default WEBHOOK_RETENTION_DAYS)')
+        parser.add_argument('--dir', dest='root', default=None,
+                            help='Archive directory (default WEBHOOK_ARCHIVE_DIR)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument('--pause', type=float, default=0.0,
+                            help='Seconds to sleep between chunks')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Count what would be archived without writing or deleting')
+        parser.add_argument('--compact', action='store_true',
+                            help='Also rewrite the remaining rows with compact payloads')
+
+    def handle(self, *args, **options):
+        moved = retention.archive(
+            older_than_days=options['days'],
+            root=options['root'],
+            chunk_size=options['chunk_size'],
+            pause=options['pause'],
+            dry_run=options['dry_run'],
+        )
+        verb = 'Would archive' if options['dry_run'] else 'Archived'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {moved} webhook logs'))
+
+        if not options['dry_run']:
+            purged = retention.purge_tombstones(chunk_size=options['chunk_size'], pause=options['pause'])
+            self.stdout.write(self.style.SUCCESS(f'Purged {purged} expired dedup tombstones'))
+
+        if options['compact'] and not options['dry_run']:
+            rewritten = retention.compact_stored(chunk_size=options['chunk_size'])
+            self.stdout.write(self.style.SUCCESS(f'Compacted {rewritten} payloads'))
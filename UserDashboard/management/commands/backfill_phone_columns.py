@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from UserDashboard.models import UserPhoneNumber, SMSMessage, CallLog
+
+# label -> (model, source fields, canonical fields filled by fill_phone_columns)
+TARGETS = {
+    'numbers': (UserPhoneNumber, ['phone_number'], ['phone_e164', 'phone_rev']),
+    'sms': (SMSMessage, ['sender', 'receiver'],
+            ['sender_e164', 'receiver_e164', 'sender_rev', 'receiver_rev']),
+    'calls': (CallLog, ['from_number', 'to_number'],
+              ['from_e164', 'to_e164', 'from_rev', 'to_rev']),
+}
+
+
+class Command(BaseCommand):
+    help = 'Fill the canonical E.164 and reversed-digit phone columns for existing rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', choices=sorted(TARGETS), action='append',
+                            help='Limit to these tables (repeatable)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--all', action='store_true',
+                            help='Recompute rows that already have canonical values')
+
+    def handle(self, *args, **options):
+        for label in options['only'] or TARGETS:
+            self._backfill(label, options['batch_size'], options['all'])
+
+    def _backfill(self, label, batch_size, recompute):
+        model, source_fields, target_fields = TARGETS[label]
+        queryset = model.objects.only('pk', *source_fields, *target_fields).order_by('pk')
+        if not recompute:
+            # Rows written since the columns were added are already filled
+            queryset = queryset.filter(**{target_fields[0]: ''})
+
+        started = time.monotonic()
+        last_pk = None
+        updated = 0
+
+        while True:
+            batch = queryset if last_pk is None else queryset.filter(pk__gt=last_pk)
+            rows = list(batch[:batch_size])
+            if not rows:
+                break
+
+            for row in rows:
+                row.fill_phone_columns()
+            with transaction.atomic():
+                model.objects.bulk_update(rows, target_fields)
+
+            last_pk = rows[-1].pk
+            updated += len(rows)
+            self.stdout.write(f'{label}: {updated} rows', ending='\r')
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'{label}: backfilled {updated} rows in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,316 @@
+import asyncio
+import http.client
+import socket
+import statistics
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from urllib.parse import unquote, urlencode
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler
+from django.core.wsgi import get_wsgi_application
+from django.utils import timezone
+
+from UserDashboard import threads
+from UserDashboard.dispatch_signals import rows_bulk_created
+from UserDashboard.models import SMSMessage, TwilioWebhookLog, UserPhoneNumber
+
+try:
+    import uvicorn
+except ImportError:
+    uvicorn = None
+
+HOST = '127.0.0.1'
+BENCH_RECEIVER = '+15550000000'
+
+
+def _listen():
+    sock = socket.create_server((HOST, 0), backlog=1024)
+    sock.setblocking(False)
+    return sock
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+class WSGIBenchServer:
+    """The project's WSGI app under Django's threaded stdlib server (a thread per connection)"""
+
+    label = 'WSGI, threaded wsgiref server'
+
+    def __init__(self):
+        self.server = ThreadedWSGIServer((HOST, 0), QuietRequestHandler)
+        self.server.set_app(get_wsgi_application())
+        self.port = self.server.server_address[1]
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        self._thread.join()
+
+
+class UvicornBenchServer:
+    """The project's ASGI app under uvicorn, when it is installed"""
+
+    label = 'ASGI, uvicorn'
+
+    def __init__(self):
+        self.sock = _listen()
+        self.port = self.sock.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(
+            get_asgi_application(), log_level='warning', access_log=False, lifespan='off',
+        ))
+        self._thread = threading.Thread(target=self.server.run, kwargs={'sockets': [self.sock]}, daemon=True)
+
+    def start(self):
+        self._thread.start()
+        while not self.server.started:
+            time.sleep(0.01)
+
+    def stop(self):
+        self.server.should_exit = True
+        self._thread.join()
+        self.sock.close()
+
+
+class ASGIBenchServer:
+    """
+    The project's ASGI app on one asyncio event loop behind a minimal
+    HTTP/1.1 front end (keep-alive, Content-Length bodies only), for
+    environments without uvicorn.
+    """
+
+    label = 'ASGI, asyncio server'
+
+    def __init__(self):
+        self.app = get_asgi_application()
+        self.sock = _listen()
+        self.port = self.sock.getsockname()[1]
+        self.loop = asyncio.new_event_loop()
+        self._started = threading.Event()
+        self._connections = {}
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        asyncio.set_event_loop(self.loop)
+        self.server = self.loop.run_until_complete(asyncio.start_server(self._serve, sock=self.sock))
+        self._started.set()
+        self.loop.run_forever()
+
+    def start(self):
+        self._thread.start()
+        self._started.wait()
+
+    def stop(self):
+        asyncio.run_coroutine_threadsafe(self._shutdown(), self.loop).result()
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    async def _shutdown(self):
+        self.server.close()
+        # Closing a connection ends its handler at the next read
+        for writer in self._connections.values():
+            writer.close()
+        if self._connections:
+            await asyncio.wait(list(self._connections))
+
+    async def _serve(self, reader, writer):
+        task = asyncio.current_task()
+        self._connections[task] = writer
+        try:
+            while await self._respond(reader, writer):
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+            self._connections.pop(task, None)
+
+    async def _respond(self, reader, writer):
+        """Answer one request on the connection; False once the client hung up"""
+        request_line = await reader.readline()
+        if not request_line.strip():
+            return False
+        method, target, _ = request_line.decode('latin-1').split(' ', 2)
+        headers = []
+        while (line := await reader.readline()).strip():
+            name, _, value = line.decode('latin-1').partition(':')
+            headers.append((name.strip().lower().encode('latin-1'), value.strip().encode('latin-1')))
+        length = int(dict(headers).get(b'content-length', 0))
+        body = await reader.readexactly(length) if length else b''
+
+        path, _, query = target.partition('?')
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': method, 'scheme': 'http', 'root_path': '',
+            'path': unquote(path), 'raw_path': path.encode('latin-1'),
+            'query_string': query.encode('latin-1'), 'headers': headers,
+            'client': writer.get_extra_info('peername')[:2], 'server': (HOST, self.port),
+        }
+        messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            # Django listens for a disconnect while the view runs and
+            # cancels the wait once the response is sent
+            await asyncio.Future()
+
+        response, chunks = {}, []
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                response.update(message)
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+
+        await self.app(scope, receive, send)
+
+        content = b''.join(chunks)
+        head = [f'HTTP/1.1 {response["status"]} {HTTPStatus(response["status"]).phrase}']
+        head += [
+            f'{name.decode("latin-1")}: {value.decode("latin-1")}'
+            for name, value in response.get('headers', []) if name.lower() != b'content-length'
+        ]
+        head.append(f'Content-Length: {len(content)}')
+        writer.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1') + content)
+        await writer.drain()
+        return True
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare webhook throughput of the sync views served over WSGI (a thread per '
+        'connection) with the async views served over ASGI (one event loop). Starts each '
+        'server on a local port, seeds queued SMS rows, posts a "sent" status callback for '
+        'each over HTTP and deletes the rows and logs afterwards; run it against a scratch '
+        'database. The ASGI side uses uvicorn when it is installed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000)
+        parser.add_argument('--concurrency', type=int, default=50,
+                            help='Client connections posting at once')
+        parser.add_argument('--mode', choices=['both', 'wsgi', 'asgi'], default='both')
+        parser.add_argument('--number', help='Phone number that owns the seeded SMS rows '
+                                             '(default: the first active number)')
+        parser.add_argument('--keep', action='store_true', help='Keep the SMS rows and webhook logs created')
+
+    def _owner(self, phone_number):
+        numbers = UserPhoneNumber.objects.filter(status='active')
+        if phone_number:
+            numbers = numbers.filter(phone_number=phone_number)
+        number = numbers.order_by('pk').first()
+        if number is None:
+            raise CommandError('No active phone number to own the benchmark messages; pass --number')
+        return number
+
+    def _seed(self, number, sids):
+        """Queued outbound messages for the callbacks to move, stored as a bulk send would"""
+        now = timezone.now()
+        messages = [
+            SMSMessage(
+                twilio_sid=sid,
+                user_id=number.user_id,
+                phone_number=number,
+                sender=number.phone_number,
+                receiver=BENCH_RECEIVER,
+                body='Webhook benchmark',
+                direction='outbound',
+                status='queued',
+                segments=1,
+                created_at=now,
+            )
+            for sid in sids
+        ]
+        for message in messages:
+            message.fill_phone_columns()
+        threads.assign(messages)
+        SMSMessage.objects.bulk_create(messages, batch_size=500)
+        rows_bulk_created.send(sender=SMSMessage, instances=messages)
+
+    def _post_all(self, port, path, sids, concurrency):
+        local = threading.local()
+        opened = []
+        lock = threading.Lock()
+
+        def post(sid):
+            conn = getattr(local, 'conn', None)
+            if conn is None:
+                conn = local.conn = http.client.HTTPConnection(HOST, port, timeout=60)
+                with lock:
+                    opened.append(conn)
+            body = urlencode({'MessageSid': sid, 'MessageStatus': 'sent'})
+            started = time.perf_counter()
+            try:
+                conn.request('POST', path, body=body, headers={
+                    'Content-Type': 'application/x-www-form-urlencoded',
+                })
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                status = None
+            return status, time.perf_counter() - started
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(post, sids))
+        for conn in opened:
+            conn.close()
+        return results
+
+    def _run(self, server, path, sids, concurrency):
+        server.start()
+        try:
+            started = time.perf_counter()
+            results = self._post_all(server.port, path, sids, concurrency)
+            elapsed = time.perf_counter() - started
+        finally:
+            server.stop()
+        self._report(server.label, results, elapsed, sids)
+
+    def _report(self, label, results, elapsed, sids):
+        latencies = sorted(seconds for _, seconds in results)
+        errors = sum(1 for status, _ in results if status != 200)
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        logs = TwilioWebhookLog.objects.filter(event_sid__in=sids)
+        moved = SMSMessage.objects.filter(twilio_sid__in=sids, status='sent').count()
+        self.stdout.write(
+            f'{label}: {len(results) / elapsed:.0f} req/s, '
+            f'p50 {statistics.median(latencies) * 1000:.1f} ms, p99 {p99 * 1000:.1f} ms, '
+            f'{errors} non-200; {logs.filter(processed=True).count()} applied, '
+            f'{logs.filter(processing_error__isnull=False).count()} failed, {moved} rows moved'
+        )
+
+    def handle(self, *args, **options):
+        number = self._owner(options['number'])
+        prefix = f'BENCH{uuid.uuid4().hex[:8]}-'
+        count, concurrency = options['requests'], options['concurrency']
+        runs = []
+        if options['mode'] in ('both', 'wsgi'):
+            runs.append((WSGIBenchServer, '/webhooks/twilio/sms/', 'W'))
+        if options['mode'] in ('both', 'asgi'):
+            asgi_server = UvicornBenchServer if uvicorn is not None else ASGIBenchServer
+            runs.append((asgi_server, '/webhooks/twilio/async/sms/', 'A'))
+
+        try:
+            for server_class, path, tag in runs:
+                sids = [f'{prefix}{tag}{index}' for index in range(count)]
+                self._seed(number, sids)
+                self._run(server_class(), path, sids, concurrency)
+        finally:
+            if not options['keep']:
+                TwilioWebhookLog.objects.filter(event_sid__startswith=prefix).delete()
+                SMSMessage.objects.filter(twilio_sid__startswith=prefix).delete()
@@ -0,0 +1,65 @@
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from UserDashboard.inventory import (
+    InventoryRowError, InventoryWriter, chunked, iter_csv, iter_jsonl, parse_row,
+)
+
+
+class Command(BaseCommand):
+    help = 'Stream AvailablePhoneNumber inventory from a JSON Lines or CSV provider dump'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Input file, or '-' for stdin")
+        parser.add_argument('--format', choices=['jsonl', 'csv'],
+                            help='Input format (default: from the file extension)')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--keep-missing', action='store_true',
+                            help='Do not mark numbers absent from the feed as unavailable')
+        parser.add_argument('--strict', action='store_true',
+                            help='Abort on the first invalid row instead of skipping it')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        fmt = options['format'] or ('csv' if path.lower().endswith('.csv') else 'jsonl')
+        reader = iter_csv if fmt == 'csv' else iter_jsonl
+
+        writer = InventoryWriter()
+        invalid = 0
+
+        def parsed(records):
+            nonlocal invalid
+            for line_no, record in enumerate(records, start=1):
+                try:
+                    yield parse_row(record)
+                except InventoryRowError as exc:
+                    if options['strict']:
+                        raise CommandError(f'Record {line_no}: {exc}')
+                    invalid += 1
+                    self.stderr.write(f'Skipping record {line_no}: {exc}')
+
+        started = time.monotonic()
+        total = 0
+        stream = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            for batch in chunked(parsed(reader(stream)), options['batch_size']):
+                writer.write(batch)
+                total += len(batch)
+                elapsed = time.monotonic() - started
+                self.stdout.write(f'{total} rows ({total / elapsed:.0f} rows/s)')
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+        withdrawn = 0 if options['keep_missing'] else writer.mark_missing()
+        writer.finish()
+
+        elapsed = time.monotonic() - started
+        stats = writer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} rows/s): "
+            f"{stats['created']} new, {stats['updated']} changed, {stats['unchanged']} unchanged, "
+            f"{stats['skipped']} owned, {invalid} invalid, {withdrawn} marked unavailable"
+        ))
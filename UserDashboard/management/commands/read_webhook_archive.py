@@ -0,0 +1,30 @@
+import json
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from UserDashboard import retention
+
+
+class Command(BaseCommand):
+    help = 'Stream archived Twilio webhook logs as JSON Lines, e.g. for an audit'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--since', type=date.fromisoformat, default=None, help='First UTC day (YYYY-MM-DD)')
+        parser.add_argument('--until', type=date.fromisoformat, default=None, help='Last UTC day (YYYY-MM-DD)')
+        parser.add_argument('--sid', dest='event_sid', default=None)
+        parser.add_argument('--type', dest='event_type', default=None)
+        parser.add_argument('--dir', dest='root', default=None,
+                            help='Archive directory (default WEBHOOK_ARCHIVE_DIR)')
+
+    def handle(self, *args, **options):
+        records = retention.iter_archived(
+            since=options['since'],
+            until=options['until'],
+            root=options['root'],
+            event_sid=options['event_sid'],
+            event_type=options['event_type'],
+        )
+        for record in records:
+            record['received_at'] = record['received_at'].isoformat()
+            self.stdout.write(json.dumps(record, separators=(',', ':')))
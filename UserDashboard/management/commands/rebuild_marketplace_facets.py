@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from UserDashboard import facets
+
+
+class Command(BaseCommand):
+    help = 'Recount the marketplace country/locality facets from AvailablePhoneNumber'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--country', dest='countries', action='append',
+                            help='Only rebuild this ISO country (repeatable)')
+
+    def handle(self, *args, **options):
+        rows = facets.rebuild_facets(options['countries'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} facet rows'))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from UserDashboard import rollups
+from UserDashboard.models import UserPhoneNumber
+
+
+class Command(BaseCommand):
+    help = 'Recount the per-number usage summaries (PhoneNumberUsage) from SMS and call logs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', dest='emails', action='append', default=[],
+                            help='Limit to numbers of this user email (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        numbers = UserPhoneNumber.objects.order_by('pk')
+        if options['emails']:
+            numbers = numbers.filter(user__email__in=options['emails'])
+
+        chunk_size = options['chunk_size']
+        total = 0
+        chunk = {}
+        for number_id, user_id in numbers.values_list('pk', 'user_id').iterator(chunk_size=chunk_size):
+            chunk[number_id] = user_id
+            if len(chunk) >= chunk_size:
+                total += rollups.rebuild_numbers(list(chunk), user_ids=chunk)
+                chunk = {}
+        if chunk:
+            total += rollups.rebuild_numbers(list(chunk), user_ids=chunk)
+
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {total} number usage summaries'))
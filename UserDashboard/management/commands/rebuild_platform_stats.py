@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from UserDashboard import platform_stats
+
+
+class Command(BaseCommand):
+    help = 'Recompute the admin dashboard platform totals and daily stats from the raw tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            help='Only recompute this many trailing days of daily stats')
+        parser.add_argument('--daily-only', action='store_true',
+                            help='Leave the running totals alone (skips the full-table counts)')
+
+    def handle(self, *args, **options):
+        since = None
+        if options['days']:
+            since = timezone.localdate() - timedelta(days=options['days'] - 1)
+        rows = platform_stats.rebuild(since=since, counters=not options['daily_only'])
+        totals = platform_stats.totals()
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {rows} daily rows; totals: "
+            + ', '.join(f'{name}={value}' for name, value in totals.items())
+        ))
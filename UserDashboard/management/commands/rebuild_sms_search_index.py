@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from UserDashboard import search
+
+
+class Command(BaseCommand):
+    help = 'Create the SMS full-text index if needed and repopulate it from SMSMessage'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+
+    def handle(self, *args, **options):
+        using = options['database']
+        backend = search.install_search_index(using)
+
+        if backend is None:
+            self.stdout.write(self.style.WARNING(
+                'No full-text support on this database; searches use substring matching'
+            ))
+            return
+
+        if search.rebuild_search_index(using):
+            self.stdout.write(self.style.SUCCESS(f'Rebuilt {backend} index'))
+        else:
+            self.stdout.write(self.style.SUCCESS(f'{backend} index is maintained by the database'))
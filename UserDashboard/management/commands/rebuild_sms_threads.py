@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from UserDashboard import threads
+from UserDashboard.models import SMSThread
+
+
+class Command(BaseCommand):
+    help = 'File threadless SMS messages into conversation threads and recount the threads they touch'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recount every thread, not only those that gained messages')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        touched = threads.backfill(batch_size=batch_size)
+        if options['all']:
+            touched = SMSThread.objects.order_by('pk').values_list('pk', flat=True)
+
+        thread_ids = list(touched)
+        total = 0
+        for start in range(0, len(thread_ids), batch_size):
+            total += threads.rebuild(thread_ids[start:start + batch_size])
+
+        self.stdout.write(self.style.SUCCESS(f'Recounted {total} SMS threads'))
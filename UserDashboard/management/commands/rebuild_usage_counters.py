@@ -0,0 +1,50 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from UserDashboard import counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the per-user dashboard counters from the raw tables'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='Only report drifted counters, do not write')
+        parser.add_argument('--user', dest='emails', action='append', default=[],
+                            help='Limit to this user email (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['emails']:
+            users = users.filter(email__in=options['emails'])
+
+        verify_only = options['verify']
+        chunk_size = options['chunk_size']
+        checked = 0
+        drifted_total = 0
+
+        user_ids = users.values_list('pk', flat=True)
+        chunk = []
+        for user_id in user_ids.iterator(chunk_size=chunk_size):
+            chunk.append(user_id)
+            if len(chunk) >= chunk_size:
+                drifted_total += self._process(chunk, verify_only)
+                checked += len(chunk)
+                chunk = []
+        if chunk:
+            drifted_total += self._process(chunk, verify_only)
+            checked += len(chunk)
+
+        action = 'drifted' if verify_only else 'rebuilt'
+        self.stdout.write(self.style.SUCCESS(
+            f'Checked {checked} users, {drifted_total} {action}'
+        ))
+
+    def _process(self, user_ids, verify_only):
+        drifted = counters.rebuild(user_ids, verify_only=verify_only)
+        for user_id, current, expected in drifted:
+            self.stdout.write(f'user {user_id}: {current} -> {expected}')
+        return len(drifted)
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from UserDashboard import vanity
+
+
+class Command(BaseCommand):
+    help = 'Recreate the digit trigram index used by the marketplace pattern search'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        postings = vanity.rebuild_index(options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Indexed {postings} trigram postings'))
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db.models import OuterRef, Q, Subquery, Sum
+
+from UserDashboard.ledger import CREDIT_TYPES, DEBIT_TYPES
+from UserDashboard.models import Wallet, WalletTransaction
+
+CENT = Decimal('0.01')
+
+
+class Command(BaseCommand):
+    help = 'Verify every wallet balance against its ledger, streaming wallets in chunks'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+
+        latest_balance = WalletTransaction.objects.filter(
+            user_id=OuterRef('user_id'), balance_after__isnull=False
+        ).order_by('-created_at').values('balance_after')[:1]
+
+        wallets = Wallet.objects.order_by('pk').annotate(
+            ledger_balance=Subquery(latest_balance)
+        ).values_list('pk', 'user_id', 'balance', 'ledger_balance')
+
+        checked = mismatched = 0
+        last_pk = 0
+        while True:
+            chunk = list(wallets.filter(pk__gt=last_pk)[:chunk_size])
+            if not chunk:
+                break
+            last_pk = chunk[-1][0]
+            checked += len(chunk)
+            mismatched += self._check_chunk(chunk)
+
+        style = self.style.SUCCESS if not mismatched else self.style.ERROR
+        self.stdout.write(style(f'Checked {checked} wallets, {mismatched} mismatched'))
+
+    def _check_chunk(self, chunk):
+        """Compare each wallet with the sum of its settled entries and its last balance_after"""
+        user_ids = [user_id for _, user_id, _, _ in chunk]
+        totals = {
+            row['user_id']: (row['credits'] or Decimal('0.00')) - (row['debits'] or Decimal('0.00'))
+            for row in WalletTransaction.objects.filter(
+                user_id__in=user_ids, status='success'
+            ).order_by().values('user_id').annotate(
+                credits=Sum('amount', filter=Q(tx_type__in=CREDIT_TYPES)),
+                debits=Sum('amount', filter=Q(tx_type__in=DEBIT_TYPES)),
+            )
+        }
+
+        mismatched = 0
+        for _, user_id, balance, ledger_balance in chunk:
+            summed = totals.get(user_id, Decimal('0.00')).quantize(CENT)
+            problems = []
+            if summed != balance:
+                problems.append(f'ledger sum {summed}')
+            if ledger_balance is not None and ledger_balance.quantize(CENT) != balance:
+                problems.append(f'last balance_after {ledger_balance}')
+            if problems:
+                mismatched += 1
+                self.stdout.write(f'user {user_id}: balance {balance} != ' + ', '.join(problems))
+        return mismatched
@@ -0,0 +1,47 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from UserDashboard.inventory_sources import FixtureInventorySource, get_inventory_source
+from UserDashboard.refresh import InventoryRefresher
+
+
+class Command(BaseCommand):
+    help = 'Refresh AvailablePhoneNumber from the inventory source and evict stale rows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fixture', help='Read inventory from this JSON Lines file instead of settings.INVENTORY_SOURCE')
+        parser.add_argument('--page-size', type=int, default=500,
+                            help='Page size for --fixture')
+        parser.add_argument('--workers', type=int, help='Concurrent page fetches')
+        parser.add_argument('--ttl', type=int,
+                            help='Evict rows not refreshed for this many seconds (default settings.INVENTORY_STALE_AFTER)')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep refreshing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=300.0)
+
+    def handle(self, *args, **options):
+        if options['fixture']:
+            source = FixtureInventorySource(path=options['fixture'], page_size=options['page_size'])
+        else:
+            source = get_inventory_source()
+        refresher = InventoryRefresher(source, max_workers=options['workers'], ttl=options['ttl'])
+
+        if options['loop']:
+            stop_event = threading.Event()
+            try:
+                refresher.run_forever(stop_event, options['interval'])
+            except KeyboardInterrupt:
+                stop_event.set()
+            return
+
+        try:
+            stats = refresher.run_once()
+        finally:
+            source.close()
+        self.stdout.write(self.style.SUCCESS(
+            f"Refreshed {stats['pages_done']}/{stats['pages_total']} pages, {stats['rows']} rows: "
+            f"{stats['created']} new, {stats['updated']} changed, {stats['unchanged']} unchanged, "
+            f"{stats['evicted']} evicted, {stats['pages_failed']} failed pages "
+            f"(fetch avg {stats['page_fetch_avg'] * 1000:.0f} ms, write avg {stats['page_write_avg'] * 1000:.0f} ms)"
+        ))
@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from UserDashboard import reservations
+
+
+class Command(BaseCommand):
+    help = 'Release lapsed phone number checkout holds in bulk'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep sweeping every --interval seconds')
+        parser.add_argument('--interval', type=float, default=30.0)
+
+    def handle(self, *args, **options):
+        while True:
+            released = reservations.release_expired()
+            if released or not options['loop']:
+                self.stdout.write(f'Released {released} expired reservations')
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
@@ -0,0 +1,42 @@
+import threading
+
+from django.core.management.base import BaseCommand
+
+from UserDashboard import replay
+
+
+class Command(BaseCommand):
+    help = 'Re-apply failed or stranded Twilio webhook logs with backoff, dead-lettering repeat failures'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=200)
+        parser.add_argument('--grace', type=int, default=300,
+                            help='Also replay logs left unapplied (without an error) this many seconds')
+        parser.add_argument('--requeue-dead', action='store_true',
+                            help='Give dead-lettered logs a fresh set of attempts first')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep replaying every --interval seconds')
+        parser.add_argument('--interval', type=float, default=60.0)
+
+    def handle(self, *args, **options):
+        if options['requeue_dead']:
+            self.stdout.write(f'Re-queued {replay.requeue_dead_letters()} dead-lettered logs')
+
+        replayer = replay.Replayer(
+            max_workers=options['workers'], batch_size=options['batch_size'], grace=options['grace'],
+        )
+
+        if options['loop']:
+            stop_event = threading.Event()
+            try:
+                replayer.run_forever(stop_event, options['interval'])
+            except KeyboardInterrupt:
+                stop_event.set()
+            return
+
+        stats = replayer.run_once()
+        self.stdout.write(self.style.SUCCESS(
+            f"Replayed {stats['scanned']} logs in {stats['batches']} batches: {stats['processed']} applied, "
+            f"{stats['failed']} failed, {stats['dead_lettered']} dead-lettered"
+        ))
@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from UserDashboard import rollups
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'Re-aggregate recent days of UserDailyUsage from the raw tables (catch-up for late updates)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=2,
+                            help='Recompute this many trailing days (default 2)')
+        parser.add_argument('--all', action='store_true',
+                            help="Rebuild every user's whole history")
+        parser.add_argument('--user', dest='emails', action='append', default=[],
+                            help='Limit to this user email (repeatable)')
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        if options['all']:
+            since = None
+            users = User.objects.order_by('pk').values_list('pk', flat=True)
+            if options['emails']:
+                users = users.filter(email__in=options['emails'])
+            user_ids = users.iterator(chunk_size=options['chunk_size'])
+        else:
+            since = timezone.now().date() - timedelta(days=options['days'])
+            # A day of margin covers users whose local day starts before UTC's
+            user_ids = rollups.active_users(timezone.now() - timedelta(days=options['days'] + 1))
+            if options['emails']:
+                user_ids = set(user_ids) & set(
+                    User.objects.filter(email__in=options['emails']).values_list('pk', flat=True)
+                )
+            user_ids = sorted(user_ids)
+
+        users_done = rows = 0
+        chunk = []
+        for user_id in user_ids:
+            chunk.append(user_id)
+            if len(chunk) >= options['chunk_size']:
+                rows += rollups.rebuild(chunk, since=since)
+                users_done += len(chunk)
+                chunk = []
+        if chunk:
+            rows += rollups.rebuild(chunk, since=since)
+            users_done += len(chunk)
+
+        window = 'all days' if since is None else f'days since {since}'
+        self.stdout.write(self.style.SUCCESS(f'Rolled up {users_done} users ({window}): {rows} rows'))
@@ -0,0 +1,62 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from UserDashboard import dispatch
+
+
+class Command(BaseCommand):
+    help = 'Send queued outbound SMS through the carrier backend with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=4)
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--poll-interval', type=float, default=1.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--lease', type=int, default=None,
+                            help='Seconds a claim on a message holds (default SMS_DISPATCH_LEASE); '
+                                 'messages whose lease ran out are re-queued')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        requeued = dispatch.requeue_stale()
+        if requeued:
+            self.stdout.write(f'Re-queued {requeued} stale messages')
+
+        stop_event = threading.Event()
+        workers = [
+            dispatch.DispatchWorker(
+                stop_event,
+                batch_size=options['batch_size'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+                lease=options['lease'],
+            )
+            for _ in range(options['concurrency'])
+        ]
+
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(timeout=options['poll_interval'])
+                if not options['once']:
+                    dispatch.requeue_stale()
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers...')
+            stop_event.set()
+            for worker in workers:
+                worker.join()
+
+        sent = sum(worker.sent for worker in workers)
+        failed = sum(worker.failed for worker in workers)
+        elapsed = time.monotonic() - started
+        rate = (sent + failed) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Sent {sent}, failed {failed} in {elapsed:.1f}s ({rate:.0f} msg/s)'
+        ))
@@ -0,0 +1,60 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+
+from UserDashboard import webhooks
+
+
+class Command(BaseCommand):
+    help = 'Apply queued Twilio callbacks (WEBHOOK_INGESTION = "queue") in batches with a pool of worker threads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=2)
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--poll-interval', type=float, default=0.5,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=300,
+                            help='Release callbacks claimed this many seconds ago but never applied')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the queue and exit')
+
+    def handle(self, *args, **options):
+        released = webhooks.requeue_stale(options['stale_after'])
+        if released:
+            self.stdout.write(f'Released {released} stale callbacks')
+
+        stop_event = threading.Event()
+        workers = [
+            webhooks.IngestWorker(
+                stop_event,
+                batch_size=options['batch_size'],
+                poll_interval=options['poll_interval'],
+                once=options['once'],
+            )
+            for _ in range(options['concurrency'])
+        ]
+
+        started = time.monotonic()
+        for worker in workers:
+            worker.start()
+
+        try:
+            while any(worker.is_alive() for worker in workers):
+                for worker in workers:
+                    worker.join(timeout=options['poll_interval'])
+                if not options['once']:
+                    webhooks.requeue_stale(options['stale_after'])
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping workers...')
+            stop_event.set()
+            for worker in workers:
+                worker.join()
+
+        processed = sum(worker.processed for worker in workers)
+        failed = sum(worker.failed for worker in workers)
+        elapsed = time.monotonic() - started
+        rate = (processed + failed) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f'Applied {processed}, failed {failed} in {elapsed:.1f}s ({rate:.0f} callbacks/s)'
+        ))
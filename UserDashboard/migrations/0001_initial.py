@@ -0,0 +1,526 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+import django.core.serializers.json
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPhoneNumber',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('twilio_sid', models.CharField(max_length=50, unique=True)),
+                ('phone_number', models.CharField(max_length=20)),
+                ('phone_e164', models.CharField(blank=True, default='', max_length=16)),
+                ('phone_rev', models.CharField(blank=True, default='', max_length=15)),
+                ('friendly_name', models.CharField(blank=True, max_length=100, null=True)),
+                ('iso_country', models.CharField(max_length=5)),
+                ('capabilities', models.JSONField(default=dict)),
+                ('supports_sms', models.BooleanField(default=False)),
+                ('supports_mms', models.BooleanField(default=False)),
+                ('supports_voice', models.BooleanField(default=False)),
+                ('status', models.CharField(choices=[('active', 'Active'), ('suspended', 'Suspended'), ('cancelled', 'Cancelled'), ('pending', 'Pending')], default='active', max_length=20)),
+                ('monthly_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('purchased_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField()),
+                ('auto_renew', models.BooleanField(default=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='phone_numbers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-purchased_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WorkerMetrics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40, unique=True)),
+                ('stats', models.JSONField(default=dict, encoder=django.core.serializers.json.DjangoJSONEncoder)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AvailablePhoneNumber',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('phone_number', models.CharField(max_length=20, unique=True)),
+                ('iso_country', models.CharField(max_length=5)),
+                ('locality', models.CharField(blank=True, max_length=50, null=True)),
+                ('region', models.CharField(blank=True, max_length=50, null=True)),
+                ('postal_code', models.CharField(blank=True, max_length=20, null=True)),
+                ('capabilities', models.JSONField(default=dict)),
+                ('supports_sms', models.BooleanField(default=False)),
+                ('supports_mms', models.BooleanField(default=False)),
+                ('supports_voice', models.BooleanField(default=False)),
+                ('supports_fax', models.BooleanField(default=False)),
+                ('twilio_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('your_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('monthly_price', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('is_available', models.BooleanField(default=True)),
+                ('is_featured', models.BooleanField(default=False)),
+                ('fetched_at', models.DateTimeField(auto_now_add=True)),
+                ('reserved_until', models.DateTimeField(blank=True, null=True)),
+                ('reserved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='number_reservations', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['iso_country', 'locality', 'phone_number'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CallLog',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('twilio_sid', models.CharField(max_length=50, unique=True)),
+                ('from_number', models.CharField(max_length=20)),
+                ('to_number', models.CharField(max_length=20)),
+                ('from_e164', models.CharField(blank=True, default='', max_length=16)),
+                ('to_e164', models.CharField(blank=True, default='', max_length=16)),
+                ('from_rev', models.CharField(blank=True, default='', max_length=15)),
+                ('to_rev', models.CharField(blank=True, default='', max_length=15)),
+                ('direction', models.CharField(choices=[('inbound', 'Inbound'), ('outbound', 'Outbound')], max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('ringing', 'Ringing'), ('in-progress', 'In Progress'), ('completed', 'Completed'), ('busy', 'Busy'), ('failed', 'Failed'), ('no-answer', 'No Answer'), ('canceled', 'Canceled')], max_length=20)),
+                ('duration', models.IntegerField(default=0)),
+                ('price', models.DecimalField(decimal_places=4, max_digits=10, null=True)),
+                ('price_unit', models.CharField(default='USD', max_length=5)),
+                ('start_time', models.DateTimeField()),
+                ('end_time', models.DateTimeField(null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calls', to=settings.AUTH_USER_MODEL)),
+                ('phone_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='calls', to='UserDashboard.userphonenumber')),
+            ],
+            options={
+                'ordering': ['-start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='CallRecording',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recording_sid', models.CharField(max_length=50, unique=True)),
+                ('duration', models.IntegerField()),
+                ('recording_url', models.URLField(max_length=500)),
+                ('created_at', models.DateTimeField()),
+                ('call', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recordings', to='UserDashboard.calllog')),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='Commission',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('description', models.CharField(max_length=255)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('paid', 'Paid')], default='pending', max_length=20)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('referral', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='referred_commissions', to=settings.AUTH_USER_MODEL)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='commissions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MarketplaceFacet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('iso_country', models.CharField(max_length=5)),
+                ('locality', models.CharField(blank=True, default='', max_length=50)),
+                ('available_count', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['iso_country', 'locality'],
+                'unique_together': {('iso_country', 'locality')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Notification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notification_type', models.CharField(choices=[('info', 'Information'), ('success', 'Success'), ('warning', 'Warning'), ('error', 'Error'), ('payment', 'Payment'), ('sms', 'SMS'), ('call', 'Call'), ('number', 'Number')], max_length=20)),
+                ('title', models.CharField(max_length=200)),
+                ('message', models.TextField()),
+                ('is_read', models.BooleanField(default=False)),
+                ('action_url', models.URLField(blank=True, max_length=500, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='NumberTrigram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('trigram', models.CharField(max_length=3)),
+                ('number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='trigrams', to='UserDashboard.availablephonenumber')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PhoneNumberUsage',
+            fields=[
+                ('phone_number', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='usage', serialize=False, to='UserDashboard.userphonenumber')),
+                ('sms_inbound', models.IntegerField(default=0)),
+                ('sms_outbound', models.IntegerField(default=0)),
+                ('sms_count', models.IntegerField(default=0)),
+                ('calls_inbound', models.IntegerField(default=0)),
+                ('calls_outbound', models.IntegerField(default=0)),
+                ('call_count', models.IntegerField(default=0)),
+                ('call_duration', models.BigIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='PlatformCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=40)),
+                ('shard', models.SmallIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'unique_together': {('name', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PlatformDailyStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('metric', models.CharField(max_length=40)),
+                ('shard', models.SmallIntegerField(default=0)),
+                ('value', models.DecimalField(decimal_places=4, default=0, max_digits=20)),
+            ],
+            options={
+                'ordering': ['day'],
+                'unique_together': {('day', 'metric', 'shard')},
+            },
+        ),
+        migrations.CreateModel(
+            name='Referral',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('code', models.CharField(max_length=20, unique=True)),
+                ('commission_earned', models.DecimalField(decimal_places=2, default=0.0, max_digits=10)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('referred', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='referred_by', to=settings.AUTH_USER_MODEL)),
+                ('referrer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='referrals_made', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SMSMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('twilio_sid', models.CharField(max_length=50, unique=True)),
+                ('sender', models.CharField(max_length=20)),
+                ('receiver', models.CharField(max_length=20)),
+                ('body', models.TextField()),
+                ('sender_e164', models.CharField(blank=True, default='', max_length=16)),
+                ('receiver_e164', models.CharField(blank=True, default='', max_length=16)),
+                ('sender_rev', models.CharField(blank=True, default='', max_length=15)),
+                ('receiver_rev', models.CharField(blank=True, default='', max_length=15)),
+                ('direction', models.CharField(choices=[('inbound', 'Inbound'), ('outbound', 'Outbound')], max_length=10)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('sent', 'Sent'), ('delivered', 'Delivered'), ('undelivered', 'Undelivered'), ('failed', 'Failed'), ('received', 'Received')], max_length=20)),
+                ('segments', models.IntegerField(default=1)),
+                ('price', models.DecimalField(decimal_places=4, max_digits=10, null=True)),
+                ('price_unit', models.CharField(default='USD', max_length=5)),
+                ('error_code', models.IntegerField(blank=True, null=True)),
+                ('error_message', models.CharField(blank=True, max_length=255, null=True)),
+                ('send_attempts', models.PositiveIntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('claim_token', models.UUIDField(blank=True, null=True)),
+                ('lease_expires_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('phone_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sms_messages', to='UserDashboard.userphonenumber')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sms_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='MMSMedia',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('media_sid', models.CharField(max_length=50)),
+                ('content_type', models.CharField(max_length=50)),
+                ('media_url', models.URLField(max_length=500)),
+                ('file_size', models.IntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media', to='UserDashboard.smsmessage')),
+            ],
+            options={
+                'verbose_name_plural': 'MMS Media',
+            },
+        ),
+        migrations.CreateModel(
+            name='SMSThread',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('counterparty', models.CharField(max_length=20)),
+                ('last_message_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('last_snippet', models.CharField(blank=True, default='', max_length=160)),
+                ('last_direction', models.CharField(blank=True, default='', max_length=10)),
+                ('message_count', models.IntegerField(default=0)),
+                ('unread_count', models.IntegerField(default=0)),
+                ('last_read_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('phone_number', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sms_threads', to='UserDashboard.userphonenumber')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sms_threads', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-last_message_at'],
+            },
+        ),
+        migrations.AddField(
+            model_name='smsmessage',
+            name='thread',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='messages', to='UserDashboard.smsthread'),
+        ),
+        migrations.CreateModel(
+            name='TwilioWebhookLog',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('event_sid', models.CharField(max_length=50)),
+                ('event_type', models.CharField(max_length=50)),
+                ('status', models.CharField(blank=True, default='', max_length=20)),
+                ('account_sid', models.CharField(blank=True, max_length=50, null=True)),
+                ('payload', models.JSONField()),
+                ('processed', models.BooleanField(default=False)),
+                ('processing_error', models.TextField(blank=True, null=True)),
+                ('received_at', models.DateTimeField(auto_now_add=True)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.IntegerField(default=0)),
+                ('next_attempt_at', models.DateTimeField(blank=True, null=True)),
+                ('dead_letter', models.BooleanField(default=False)),
+            ],
+            options={
+                'ordering': ['-received_at'],
+                'indexes': [models.Index(fields=['event_sid'], name='UserDashboa_event_s_adfde1_idx'), models.Index(fields=['event_type', 'received_at'], name='UserDashboa_event_t_28924b_idx'), models.Index(fields=['processed', 'received_at'], name='UserDashboa_process_1f17c0_idx')],
+                'constraints': [models.UniqueConstraint(fields=('event_sid', 'event_type', 'status'), name='unique_webhook_event')],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserDailyUsage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('channel', models.CharField(choices=[('sms', 'SMS'), ('call', 'Call'), ('wallet', 'Wallet')], max_length=10)),
+                ('direction', models.CharField(max_length=20)),
+                ('count', models.IntegerField(default=0)),
+                ('segments', models.IntegerField(default=0)),
+                ('duration', models.BigIntegerField(default=0)),
+                ('spend', models.DecimalField(decimal_places=4, default=0, max_digits=14)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='daily_usage', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='UserUsageCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('active_numbers', models.IntegerField(default=0)),
+                ('total_sms', models.BigIntegerField(default=0)),
+                ('total_calls', models.BigIntegerField(default=0)),
+                ('unread_notifications', models.IntegerField(default=0)),
+                ('pending_transactions', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='usage_counter', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Wallet',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('balance', models.DecimalField(decimal_places=2, default=0.0, max_digits=12)),
+                ('currency', models.CharField(default='USD', max_length=5)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='wallet', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-updated_at'],
+            },
+        ),
+        migrations.CreateModel(
+            name='WalletTransaction',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('tx_type', models.CharField(choices=[('fund', 'Fund Wallet'), ('purchase', 'Number Purchase'), ('sms', 'SMS Charge'), ('mms', 'MMS Charge'), ('call', 'Call Charge'), ('renewal', 'Number Renewal'), ('refund', 'Refund'), ('commission', 'Commission'), ('withdrawal', 'Withdrawal')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('reference', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('success', 'Success'), ('failed', 'Failed')], default='pending', max_length=20)),
+                ('balance_after', models.DecimalField(blank=True, decimal_places=2, max_digits=12, null=True)),
+                ('metadata', models.JSONField(blank=True, default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-created_at'],
+            },
+        ),
+        migrations.AddIndex(
+            model_name='availablephonenumber',
+            index=models.Index(fields=['iso_country', 'is_available'], name='UserDashboa_iso_cou_89f13f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availablephonenumber',
+            index=models.Index(fields=['your_price'], name='UserDashboa_your_pr_9df4cd_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='availablephonenumber',
+            index=models.Index(fields=['reserved_until'], name='UserDashboa_reserve_4b5188_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(fields=['user', 'status'], name='UserDashboa_user_id_054c24_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='commission',
+            index=models.Index(fields=['referral'], name='UserDashboa_referra_1f0100_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'is_read', 'created_at'], name='UserDashboa_user_id_9cce38_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['user', 'created_at'], name='UserDashboa_user_id_4fd545_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='numbertrigram',
+            unique_together={('trigram', 'number')},
+        ),
+        migrations.AddField(
+            model_name='phonenumberusage',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='number_usage', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='userphonenumber',
+            index=models.Index(fields=['user', 'status'], name='UserDashboa_user_id_da3bbb_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userphonenumber',
+            index=models.Index(fields=['expires_at'], name='UserDashboa_expires_7cba00_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userphonenumber',
+            index=models.Index(fields=['phone_e164'], name='UserDashboa_phone_e_39dde5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='userphonenumber',
+            index=models.Index(fields=['user', 'phone_rev'], name='UserDashboa_user_id_16372e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['user', 'direction', 'start_time'], name='UserDashboa_user_id_5301da_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['user', 'start_time'], name='UserDashboa_user_id_5ca8ed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['phone_number', 'start_time'], name='UserDashboa_phone_n_0f4cec_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['user', 'from_rev'], name='UserDashboa_user_id_eaf367_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='calllog',
+            index=models.Index(fields=['user', 'to_rev'], name='UserDashboa_user_id_61e5b4_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='referral',
+            unique_together={('referrer', 'referred')},
+        ),
+        migrations.AddIndex(
+            model_name='mmsmedia',
+            index=models.Index(fields=['message'], name='UserDashboa_message_b84024_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsthread',
+            index=models.Index(fields=['user', 'last_message_at'], name='UserDashboa_user_id_e376cf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsthread',
+            index=models.Index(fields=['phone_number', 'last_message_at'], name='UserDashboa_phone_n_c1a516_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='smsthread',
+            unique_together={('phone_number', 'counterparty')},
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['user', 'direction', 'created_at'], name='UserDashboa_user_id_882a5f_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['phone_number', 'created_at'], name='UserDashboa_phone_n_cea6c2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['user', 'sender_rev'], name='UserDashboa_user_id_7b715e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['user', 'receiver_rev'], name='UserDashboa_user_id_853a0d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['status', 'created_at'], name='UserDashboa_status_37ae67_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='smsmessage',
+            index=models.Index(fields=['thread', 'created_at'], name='UserDashboa_thread__5e4fb3_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='userdailyusage',
+            unique_together={('user', 'day', 'channel', 'direction')},
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['user', 'created_at'], name='UserDashboa_user_id_9db270_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['tx_type', 'status'], name='UserDashboa_tx_type_9ece4d_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wallettransaction',
+            index=models.Index(fields=['created_at'], name='UserDashboa_created_5c4366_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonenumberusage',
+            index=models.Index(fields=['user', 'sms_count'], name='UserDashboa_user_id_b003fe_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='phonenumberusage',
+            index=models.Index(fields=['user', 'call_duration'], name='UserDashboa_user_id_7f8403_idx'),
+        ),
+    ]
@@ -0,0 +1,86 @@
+from django.db import migrations
+
+
+def _search_backend(connection):
+    """The full-text backend the SQL below targets: 'fts5', 'postgres' or None"""
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        with connection.cursor() as cursor:
+            try:
+                cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+                cursor.execute('DROP TABLE temp.fts5_probe')
+                return 'fts5'
+            except Exception:
+                pass
+    return None
+
+
+class RunSQLForBackend(migrations.RunSQL):
+    """RunSQL that only runs on databases with the given full-text backend"""
+
+    def __init__(self, backend, *args, **kwargs):
+        self.backend = backend
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, args, kwargs = super().deconstruct()
+        return name, [self.backend, *args], kwargs
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state):
+        if _search_backend(schema_editor.connection) == self.backend:
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state):
+        if _search_backend(schema_editor.connection) == self.backend:
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+
+
+# Keep in step with search.install_search_index(), which repairs an index
+# created before these migrations existed
+FTS5_SQL = [
+    # user_id rides along UNINDEXED so a search is scoped inside the FTS query
+    'CREATE VIRTUAL TABLE IF NOT EXISTS "UserDashboard_smsmessage_fts" USING fts5('
+    "body, user_id UNINDEXED, content='UserDashboard_smsmessage', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')",
+
+    'CREATE TRIGGER IF NOT EXISTS "UserDashboard_smsmessage_fts_ai" AFTER INSERT ON "UserDashboard_smsmessage" BEGIN '
+    'INSERT INTO "UserDashboard_smsmessage_fts"(rowid, body, user_id) VALUES (new.id, new.body, new.user_id); END',
+
+    'CREATE TRIGGER IF NOT EXISTS "UserDashboard_smsmessage_fts_ad" AFTER DELETE ON "UserDashboard_smsmessage" BEGIN '
+    'INSERT INTO "UserDashboard_smsmessage_fts"("UserDashboard_smsmessage_fts", rowid, body, user_id) '
+    "VALUES ('delete', old.id, old.body, old.user_id); END",
+
+    'CREATE TRIGGER IF NOT EXISTS "UserDashboard_smsmessage_fts_au" '
+    'AFTER UPDATE OF body, user_id ON "UserDashboard_smsmessage" BEGIN '
+    'INSERT INTO "UserDashboard_smsmessage_fts"("UserDashboard_smsmessage_fts", rowid, body, user_id) '
+    "VALUES ('delete', old.id, old.body, old.user_id); "
+    'INSERT INTO "UserDashboard_smsmessage_fts"(rowid, body, user_id) VALUES (new.id, new.body, new.user_id); END',
+
+    # Index whatever SMSMessage already holds
+    'INSERT INTO "UserDashboard_smsmessage_fts"("UserDashboard_smsmessage_fts") VALUES (\'rebuild\')',
+]
+
+FTS5_REVERSE_SQL = [
+    'DROP TRIGGER IF EXISTS "UserDashboard_smsmessage_fts_au"',
+    'DROP TRIGGER IF EXISTS "UserDashboard_smsmessage_fts_ad"',
+    'DROP TRIGGER IF EXISTS "UserDashboard_smsmessage_fts_ai"',
+    'DROP TABLE IF EXISTS "UserDashboard_smsmessage_fts"',
+]
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserDashboard', '0001_initial'),
+    ]
+
+    operations = [
+        RunSQLForBackend('fts5', FTS5_SQL, FTS5_REVERSE_SQL),
+        RunSQLForBackend(
+            'postgres',
+            'CREATE INDEX IF NOT EXISTS "UserDashboard_sms_body_tsv" ON "UserDashboard_smsmessage" '
+            "USING GIN (to_tsvector('simple', body))",
+            'DROP INDEX IF EXISTS "UserDashboard_sms_body_tsv"',
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserDashboard', '0002_sms_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twiliowebhooklog',
+            name='archived_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-17 03:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('UserDashboard', '0003_twiliowebhooklog_archived_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='twiliowebhooklog',
+            name='claim_token',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+    ]
@@ -1,10 +1,13 @@
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.core.serializers.json import DjangoJSONEncoder
 from decimal import Decimal
 import uuid
 from datetime import timedelta
 from django.utils import timezone
 
+from .phone import normalize_e164, reversed_digits
+
 User = get_user_model()
 
 class Wallet(models.Model):
@@ -44,6 +47,7 @@ class WalletTransaction(models.Model):
     amount = models.DecimalField(max_digits=12, decimal_places=2)
     reference = models.CharField(max_length=100, blank=True, null=True, unique=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    balance_after = models.DecimalField(max_digits=12, decimal_places=2, null=True, blank=True)  # set by ledger
     metadata = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
@@ -52,6 +56,7 @@ class WalletTransaction(models.Model):
         indexes = [
             models.Index(fields=['user', 'created_at']),
             models.Index(fields=['tx_type', 'status']),
+            models.Index(fields=['created_at']),
         ]
     
     def __str__(self):
@@ -78,16 +83,32 @@ class AvailablePhoneNumber(models.Model):
     is_featured = models.BooleanField(default=False)
     fetched_at = models.DateTimeField(auto_now_add=True)
     
+    # Short checkout hold, claimed with a conditional UPDATE (see reservations.py)
+    reserved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='number_reservations')
+    reserved_until = models.DateTimeField(null=True, blank=True)
+    
     class Meta:
         ordering = ['iso_country', 'locality', 'phone_number']
         indexes = [
             models.Index(fields=['iso_country', 'is_available']),
             models.Index(fields=['your_price']),
+            models.Index(fields=['reserved_until']),
         ]
     
     def __str__(self):
         return self.phone_number
 
+class NumberTrigram(models.Model):
+    """Digit trigram posting for vanity search over available numbers (see vanity.py)"""
+    trigram = models.CharField(max_length=3)
+    number = models.ForeignKey(AvailablePhoneNumber, on_delete=models.CASCADE, related_name='trigrams')
+    
+    class Meta:
+        unique_together = ['trigram', 'number']
+    
+    def __str__(self):
+        return f"{self.trigram} -> {self.number_id}"
+
 class UserPhoneNumber(models.Model):
     STATUS_CHOICES = (
         ("active", "Active"),
@@ -100,6 +121,8 @@ class UserPhoneNumber(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='phone_numbers')
     twilio_sid = models.CharField(max_length=50, unique=True)
     phone_number = models.CharField(max_length=20)
+    phone_e164 = models.CharField(max_length=16, blank=True, default='')
+    phone_rev = models.CharField(max_length=15, blank=True, default='')
     friendly_name = models.CharField(max_length=100, blank=True, null=True)
     iso_country = models.CharField(max_length=5)
     
@@ -119,17 +142,52 @@ class UserPhoneNumber(models.Model):
         indexes = [
             models.Index(fields=['user', 'status']),
             models.Index(fields=['expires_at']),
+            models.Index(fields=['phone_e164']),
+            models.Index(fields=['user', 'phone_rev']),
         ]
     
     def __str__(self):
         return self.phone_number
     
+    def save(self, *args, **kwargs):
+        self.fill_phone_columns()
+        super().save(*args, **kwargs)
+    
+    def fill_phone_columns(self):
+        self.phone_e164 = normalize_e164(self.phone_number)
+        self.phone_rev = reversed_digits(self.phone_e164)
+    
     def days_until_expiry(self):
         return (self.expires_at - timezone.now()).days
     
     def is_expired(self):
         return timezone.now() > self.expires_at
 
+# One SMS conversation: a user's number and one counterparty (see threads.py)
+class SMSThread(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sms_threads')
+    phone_number = models.ForeignKey(UserPhoneNumber, on_delete=models.CASCADE, related_name='sms_threads')
+    counterparty = models.CharField(max_length=20)  # E.164 when it parses
+    
+    last_message_at = models.DateTimeField(default=timezone.now)
+    last_snippet = models.CharField(max_length=160, blank=True, default='')
+    last_direction = models.CharField(max_length=10, blank=True, default='')
+    message_count = models.IntegerField(default=0)
+    unread_count = models.IntegerField(default=0)
+    last_read_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['-last_message_at']
+        unique_together = ['phone_number', 'counterparty']
+        indexes = [
+            models.Index(fields=['user', 'last_message_at']),
+            models.Index(fields=['phone_number', 'last_message_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.phone_number_id} <-> {self.counterparty}"
+
 class SMSMessage(models.Model):
     DIRECTION_CHOICES = (
         ("inbound", "Inbound"),
@@ -138,6 +196,7 @@ class SMSMessage(models.Model):
     
     STATUS_CHOICES = (
         ("queued", "Queued"),
+        ("sending", "Sending"),
         ("sent", "Sent"),
         ("delivered", "Delivered"),
         ("undelivered", "Undelivered"),
@@ -148,11 +207,18 @@ class SMSMessage(models.Model):
     twilio_sid = models.CharField(max_length=50, unique=True)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='sms_messages')
     phone_number = models.ForeignKey(UserPhoneNumber, on_delete=models.CASCADE, related_name='sms_messages')
+    thread = models.ForeignKey(SMSThread, on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
     
     sender = models.CharField(max_length=20)
     receiver = models.CharField(max_length=20)
     body = models.TextField()
     
+    # Canonical forms of sender/receiver, filled in on save
+    sender_e164 = models.CharField(max_length=16, blank=True, default='')
+    receiver_e164 = models.CharField(max_length=16, blank=True, default='')
+    sender_rev = models.CharField(max_length=15, blank=True, default='')
+    receiver_rev = models.CharField(max_length=15, blank=True, default='')
+    
     direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     segments = models.IntegerField(default=1)
@@ -163,6 +229,12 @@ class SMSMessage(models.Model):
     error_code = models.IntegerField(null=True, blank=True)
     error_message = models.CharField(max_length=255, blank=True, null=True)
     
+    # Outbound dispatch: the claim held by a sender and its retry schedule
+    send_attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    claim_token = models.UUIDField(null=True, blank=True)
+    lease_expires_at = models.DateTimeField(null=True, blank=True)
+    
     created_at = models.DateTimeField()
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -171,10 +243,24 @@ class SMSMessage(models.Model):
         indexes = [
             models.Index(fields=['user', 'direction', 'created_at']),
             models.Index(fields=['phone_number', 'created_at']),
+            models.Index(fields=['user', 'sender_rev']),
+            models.Index(fields=['user', 'receiver_rev']),
+            models.Index(fields=['status', 'created_at']),
+            models.Index(fields=['thread', 'created_at']),
         ]
     
     def __str__(self):
         return f"{self.direction} SMS: {self.sender} → {self.receiver}"
+    
+    def save(self, *args, **kwargs):
+        self.fill_phone_columns()
+        super().save(*args, **kwargs)
+    
+    def fill_phone_columns(self):
+        self.sender_e164 = normalize_e164(self.sender)
+        self.receiver_e164 = normalize_e164(self.receiver)
+        self.sender_rev = reversed_digits(self.sender_e164)
+        self.receiver_rev = reversed_digits(self.receiver_e164)
 
 class MMSMedia(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -218,6 +304,12 @@ class CallLog(models.Model):
     from_number = models.CharField(max_length=20)
     to_number = models.CharField(max_length=20)
     
+    # Canonical forms of from/to, filled in on save
+    from_e164 = models.CharField(max_length=16, blank=True, default='')
+    to_e164 = models.CharField(max_length=16, blank=True, default='')
+    from_rev = models.CharField(max_length=15, blank=True, default='')
+    to_rev = models.CharField(max_length=15, blank=True, default='')
+    
     direction = models.CharField(max_length=10, choices=DIRECTION_CHOICES)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES)
     
@@ -233,10 +325,24 @@ class CallLog(models.Model):
         ordering = ['-start_time']
         indexes = [
             models.Index(fields=['user', 'direction', 'start_time']),
+            models.Index(fields=['user', 'start_time']),
+            models.Index(fields=['phone_number', 'start_time']),
+            models.Index(fields=['user', 'from_rev']),
+            models.Index(fields=['user', 'to_rev']),
         ]
     
     def __str__(self):
         return f"{self.direction} Call: {self.from_number} → {self.to_number}"
+    
+    def save(self, *args, **kwargs):
+        self.fill_phone_columns()
+        super().save(*args, **kwargs)
+    
+    def fill_phone_columns(self):
+        self.from_e164 = normalize_e164(self.from_number)
+        self.to_e164 = normalize_e164(self.to_number)
+        self.from_rev = reversed_digits(self.from_e164)
+        self.to_rev = reversed_digits(self.to_e164)
 
 class CallRecording(models.Model):
     recording_sid = models.CharField(max_length=50, unique=True)
@@ -255,18 +361,31 @@ class TwilioWebhookLog(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     event_sid = models.CharField(max_length=50)
     event_type = models.CharField(max_length=50)
+    status = models.CharField(max_length=20, blank=True, default='')  # MessageStatus/CallStatus reported
     account_sid = models.CharField(max_length=50, blank=True, null=True)
     payload = models.JSONField()
     processed = models.BooleanField(default=False)
     processing_error = models.TextField(blank=True, null=True)
     received_at = models.DateTimeField(auto_now_add=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)  # taken by an ingestion worker
+    claim_token = models.UUIDField(null=True, blank=True)  # which worker's claim, see webhooks.claim_batch
+    attempts = models.IntegerField(default=0)  # failed replays, see replay.py
+    next_attempt_at = models.DateTimeField(null=True, blank=True)
+    dead_letter = models.BooleanField(default=False)
+    archived_at = models.DateTimeField(null=True, blank=True)  # payload archived; row kept as a dedup tombstone
     
     class Meta:
         ordering = ['-received_at']
         indexes = [
             models.Index(fields=['event_sid']),
             models.Index(fields=['event_type', 'received_at']),
-            models.Index(fields=['processed']),
+            models.Index(fields=['processed', 'received_at']),
+        ]
+        constraints = [
+            # A carrier retry repeats all three; see webhooks.log_event
+            models.UniqueConstraint(
+                fields=['event_sid', 'event_type', 'status'], name='unique_webhook_event'
+            ),
         ]
     
     def __str__(self):
@@ -342,7 +461,136 @@ class Notification(models.Model):
         ordering = ['-created_at']
         indexes = [
             models.Index(fields=['user', 'is_read', 'created_at']),
+            models.Index(fields=['user', 'created_at']),
+        ]
+    
+    def __str__(self):
+        return f"{self.user.email}: {self.title}"
+
+# Denormalized per-user counters for the dashboard
+class UserUsageCounter(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='usage_counter')
+    active_numbers = models.IntegerField(default=0)
+    total_sms = models.BigIntegerField(default=0)
+    total_calls = models.BigIntegerField(default=0)
+    unread_notifications = models.IntegerField(default=0)
+    pending_transactions = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    COUNTER_FIELDS = (
+        'active_numbers',
+        'total_sms',
+        'total_calls',
+        'unread_notifications',
+        'pending_transactions',
+    )
+    
+    def __str__(self):
+        return f"Counters: {self.user.email}"
+
+
+# Marketplace dropdown facets (available numbers per country / locality)
+class MarketplaceFacet(models.Model):
+    iso_country = models.CharField(max_length=5)
+    locality = models.CharField(max_length=50, blank=True, default='')  # '' = whole country
+    available_count = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['iso_country', 'locality']
+        unique_together = ['iso_country', 'locality']
+    
+    def __str__(self):
+        return f"{self.iso_country}/{self.locality or '*'}: {self.available_count}"
+
+
+# Per-user daily usage rollup for analytics (see rollups.py)
+class UserDailyUsage(models.Model):
+    CHANNEL_CHOICES = (
+        ("sms", "SMS"),
+        ("call", "Call"),
+        ("wallet", "Wallet"),
+    )
+    
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='daily_usage')
+    day = models.DateField()  # in the user's timezone
+    channel = models.CharField(max_length=10, choices=CHANNEL_CHOICES)
+    direction = models.CharField(max_length=20)  # inbound/outbound, or tx_type for wallet rows
+    
+    count = models.IntegerField(default=0)
+    segments = models.IntegerField(default=0)
+    duration = models.BigIntegerField(default=0)  # in seconds
+    spend = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    
+    class Meta:
+        ordering = ['day']
+        unique_together = ['user', 'day', 'channel', 'direction']
+    
+    def __str__(self):
+        return f"{self.user_id} {self.day} {self.channel}/{self.direction}: {self.count}"
+
+
+# Platform-wide running totals for the admin dashboard, sharded to spread
+# write contention; a counter's value is the sum of its shards (see platform_stats.py)
+class PlatformCounter(models.Model):
+    name = models.CharField(max_length=40)
+    shard = models.SmallIntegerField(default=0)
+    value = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['name', 'shard']
+    
+    def __str__(self):
+        return f"{self.name}[{self.shard}]: {self.value}"
+
+
+# Platform-wide per-day totals (site timezone): signups, SMS/call volume, amounts by tx_type
+class PlatformDailyStat(models.Model):
+    day = models.DateField()
+    metric = models.CharField(max_length=40)
+    shard = models.SmallIntegerField(default=0)
+    value = models.DecimalField(max_digits=20, decimal_places=4, default=0)
+    
+    class Meta:
+        ordering = ['day']
+        unique_together = ['day', 'metric', 'shard']
+    
+    def __str__(self):
+        return f"{self.day} {self.metric}[{self.shard}]: {self.value}"
+
+
+# Lifetime usage per phone number for leaderboards and the number detail page (see rollups.py)
+class PhoneNumberUsage(models.Model):
+    phone_number = models.OneToOneField(UserPhoneNumber, on_delete=models.CASCADE, primary_key=True, related_name='usage')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='number_usage')
+    
+    sms_inbound = models.IntegerField(default=0)
+    sms_outbound = models.IntegerField(default=0)
+    sms_count = models.IntegerField(default=0)
+    calls_inbound = models.IntegerField(default=0)
+    calls_outbound = models.IntegerField(default=0)
+    call_count = models.IntegerField(default=0)
+    call_duration = models.BigIntegerField(default=0)  # in seconds
+    spend = models.DecimalField(max_digits=14, decimal_places=4, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'sms_count']),
+            models.Index(fields=['user', 'call_duration']),
         ]
     
     def __str__(self):
-        return f"{self.user.email}: {self.title}"
\ No newline at end of file
+        return f"Usage: {self.phone_number_id}"
+
+
+# Latest metrics snapshot of a background worker (inventory refresh, webhook
+# replay), written by the worker so any web process can report it (see worker_metrics.py)
+class WorkerMetrics(models.Model):
+    name = models.CharField(max_length=40, unique=True)
+    stats = models.JSONField(default=dict, encoder=DjangoJSONEncoder)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} @ {self.updated_at}"
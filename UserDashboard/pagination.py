@@ -0,0 +1,287 @@
+# pagination.py
+import base64
+import binascii
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from uuid import UUID
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.core.paginator import EmptyPage
+from django.db import connections
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def _encode_value(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, (UUID, Decimal)):
+        return str(value)
+    return value
+
+
+def encode_cursor(values, direction, number=None):
+    """
+    Pack ordering values and a direction ('n' or 'p') into a URL-safe token,
+    optionally with the number of the page the token leads to
+    """
+    payload = {'v': [_encode_value(value) for value in values], 'd': direction}
+    if number is not None:
+        payload['i'] = number
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Unpack a token made by encode_cursor into (values, direction, number)"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        values, direction = payload['v'], payload['d']
+        number = payload.get('i')
+    except (ValueError, KeyError, TypeError, AttributeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if direction not in ('n', 'p') or not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    if not isinstance(number, int) or number < 1:
+        number = None
+    return values, direction, number
+
+
+def keyset_filter(ordering, values, after=True):
+    """
+    Build the WHERE clause selecting rows strictly after (or before) the
+    position `values` in `ordering`, i.e. a lexicographic tuple comparison
+    that the database can answer from a matching index.
+    """
+    condition = Q()
+    equal = Q()
+    for name, value in zip(ordering, values):
+        field = name.lstrip('-')
+        descending = name.startswith('-')
+        lookup = 'lt' if descending == after else 'gt'
+        condition |= equal & Q(**{f'{field}__{lookup}': value})
+        equal &= Q(**{field: value})
+    return condition
+
+
+def reverse_ordering(ordering):
+    return tuple(name[1:] if name.startswith('-') else f'-{name}' for name in ordering)
+
+
+class CursorPage:
+    """
+    A page of results that quacks like django.core.paginator.Page. `number`
+    is carried along in the cursors, so it counts the pages walked from the
+    first one; links must still use next_cursor/previous_cursor, since a
+    keyset page cannot be reached by its number.
+    """
+
+    def __init__(self, object_list, paginator, has_next, has_previous, number=1):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.number = number if has_previous else 1
+
+    def __repr__(self):
+        return f'<CursorPage {self.number} of {len(self.object_list)} items>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    def next_page_number(self):
+        if not self._has_next:
+            raise EmptyPage('That page contains no results')
+        return self.number + 1
+
+    def previous_page_number(self):
+        if not self._has_previous:
+            raise EmptyPage('That page number is less than 1')
+        return self.number - 1
+
+    def start_index(self):
+        """1-based index of the first object on this page, 0 if it is empty"""
+        if not self.object_list:
+            return 0
+        return (self.number - 1) * self.paginator.per_page + 1
+
+    def end_index(self):
+        """1-based index of the last object on this page, 0 if it is empty"""
+        if not self.object_list:
+            return 0
+        return self.start_index() + len(self.object_list) - 1
+
+    @property
+    def next_cursor(self):
+        if not self._has_next or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[-1], 'n', self.number + 1)
+
+    @property
+    def previous_cursor(self):
+        if not self._has_previous or not self.object_list:
+            return None
+        return self.paginator.cursor_for(self.object_list[0], 'p', self.number - 1)
+
+    @property
+    def total_count(self):
+        return self.paginator.count
+
+    @property
+    def count_is_exact(self):
+        return self.paginator.count_is_exact
+
+
+class CursorPaginator:
+    """
+    Keyset paginator: each page is an index range scan continuing from the
+    last row seen, so there is no OFFSET and no COUNT(*) per page turn.
+
+    `ordering` must end in a unique column (normally pk). `count` is one of
+    None (no total), 'capped' (count at most `count_cap` rows) or
+    'estimated' (planner estimate where available, capped count otherwise).
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-pk'),
+                 count=None, count_cap=1000):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.count_mode = count
+        self.count_cap = count_cap
+        self._count = None
+        self.count_is_exact = True
+
+    def get_page(self, cursor=None):
+        """Return the page at `cursor`, falling back to the first page"""
+        values, direction, number = None, 'n', None
+        if cursor:
+            try:
+                values, direction, number = decode_cursor(cursor)
+                values = self._to_python(values)
+            except InvalidCursor:
+                values, direction, number = None, 'n', None
+
+        queryset = self.queryset
+        if values is None:
+            rows = list(queryset.order_by(*self.ordering)[:self.per_page + 1])
+            has_more = len(rows) > self.per_page
+            return CursorPage(rows[:self.per_page], self, has_more, False)
+
+        if direction == 'n':
+            rows = list(
+                queryset.filter(keyset_filter(self.ordering, values, after=True))
+                .order_by(*self.ordering)[:self.per_page + 1]
+            )
+            has_more = len(rows) > self.per_page
+            return CursorPage(rows[:self.per_page], self, has_more, True, number or 2)
+
+        rows = list(
+            queryset.filter(keyset_filter(self.ordering, values, after=False))
+            .order_by(*reverse_ordering(self.ordering))[:self.per_page + 1]
+        )
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        rows.reverse()
+        return CursorPage(rows, self, True, has_more, number or 1)
+
+    def cursor_for(self, obj, direction, number=None):
+        return encode_cursor(
+            [self._value_of(obj, name.lstrip('-')) for name in self.ordering],
+            direction,
+            number,
+        )
+
+    @property
+    def count(self):
+        if self.count_mode is None:
+            return None
+        if self._count is None:
+            if self.count_mode == 'estimated':
+                self._count = self._estimated_count()
+            if self._count is None:
+                self._count = self._capped_count()
+        return self._count
+
+    @property
+    def num_pages(self):
+        """
+        Pages in the (possibly capped or estimated) count, None without one.
+        Check count_is_exact before presenting it as the last page.
+        """
+        if self.count is None:
+            return None
+        return max(1, -(-self.count // self.per_page))
+
+    def _capped_count(self):
+        total = self.queryset.order_by()[:self.count_cap + 1].count()
+        self.count_is_exact = total <= self.count_cap
+        return min(total, self.count_cap)
+
+    def _estimated_count(self):
+        """Ask the PostgreSQL planner for its row estimate"""
+        connection = connections[self.queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+        sql, params = self.queryset.order_by().query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        self.count_is_exact = False
+        return int(plan[0]['Plan']['Plan Rows'])
+
+    def _model_field(self, name):
+        opts = self.queryset.model._meta
+        if name == 'pk':
+            return opts.pk
+        try:
+            return opts.get_field(name)
+        except FieldDoesNotExist:
+            # Annotation (e.g. a search rank): JSON already round-trips it
+            return None
+
+    def _value_of(self, obj, name):
+        if name == 'pk':
+            return obj.pk
+        field = self._model_field(name)
+        if field is not None and field.is_relation:
+            return getattr(obj, field.attname)
+        return getattr(obj, name)
+
+    def _to_python(self, values):
+        if len(values) != len(self.ordering):
+            raise InvalidCursor(values)
+        converted = []
+        for name, value in zip(self.ordering, values):
+            field = self._model_field(name.lstrip('-'))
+            if field is not None:
+                if field.is_relation:
+                    field = field.target_field
+                try:
+                    value = field.to_python(value)
+                except ValidationError:
+                    raise InvalidCursor(values)
+            converted.append(value)
+        return converted
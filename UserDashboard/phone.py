@@ -0,0 +1,70 @@
+# phone.py
+import re
+
+from django.conf import settings
+from django.db.models import Q
+
+NON_DIGITS_RE = re.compile(r'\D')
+
+# Sorts immediately after '9', closing the range of strings starting with a prefix
+DIGIT_RANGE_END = ':'
+
+
+def default_country_code():
+    return str(getattr(settings, 'PHONE_DEFAULT_COUNTRY_CODE', '1'))
+
+
+def normalize_e164(number, country_code=None):
+    """
+    Best-effort E.164 form of a free-form phone number ('+15551234567').
+    Returns '' for values that are not phone numbers (e.g. alphanumeric
+    sender IDs). National numbers get `country_code` (default from
+    settings.PHONE_DEFAULT_COUNTRY_CODE).
+    """
+    if not number:
+        return ''
+
+    raw = str(number).strip()
+    digits = NON_DIGITS_RE.sub('', raw)
+    if not digits or re.search(r'[A-Za-z]', raw):
+        return ''
+
+    if raw.startswith('+'):
+        pass
+    elif digits.startswith('00'):
+        digits = digits[2:]
+    else:
+        country_code = country_code or default_country_code()
+        national = digits.lstrip('0')
+        if country_code == '1' and len(digits) == 11 and digits.startswith('1'):
+            pass
+        elif len(national) >= 7:
+            digits = country_code + national
+
+    if not 3 <= len(digits) <= 15:
+        return ''
+    return f'+{digits}'
+
+
+def reversed_digits(number):
+    """Digits of an E.164 number in reverse, so suffixes become indexable prefixes"""
+    return NON_DIGITS_RE.sub('', number or '')[::-1]
+
+
+def suffix_q(fields, query):
+    """
+    Match rows whose number ends with the digits in `query`, as an index
+    range scan over the reversed-digit columns in `fields`.
+    """
+    digits = NON_DIGITS_RE.sub('', query or '')
+    if not digits:
+        return Q(pk__in=[])
+
+    prefix = digits[::-1]
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{
+            f'{field}__gte': prefix,
+            f'{field}__lt': prefix + DIGIT_RANGE_END,
+        })
+    return condition
@@ -0,0 +1,209 @@
+# platform_stats.py
+import random
+from datetime import timedelta
+from decimal import Decimal
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Round, TruncDate
+from django.utils import timezone
+
+from .models import (
+    CallLog, PlatformCounter, PlatformDailyStat, SMSMessage, UserPhoneNumber,
+    WalletTransaction,
+)
+
+User = get_user_model()
+
+# Transaction types the admin dashboard counts as revenue
+REVENUE_TYPES = ('purchase', 'sms', 'mms', 'call', 'renewal')
+
+COUNTERS = ('total_users', 'active_users', 'total_numbers', 'total_sms', 'total_calls', 'total_revenue')
+
+
+def shard_count():
+    return getattr(settings, 'PLATFORM_STATS_SHARDS', 8)
+
+
+def _day(moment):
+    return timezone.localdate(moment) if moment else None
+
+
+def record(counter_deltas, daily_deltas, instance, sign=1):
+    """Accumulate what one row adds to (sign=1) or removes from (sign=-1) the platform stats"""
+    def count(name, delta=1):
+        counter_deltas[name] = counter_deltas.get(name, 0) + sign * delta
+
+    def daily(moment, metric, delta=1):
+        day = _day(moment)
+        if day is not None:
+            daily_deltas[(day, metric)] = daily_deltas.get((day, metric), 0) + sign * delta
+
+    if isinstance(instance, User):
+        count('total_users')
+        if instance.is_active:
+            count('active_users')
+        daily(instance.date_joined, 'signups')
+    elif isinstance(instance, UserPhoneNumber):
+        count('total_numbers')
+        daily(instance.purchased_at, 'numbers')
+    elif isinstance(instance, SMSMessage):
+        count('total_sms')
+        daily(instance.created_at, f'sms_{instance.direction}')
+    elif isinstance(instance, CallLog):
+        count('total_calls')
+        daily(instance.start_time, f'calls_{instance.direction}')
+    elif isinstance(instance, WalletTransaction):
+        amount = Decimal(instance.amount or 0)
+        if instance.tx_type in REVENUE_TYPES:
+            count('total_revenue', amount)
+        daily(instance.created_at, f'amount:{instance.tx_type}', amount)
+
+
+def _increment(rows, create, delta):
+    """Add `delta` to one shard row, creating it on first use"""
+    # Round keeps SQLite, which does decimal arithmetic in floats, exact
+    if rows.update(value=Round(F('value') + delta, 4)):
+        return
+    try:
+        with transaction.atomic():
+            create(value=delta)
+    except IntegrityError:
+        rows.update(value=Round(F('value') + delta, 4))
+
+
+def apply(counter_deltas, daily_deltas):
+    """
+    Fold deltas into a randomly chosen shard of each row, so concurrent
+    writers rarely queue on the same row lock.
+    """
+    shard = random.randrange(shard_count())
+    for name, delta in counter_deltas.items():
+        if delta:
+            _increment(
+                PlatformCounter.objects.filter(name=name, shard=shard),
+                lambda **values: PlatformCounter.objects.create(name=name, shard=shard, **values),
+                delta,
+            )
+    for (day, metric), delta in daily_deltas.items():
+        if delta:
+            _increment(
+                PlatformDailyStat.objects.filter(day=day, metric=metric, shard=shard),
+                lambda **values: PlatformDailyStat.objects.create(day=day, metric=metric, shard=shard, **values),
+                delta,
+            )
+
+
+def totals():
+    """Current running totals: one GROUP BY over a few dozen shard rows"""
+    values = dict.fromkeys(COUNTERS, 0)
+    for row in PlatformCounter.objects.order_by().values('name').annotate(total=Sum('value')):
+        values[row['name']] = row['total']
+    for name in COUNTERS:
+        if name != 'total_revenue':
+            values[name] = int(values[name])
+    values['total_revenue'] = Decimal(values['total_revenue']).quantize(Decimal('0.01'))
+    return values
+
+
+def daily(days=30):
+    """
+    The last `days` days, oldest first, as dicts with signups, numbers,
+    sms_inbound/outbound, calls_inbound/outbound, revenue and the
+    per-tx_type amounts under 'amounts'.
+    """
+    today = timezone.localdate()
+    first = today - timedelta(days=days - 1)
+    series = {
+        first + timedelta(days=offset): {
+            'date': first + timedelta(days=offset), 'signups': 0, 'numbers': 0,
+            'sms_inbound': 0, 'sms_outbound': 0, 'calls_inbound': 0, 'calls_outbound': 0,
+            'revenue': Decimal('0.00'), 'amounts': {},
+        }
+        for offset in range(days)
+    }
+    rows = PlatformDailyStat.objects.filter(day__gte=first).order_by().values(
+        'day', 'metric'
+    ).annotate(total=Sum('value'))
+    for row in rows:
+        point = series.get(row['day'])
+        if point is None:
+            continue
+        metric, total = row['metric'], row['total']
+        if metric.startswith('amount:'):
+            tx_type = metric.split(':', 1)[1]
+            total = Decimal(total).quantize(Decimal('0.01'))
+            point['amounts'][tx_type] = total
+            if tx_type in REVENUE_TYPES:
+                point['revenue'] += total
+        elif metric in point:
+            point[metric] = int(total)
+    return list(series.values())
+
+
+def compute_daily(since=None):
+    """{(day, metric): value} aggregated from the raw tables"""
+    sources = (
+        (User.objects.all(), 'date_joined', None, lambda row: 'signups', Count('pk')),
+        (UserPhoneNumber.objects.all(), 'purchased_at', None, lambda row: 'numbers', Count('pk')),
+        (SMSMessage.objects.all(), 'created_at', 'direction',
+         lambda row: f"sms_{row['direction']}", Count('pk')),
+        (CallLog.objects.all(), 'start_time', 'direction',
+         lambda row: f"calls_{row['direction']}", Count('pk')),
+        (WalletTransaction.objects.all(), 'created_at', 'tx_type',
+         lambda row: f"amount:{row['tx_type']}", Sum('amount')),
+    )
+    values = {}
+    for queryset, time_field, group_field, metric, aggregate in sources:
+        if since is not None:
+            queryset = queryset.filter(**{f'{time_field}__date__gte': since})
+        fields = ['day'] + ([group_field] if group_field else [])
+        grouped = queryset.order_by().annotate(day=TruncDate(time_field)).values(*fields).annotate(
+            total=aggregate
+        )
+        for row in grouped:
+            values[(row['day'], metric(row))] = row['total'] or 0
+    return values
+
+
+def compute_counters():
+    """Running totals counted from the raw tables (full scans; for rebuilds only)"""
+    return {
+        'total_users': User.objects.count(),
+        'active_users': User.objects.filter(is_active=True).count(),
+        'total_numbers': UserPhoneNumber.objects.count(),
+        'total_sms': SMSMessage.objects.count(),
+        'total_calls': CallLog.objects.count(),
+        'total_revenue': WalletTransaction.objects.filter(
+            tx_type__in=REVENUE_TYPES
+        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00'),
+    }
+
+
+def rebuild(since=None, counters=True):
+    """
+    Recompute the platform stats from the raw tables: daily rows from
+    `since` (a date; all history when None) and, unless `counters` is
+    False, the running totals. Values collapse onto shard 0.
+    """
+    daily_values = compute_daily(since)
+    counter_values = compute_counters() if counters else None
+
+    with transaction.atomic():
+        stale = PlatformDailyStat.objects.all()
+        if since is not None:
+            stale = stale.filter(day__gte=since)
+        stale.delete()
+        PlatformDailyStat.objects.bulk_create([
+            PlatformDailyStat(day=day, metric=metric, value=value)
+            for (day, metric), value in daily_values.items()
+        ], batch_size=1000)
+
+        if counter_values is not None:
+            PlatformCounter.objects.filter(~Q(shard=0) | ~Q(name__in=COUNTERS)).delete()
+            for name, value in counter_values.items():
+                PlatformCounter.objects.update_or_create(name=name, shard=0, defaults={'value': value})
+
+    return len(daily_values)
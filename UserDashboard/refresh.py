@@ -0,0 +1,189 @@
+# refresh.py
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import facets, vanity, worker_metrics
+from .inventory import InventoryRowError, InventoryWriter, parse_row
+from .inventory_sources import get_inventory_source
+from .models import AvailablePhoneNumber
+
+logger = logging.getLogger(__name__)
+
+
+def stale_after():
+    """Seconds after which an inventory row not seen by a refresh is evicted"""
+    return getattr(settings, 'INVENTORY_STALE_AFTER', 86400)
+
+
+def touch_after():
+    """
+    Seconds an unchanged row's fetched_at may lag before a refresh restamps
+    it; keep well under INVENTORY_STALE_AFTER
+    """
+    return getattr(settings, 'INVENTORY_TOUCH_AFTER', 3600)
+
+
+class RefreshMetrics:
+    """Progress and per-page timings of the current (or last) refresh pass"""
+
+    COUNTERS = ['pages_total', 'pages_done', 'pages_failed', 'rows', 'invalid',
+                'created', 'updated', 'unchanged', 'skipped', 'evicted']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = dict.fromkeys(self.COUNTERS, 0)
+            self._fetch_times = []
+            self._write_times = []
+            self._stats.update(running=False, started_at=None, finished_at=None)
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def set(self, **values):
+        with self._lock:
+            self._stats.update(values)
+
+    def page(self, fetch_seconds, write_seconds):
+        with self._lock:
+            self._stats['pages_done'] += 1
+            self._fetch_times.append(fetch_seconds)
+            self._write_times.append(write_seconds)
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self._stats)
+            fetch_times, write_times = list(self._fetch_times), list(self._write_times)
+        for name, times in (('fetch', fetch_times), ('write', write_times)):
+            stats[f'page_{name}_avg'] = sum(times) / len(times) if times else 0.0
+            stats[f'page_{name}_max'] = max(times, default=0.0)
+            stats[f'page_{name}_last'] = times[-1] if times else 0.0
+        stats['progress'] = (
+            stats['pages_done'] / stats['pages_total'] if stats['pages_total'] else 0.0
+        )
+        for key in ('started_at', 'finished_at'):
+            if stats[key] is not None:
+                stats[key] = stats[key].isoformat()
+        return stats
+
+
+metrics = RefreshMetrics()
+
+
+def evict_stale(ttl=None, now=None):
+    """
+    Take available numbers not refreshed within `ttl` seconds off the
+    market in one UPDATE. Numbers under an active checkout hold are left
+    for the next pass. Returns (evicted count, affected countries).
+    """
+    now = now or timezone.now()
+    ttl = stale_after() if ttl is None else ttl
+    stale = AvailablePhoneNumber.objects.filter(
+        is_available=True, fetched_at__lt=now - timedelta(seconds=ttl)
+    ).filter(Q(reserved_until__isnull=True) | Q(reserved_until__lte=now))
+    countries = set(stale.order_by().values_list('iso_country', flat=True).distinct())
+    with transaction.atomic():
+        vanity.unindex(stale.values('pk'))
+        return stale.update(is_available=False), countries
+
+
+class InventoryRefresher:
+    """
+    One refresh pass: pages are fetched by a bounded pool of threads while
+    this thread writes them through InventoryWriter, so only changed rows
+    are rewritten and unchanged ones get a fresh fetched_at once it is
+    older than touch_after(). At most `max_workers * 2` fetched pages are
+    held in memory at once.
+    """
+
+    def __init__(self, source=None, max_workers=None, ttl=None, metrics=metrics):
+        self.source = source or get_inventory_source()
+        self.max_workers = max_workers or getattr(settings, 'INVENTORY_REFRESH_WORKERS', 4)
+        self.ttl = ttl
+        self.metrics = metrics
+        self.publish = worker_metrics.Publisher('inventory_refresh', metrics)
+
+    def _fetch(self, key):
+        started = time.monotonic()
+        records = self.source.fetch(key)
+        return records, time.monotonic() - started
+
+    def _write(self, writer, records):
+        rows = []
+        for record in records:
+            try:
+                rows.append(parse_row(record))
+            except InventoryRowError as exc:
+                logger.warning('Skipping inventory record: %s', exc)
+                self.metrics.add(invalid=1)
+        if rows:
+            created, updated, unchanged = writer.write(rows)
+            self.metrics.add(rows=len(rows), created=created, updated=updated, unchanged=unchanged)
+
+    def run_once(self):
+        self.metrics.reset()
+        self.metrics.set(running=True, started_at=timezone.now())
+        self.publish(force=True)
+        writer = InventoryWriter(touch_after=touch_after())
+        try:
+            keys = list(self.source.page_keys())
+            self.metrics.set(pages_total=len(keys))
+            keys = iter(keys)
+
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = set()
+                while True:
+                    for key in keys:
+                        pending.add(pool.submit(self._fetch, key))
+                        if len(pending) >= self.max_workers * 2:
+                            break
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        try:
+                            records, fetch_seconds = future.result()
+                        except Exception:
+                            logger.exception('Inventory page fetch failed')
+                            self.metrics.add(pages_failed=1)
+                            continue
+                        started = time.monotonic()
+                        self._write(writer, records)
+                        self.metrics.page(fetch_seconds, time.monotonic() - started)
+                        self.publish()
+
+            # Eviction relies on every seen row having been stamped; skip it after a partial pass
+            evicted, countries = 0, set()
+            if not self.metrics.snapshot()['pages_failed']:
+                evicted, countries = evict_stale(self.ttl)
+            self.metrics.add(evicted=evicted, skipped=writer.stats['skipped'])
+            if writer.countries or countries:
+                facets.rebuild_facets(writer.countries | countries)
+        finally:
+            # The pool's threads are gone; drop the connections they opened
+            self.source.close()
+            self.metrics.set(running=False, finished_at=timezone.now())
+            self.publish(force=True)
+        return self.metrics.snapshot()
+
+    def run_forever(self, stop_event, interval=300):
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Inventory refresh failed')
+            stop_event.wait(interval)
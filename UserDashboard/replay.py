@@ -0,0 +1,208 @@
+# replay.py
+import logging
+import threading
+import uuid
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import Q
+from django.utils import timezone
+
+from . import webhooks, worker_metrics
+from .models import TwilioWebhookLog
+from .pagination import keyset_filter
+
+logger = logging.getLogger(__name__)
+
+
+def max_attempts():
+    """Failed replays after which a log is dead-lettered"""
+    return getattr(settings, 'WEBHOOK_REPLAY_MAX_ATTEMPTS', 8)
+
+
+def backoff(attempts):
+    """Seconds to wait before retry number `attempts` + 1: doubling from a base, capped"""
+    base = getattr(settings, 'WEBHOOK_REPLAY_BACKOFF', 30)
+    cap = getattr(settings, 'WEBHOOK_REPLAY_BACKOFF_MAX', 6 * 3600)
+    return min(cap, base * 2 ** max(attempts - 1, 0))
+
+
+def replayable(now=None, grace=300):
+    """
+    Unprocessed, live logs due for another try: those that failed, and
+    those nobody applied within `grace` seconds (e.g. the request died
+    after logging). Logs an ingestion worker (or another replay) has
+    claimed are left to it.
+    """
+    now = now or timezone.now()
+    return TwilioWebhookLog.objects.filter(
+        processed=False, dead_letter=False, claimed_at__isnull=True
+    ).filter(
+        Q(next_attempt_at__isnull=True) | Q(next_attempt_at__lte=now)
+    ).filter(
+        Q(processing_error__isnull=False) | Q(received_at__lt=now - timedelta(seconds=grace))
+    )
+
+
+def record_failures(logs, now=None):
+    """Count a failed attempt on each log: schedule its next try or dead-letter it"""
+    now = now or timezone.now()
+    limit = max_attempts()
+    for log in logs:
+        log.attempts += 1
+        log.claimed_at = log.claim_token = None
+        if log.attempts >= limit:
+            log.dead_letter = True
+            log.next_attempt_at = None
+        else:
+            log.next_attempt_at = now + timedelta(seconds=backoff(log.attempts))
+    TwilioWebhookLog.objects.bulk_update(
+        logs, ['attempts', 'next_attempt_at', 'dead_letter', 'processing_error', 'claimed_at', 'claim_token'],
+        batch_size=500,
+    )
+    return sum(1 for log in logs if log.dead_letter)
+
+
+def claim(logs):
+    """
+    Claim the logs nobody has claimed since they were read, under a fresh
+    token, and return those, so an ingestion worker and the replayer
+    never apply the same log at once
+    """
+    token = uuid.uuid4()
+    ids = [log.pk for log in logs]
+    TwilioWebhookLog.objects.filter(pk__in=ids, processed=False, claimed_at__isnull=True).update(
+        claimed_at=timezone.now(), claim_token=token
+    )
+    claimed = set(TwilioWebhookLog.objects.filter(pk__in=ids, claim_token=token).values_list('pk', flat=True))
+    logs = [log for log in logs if log.pk in claimed]
+    for log in logs:
+        log.claim_token = token
+    return logs
+
+
+def replay_batch(logs):
+    """Claim and re-apply a batch; returns (processed, failed, dead_lettered)"""
+    logs = claim(logs)
+    if not logs:
+        return 0, 0, 0
+    try:
+        processed, failed = webhooks.process(logs)
+    except Exception as exc:
+        logger.exception('Webhook replay batch failed')
+        for log in logs:
+            log.processing_error = f'{type(exc).__name__}: {exc}'[:1000]
+        processed, failed = 0, len(logs)
+    dead = record_failures([log for log in logs if not log.processed])
+    return processed, failed, dead
+
+
+class ReplayMetrics:
+    """Totals of the current (or last) replay pass"""
+
+    COUNTERS = ['batches', 'scanned', 'processed', 'failed', 'dead_lettered']
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self._stats = dict.fromkeys(self.COUNTERS, 0)
+            self._stats.update(running=False, started_at=None, finished_at=None)
+
+    def add(self, **deltas):
+        with self._lock:
+            for name, delta in deltas.items():
+                self._stats[name] += delta
+
+    def set(self, **values):
+        with self._lock:
+            self._stats.update(values)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stats)
+
+
+metrics = ReplayMetrics()
+
+
+class Replayer:
+    """
+    Walks replayable logs along the (processed, received_at) index in
+    keyset batches and re-applies them on a pool of worker threads.
+    Run one replayer at a time.
+    """
+
+    def __init__(self, max_workers=4, batch_size=200, grace=300):
+        self.max_workers = max_workers
+        self.batch_size = batch_size
+        self.grace = grace
+        self.metrics = metrics
+        self.publish = worker_metrics.Publisher('webhook_replay', metrics)
+
+    def batches(self):
+        ordering = ('received_at', 'pk')
+        queryset = replayable(grace=self.grace)
+        position = None
+        while True:
+            batch = queryset
+            if position is not None:
+                batch = batch.filter(keyset_filter(ordering, position))
+            logs = list(batch.order_by(*ordering)[:self.batch_size])
+            if not logs:
+                return
+            position = (logs[-1].received_at, logs[-1].pk)
+            yield logs
+
+    def _replay(self, logs):
+        try:
+            return replay_batch(logs)
+        finally:
+            connections.close_all()
+
+    def run_once(self):
+        self.metrics.reset()
+        self.metrics.set(running=True, started_at=timezone.now())
+        self.publish(force=True)
+        try:
+            # Claims left by a replayer or ingestion worker that died
+            webhooks.requeue_stale()
+            batches = self.batches()
+            with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+                pending = set()
+                while True:
+                    for logs in batches:
+                        self.metrics.add(batches=1, scanned=len(logs))
+                        pending.add(pool.submit(self._replay, logs))
+                        if len(pending) >= self.max_workers * 2:
+                            break
+                    if not pending:
+                        break
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        processed, failed, dead = future.result()
+                        self.metrics.add(processed=processed, failed=failed, dead_lettered=dead)
+                    self.publish()
+        finally:
+            self.metrics.set(running=False, finished_at=timezone.now())
+            self.publish(force=True)
+        return self.metrics.snapshot()
+
+    def run_forever(self, stop_event, interval=60):
+        while not stop_event.is_set():
+            close_old_connections()
+            try:
+                self.run_once()
+            except Exception:
+                logger.exception('Webhook replay failed')
+            stop_event.wait(interval)
+
+
+def requeue_dead_letters(queryset=None):
+    """Give dead-lettered logs a fresh set of attempts (e.g. after fixing their cause)"""
+    queryset = TwilioWebhookLog.objects.filter(dead_letter=True) if queryset is None else queryset
+    return queryset.update(dead_letter=False, attempts=0, next_attempt_at=None)
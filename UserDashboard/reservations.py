@@ -0,0 +1,119 @@
+# reservations.py
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import facets, ledger, vanity
+from .models import AvailablePhoneNumber, UserPhoneNumber, Notification
+
+
+class ReservationError(Exception):
+    pass
+
+
+def hold_seconds():
+    return getattr(settings, 'NUMBER_RESERVATION_TTL', 300)
+
+
+def free_for(user, now=None):
+    """Numbers nobody else currently holds"""
+    now = now or timezone.now()
+    return (
+        Q(reserved_until__isnull=True) |
+        Q(reserved_until__lt=now) |
+        Q(reserved_by=user)
+    )
+
+
+def reserve(number_id, user, ttl=None):
+    """
+    Hold a number for `user` with a single conditional UPDATE and return
+    when the hold expires. Re-reserving extends the caller's own hold.
+    Only the row being claimed is touched, so buyers of different numbers
+    never wait on each other.
+    """
+    now = timezone.now()
+    until = now + timedelta(seconds=ttl or hold_seconds())
+    claimed = AvailablePhoneNumber.objects.filter(
+        free_for(user, now), pk=number_id, is_available=True
+    ).update(reserved_by=user, reserved_until=until)
+    if not claimed:
+        raise ReservationError('Number is no longer available')
+    return until
+
+
+def release(number_id, user):
+    """Give up the caller's hold early"""
+    return AvailablePhoneNumber.objects.filter(
+        pk=number_id, reserved_by=user
+    ).update(reserved_by=None, reserved_until=None)
+
+
+def checkout(number_id, user):
+    """
+    Turn the caller's live hold into a purchase: mark the number sold,
+    charge the wallet and create the UserPhoneNumber, all in one
+    transaction. Raises ReservationError if the hold has lapsed and
+    ledger.InsufficientFunds if the wallet is short.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        sold = AvailablePhoneNumber.objects.filter(
+            pk=number_id, is_available=True, reserved_by=user, reserved_until__gte=now
+        ).update(is_available=False, reserved_by=None, reserved_until=None)
+        if not sold:
+            raise ReservationError('Reservation expired')
+
+        number = AvailablePhoneNumber.objects.get(pk=number_id)
+
+        # Generate Twilio SID (in production, this would be from Twilio API)
+        twilio_sid = f"PN{uuid.uuid4().hex[:32].upper()}"
+
+        ledger.debit(
+            user,
+            number.your_price,
+            'purchase',
+            reference=f"PURCHASE-{uuid.uuid4().hex[:8].upper()}",
+            metadata={
+                'phone_number': number.phone_number,
+                'twilio_sid': twilio_sid,
+            }
+        )
+
+        user_number = UserPhoneNumber.objects.create(
+            user=user,
+            twilio_sid=twilio_sid,
+            phone_number=number.phone_number,
+            iso_country=number.iso_country,
+            supports_sms=number.supports_sms,
+            supports_mms=number.supports_mms,
+            supports_voice=number.supports_voice,
+            capabilities=number.capabilities,
+            monthly_price=number.monthly_price,
+            expires_at=now + timedelta(days=30)
+        )
+
+        Notification.objects.create(
+            user=user,
+            notification_type='success',
+            title='Phone Number Purchased',
+            message=f'You have successfully purchased {number.phone_number}',
+            action_url=f'/dashboard/numbers/{user_number.id}/'
+        )
+
+        # The conditional UPDATE skipped signals
+        facets.adjust_facets(number.iso_country, number.locality, -1)
+        vanity.unindex([number_id])
+
+    return user_number
+
+
+def release_expired():
+    """Clear lapsed holds in one bulk UPDATE; returns how many were released"""
+    return AvailablePhoneNumber.objects.filter(
+        reserved_until__lt=timezone.now()
+    ).update(reserved_by=None, reserved_until=None)
@@ -0,0 +1,193 @@
+# retention.py
+import gzip
+import json
+import os
+import time
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import TwilioWebhookLog
+from .pagination import keyset_filter
+
+# Columns written to the archive, in order
+ARCHIVE_FIELDS = [
+    'id', 'event_sid', 'event_type', 'status', 'account_sid', 'payload',
+    'processed', 'processing_error', 'received_at',
+]
+
+
+def retention_days():
+    return getattr(settings, 'WEBHOOK_RETENTION_DAYS', 30)
+
+
+def tombstone_days():
+    """How long an archived log's (sid, type, status) keeps deduplicating late retries"""
+    return max(getattr(settings, 'WEBHOOK_TOMBSTONE_DAYS', 365), retention_days())
+
+
+def archive_root():
+    return Path(getattr(settings, 'WEBHOOK_ARCHIVE_DIR', settings.BASE_DIR / 'archive' / 'webhooks'))
+
+
+def archive_path(root, day):
+    """<root>/YYYY/MM/YYYY-MM-DD.jsonl.gz: one file per UTC day of received_at"""
+    return Path(root) / f'{day:%Y}' / f'{day:%m}' / f'{day:%Y-%m-%d}.jsonl.gz'
+
+
+def compact_payload(payload):
+    """
+    A QueryDict (or a logged dict of lists) with single values unwrapped,
+    e.g. {'MessageSid': 'SM1'} rather than {'MessageSid': ['SM1']}
+    """
+    items = payload.lists() if hasattr(payload, 'lists') else payload.items()
+    return {
+        key: value[0] if isinstance(value, list) and len(value) == 1 else value
+        for key, value in items
+    }
+
+
+def _record(row):
+    record = dict(zip(ARCHIVE_FIELDS, row))
+    record['id'] = str(record['id'])
+    record['payload'] = compact_payload(record['payload'])
+    record['received_at'] = record['received_at'].isoformat()
+    return record
+
+
+def _append(root, day, records):
+    """Append records to a day's file as a new gzip member and fsync it"""
+    path = archive_path(root, day)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records)
+    with open(path, 'ab') as handle:
+        handle.write(gzip.compress(data.encode('utf-8')))
+        handle.flush()
+        os.fsync(handle.fileno())
+
+
+def archive(older_than_days=None, root=None, chunk_size=500, pause=0.0, dry_run=False):
+    """
+    Move processed logs received more than `older_than_days` ago into the
+    archive, `chunk_size` rows at a time: each chunk is appended (and
+    fsynced) to its day files, then cut down to a tombstone with one short
+    UPDATE, with `pause` seconds between chunks so writers can get at the
+    table. Tombstones keep the (event_sid, event_type, status) key, so a
+    carrier retry of an archived event is still seen as a duplicate rather
+    than applied again; purge_tombstones() drops them much later.
+
+    A crash between the two steps re-archives that chunk on the next run,
+    so readers should treat the id as the key. Returns the rows moved.
+    """
+    days = retention_days() if older_than_days is None else older_than_days
+    root = archive_root() if root is None else root
+    cutoff = timezone.now() - timedelta(days=days)
+    ordering = ('received_at', 'pk')
+    queryset = TwilioWebhookLog.objects.filter(
+        processed=True, archived_at__isnull=True, received_at__lt=cutoff
+    )
+
+    moved = 0
+    position = None
+    while True:
+        chunk = queryset
+        if position is not None:
+            chunk = chunk.filter(keyset_filter(ordering, position))
+        rows = list(chunk.order_by(*ordering).values_list(*ARCHIVE_FIELDS)[:chunk_size])
+        if not rows:
+            return moved
+        last = rows[-1]
+        position = (last[ARCHIVE_FIELDS.index('received_at')], last[0])
+
+        if not dry_run:
+            by_day = {}
+            for row in rows:
+                record = _record(row)
+                day = row[ARCHIVE_FIELDS.index('received_at')].astimezone(dt_timezone.utc).date()
+                by_day.setdefault(day, []).append(record)
+            for day, records in by_day.items():
+                _append(root, day, records)
+            TwilioWebhookLog.objects.filter(pk__in=[row[0] for row in rows]).update(
+                payload={}, processing_error=None, account_sid=None, archived_at=timezone.now()
+            )
+        moved += len(rows)
+
+        if pause:
+            time.sleep(pause)
+
+
+def purge_tombstones(older_than_days=None, chunk_size=500, pause=0.0):
+    """
+    Delete archived logs' tombstones received more than `older_than_days`
+    (default tombstone_days()) ago, one short DELETE per chunk. Returns
+    the rows deleted.
+    """
+    days = tombstone_days() if older_than_days is None else older_than_days
+    expired = TwilioWebhookLog.objects.filter(
+        archived_at__isnull=False, received_at__lt=timezone.now() - timedelta(days=days)
+    )
+    purged = 0
+    while True:
+        ids = list(expired.order_by('received_at').values_list('pk', flat=True)[:chunk_size])
+        if not ids:
+            return purged
+        purged += TwilioWebhookLog.objects.filter(pk__in=ids).delete()[0]
+        if pause:
+            time.sleep(pause)
+
+
+def compact_stored(chunk_size=500):
+    """Rewrite payloads logged before compaction in the compact form; returns rows rewritten"""
+    rewritten = 0
+    position = None
+    while True:
+        chunk = TwilioWebhookLog.objects.filter(archived_at__isnull=True)
+        if position is not None:
+            chunk = chunk.filter(pk__gt=position)
+        rows = list(chunk.order_by('pk').only('pk', 'payload')[:chunk_size])
+        if not rows:
+            return rewritten
+        position = rows[-1].pk
+
+        changed = []
+        for row in rows:
+            payload = compact_payload(row.payload)
+            if payload != row.payload:
+                row.payload = payload
+                changed.append(row)
+        TwilioWebhookLog.objects.bulk_update(changed, ['payload'])
+        rewritten += len(changed)
+
+
+def archived_days(root=None, since=None, until=None):
+    """(day, path) of archive files in [since, until], oldest first"""
+    root = Path(archive_root() if root is None else root)
+    days = []
+    for path in root.glob('*/*/*.jsonl.gz'):
+        try:
+            day = date.fromisoformat(path.name[:-len('.jsonl.gz')])
+        except ValueError:
+            continue
+        if (since is None or day >= since) and (until is None or day <= until):
+            days.append((day, path))
+    return sorted(days)
+
+
+def iter_archived(since=None, until=None, root=None, event_sid=None, event_type=None):
+    """
+    Stream archived logs back (dates are UTC days, inclusive), optionally
+    only one SID or event type. Records are dicts as written by archive(),
+    with received_at parsed back into a datetime.
+    """
+    for _, path in archived_days(root, since, until):
+        with gzip.open(path, 'rt', encoding='utf-8') as handle:
+            for line in handle:
+                record = json.loads(line)
+                if event_sid is not None and record['event_sid'] != event_sid:
+                    continue
+                if event_type is not None and record['event_type'] != event_type:
+                    continue
+                record['received_at'] = datetime.fromisoformat(record['received_at'])
+                yield record
@@ -0,0 +1,327 @@
+# rollups.py
+from collections import defaultdict, namedtuple
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import IntegrityError, transaction
+from django.db.models import Count, DecimalField, F, IntegerField, Sum, Value
+from django.db.models.functions import Coalesce, Round, TruncDate
+from django.utils import timezone
+
+from accounts.models import UserProfile
+
+from .models import (
+    CallLog, PhoneNumberUsage, SMSMessage, UserDailyUsage, UserPhoneNumber, WalletTransaction,
+)
+
+Source = namedtuple('Source', [
+    'channel', 'time_field', 'direction_field', 'segments_field', 'duration_field', 'spend_field',
+    'number_field',
+])
+
+# Raw tables rolled up into UserDailyUsage (and, when tied to a number,
+# PhoneNumberUsage), and which of their columns feed the rollups
+SOURCES = {
+    SMSMessage: Source('sms', 'created_at', 'direction', 'segments', None, 'price', 'phone_number_id'),
+    CallLog: Source('call', 'start_time', 'direction', None, 'duration', 'price', 'phone_number_id'),
+    WalletTransaction: Source('wallet', 'created_at', 'tx_type', None, None, 'amount', None),
+}
+
+# PhoneNumberUsage columns fed by each (channel, direction)
+NUMBER_COUNTERS = {
+    ('sms', 'inbound'): ('sms_inbound', 'sms_count'),
+    ('sms', 'outbound'): ('sms_outbound', 'sms_count'),
+    ('call', 'inbound'): ('calls_inbound', 'call_count'),
+    ('call', 'outbound'): ('calls_outbound', 'call_count'),
+}
+
+ZERO = Decimal('0')
+
+
+def tracked_fields(model):
+    source = SOURCES[model]
+    return {'user_id', *(field for field in source[1:] if field)}
+
+
+def snapshot(instance):
+    """The row's rollup-relevant values, cheap enough to take on every post_init"""
+    source = SOURCES[type(instance)]
+    return (
+        instance.user_id,
+        getattr(instance, source.time_field),
+        getattr(instance, source.direction_field),
+        getattr(instance, source.segments_field) if source.segments_field else 0,
+        getattr(instance, source.duration_field) if source.duration_field else 0,
+        getattr(instance, source.spend_field) if source.spend_field else None,
+        getattr(instance, source.number_field) if source.number_field else None,
+    )
+
+
+def _zone_cache():
+    """
+    Cache of users' timezone names: ROLLUPS_ZONE_CACHE names a shared one,
+    so a profile save is seen by every process at once; entries expire
+    after ROLLUPS_ZONE_CACHE_TIMEOUT seconds either way
+    """
+    return caches[getattr(settings, 'ROLLUPS_ZONE_CACHE', None) or 'default']
+
+
+def _zone_key(user_id):
+    return f'user-zone:{user_id}'
+
+
+def user_zone(user_id):
+    """The user's UserProfile.timezone as a ZoneInfo (UTC when unset or unknown)"""
+    cache = _zone_cache()
+    name = cache.get(_zone_key(user_id))
+    if name is None:
+        name = UserProfile.objects.filter(user_id=user_id).values_list('timezone', flat=True).first() or ''
+        cache.set(_zone_key(user_id), name, getattr(settings, 'ROLLUPS_ZONE_CACHE_TIMEOUT', 60))
+    try:
+        return ZoneInfo(name or 'UTC')
+    except (ZoneInfoNotFoundError, ValueError):
+        return ZoneInfo('UTC')
+
+
+def forget_zone(user_id):
+    """Drop a user's cached timezone, e.g. after their profile changed"""
+    _zone_cache().delete(_zone_key(user_id))
+
+
+def local_day(user_id, moment=None):
+    return timezone.localtime(moment or timezone.now(), user_zone(user_id)).date()
+
+
+def contribute(deltas, model, values, sign=1):
+    """Add one row's snapshot() to a {key: [count, segments, duration, spend]} map"""
+    user_id, moment, direction, segments, duration, spend, _ = values
+    if user_id is None or moment is None:
+        return
+    key = (user_id, local_day(user_id, moment), SOURCES[model].channel, direction)
+    totals = deltas.setdefault(key, [0, 0, 0, ZERO])
+    totals[0] += sign
+    totals[1] += sign * (segments or 0)
+    totals[2] += sign * (duration or 0)
+    totals[3] += sign * (spend or ZERO)
+
+
+def apply(deltas):
+    """Fold accumulated deltas into the rollup, one conditional UPDATE per key"""
+    for (user_id, day, channel, direction), (count, segments, duration, spend) in deltas.items():
+        if not (count or segments or duration or spend):
+            continue
+        rows = UserDailyUsage.objects.filter(user_id=user_id, day=day, channel=channel, direction=direction)
+        updates = dict(
+            count=F('count') + count,
+            segments=F('segments') + segments,
+            duration=F('duration') + duration,
+            # Round keeps SQLite, which does decimal arithmetic in floats, exact
+            spend=Round(F('spend') + spend, 4),
+        )
+        if rows.update(**updates) or count <= 0:
+            continue
+        try:
+            with transaction.atomic():
+                UserDailyUsage.objects.create(
+                    user_id=user_id, day=day, channel=channel, direction=direction,
+                    count=count, segments=segments, duration=duration, spend=spend,
+                )
+        except IntegrityError:
+            rows.update(**updates)
+
+
+def _local_midnight(day, zone):
+    return datetime.combine(day, time.min, tzinfo=zone)
+
+
+def compute(user_ids, zone, since=None, until=None):
+    """UserDailyUsage rows for users sharing a timezone, aggregated from the raw tables"""
+    rows = []
+    for model, source in SOURCES.items():
+        queryset = model.objects.filter(user_id__in=user_ids).order_by()
+        if since is not None:
+            queryset = queryset.filter(**{f'{source.time_field}__gte': _local_midnight(since, zone)})
+        if until is not None:
+            queryset = queryset.filter(
+                **{f'{source.time_field}__lt': _local_midnight(until + timedelta(days=1), zone)}
+            )
+
+        zero_spend = Value(ZERO, output_field=DecimalField(max_digits=14, decimal_places=4))
+        aggregates = {
+            'count': Count('pk'),
+            'segments': Coalesce(Sum(source.segments_field), 0) if source.segments_field
+            else Value(0, output_field=IntegerField()),
+            'duration': Coalesce(Sum(source.duration_field), 0) if source.duration_field
+            else Value(0, output_field=IntegerField()),
+            'spend': Coalesce(Sum(source.spend_field), zero_spend),
+        }
+        grouped = queryset.annotate(
+            day=TruncDate(source.time_field, tzinfo=zone)
+        ).values('user_id', 'day', source.direction_field).annotate(**aggregates)
+
+        rows.extend(
+            UserDailyUsage(
+                user_id=row['user_id'], day=row['day'], channel=source.channel,
+                direction=row[source.direction_field], count=row['count'],
+                segments=row['segments'], duration=row['duration'], spend=row['spend'],
+            )
+            for row in grouped
+        )
+    return rows
+
+
+def rebuild(user_ids, since=None, until=None):
+    """
+    Replace users' rollup rows for days in [since, until] (dates in each
+    user's timezone; open-ended when None) with a fresh aggregate of the
+    raw tables. Returns the number of rows written.
+    """
+    by_zone = defaultdict(list)
+    for user_id in user_ids:
+        by_zone[user_zone(user_id)].append(user_id)
+
+    written = 0
+    for zone, zone_users in by_zone.items():
+        rows = compute(zone_users, zone, since, until)
+        with transaction.atomic():
+            stale = UserDailyUsage.objects.filter(user_id__in=zone_users)
+            if since is not None:
+                stale = stale.filter(day__gte=since)
+            if until is not None:
+                stale = stale.filter(day__lte=until)
+            stale.delete()
+            UserDailyUsage.objects.bulk_create(rows, batch_size=1000)
+        written += len(rows)
+    return written
+
+
+def active_users(since):
+    """Users with raw activity or rollup rows on or after `since` (a UTC datetime)"""
+    user_ids = set(
+        UserDailyUsage.objects.filter(day__gte=since.date()).values_list('user_id', flat=True).distinct()
+    )
+    for model, source in SOURCES.items():
+        user_ids.update(
+            model.objects.filter(**{f'{source.time_field}__gte': since}).order_by()
+            .values_list('user_id', flat=True).distinct()
+        )
+    return user_ids
+
+
+def daily_series(user, days):
+    """
+    The last `days` days of a user's usage, today included, shaped like
+    the per-day GROUP BYs analytics_view used to run over the raw tables.
+    """
+    since = local_day(user.pk) - timedelta(days=days - 1)
+    series = {'sms': [], 'call': [], 'wallet': []}
+    for row in UserDailyUsage.objects.filter(user=user, day__gte=since).order_by('day', 'channel', 'direction'):
+        if row.channel == 'sms':
+            series['sms'].append({
+                'date': row.day, 'direction': row.direction, 'count': row.count,
+                'segments': row.segments, 'total_price': row.spend,
+            })
+        elif row.channel == 'call':
+            series['call'].append({
+                'date': row.day, 'direction': row.direction, 'count': row.count,
+                'total_duration': row.duration, 'total_price': row.spend,
+            })
+        else:
+            series['wallet'].append({
+                'date': row.day, 'tx_type': row.direction, 'count': row.count,
+                'total_amount': row.spend,
+            })
+    return series
+
+
+# ==================== PER-NUMBER USAGE ====================
+
+def contribute_number(deltas, model, values, sign=1):
+    """Add one row's snapshot() to a {number_id: {'user_id': .., column: delta}} map"""
+    user_id, _, direction, _, duration, spend, number_id = values
+    columns = NUMBER_COUNTERS.get((SOURCES[model].channel, direction))
+    if number_id is None or columns is None:
+        return
+    totals = deltas.setdefault(number_id, {'user_id': user_id})
+    for column in columns:
+        totals[column] = totals.get(column, 0) + sign
+    totals['call_duration'] = totals.get('call_duration', 0) + sign * (duration or 0)
+    totals['spend'] = totals.get('spend', ZERO) + sign * (spend or ZERO)
+
+
+def apply_numbers(deltas):
+    """Fold accumulated per-number deltas in, one conditional UPDATE per number"""
+    for number_id, totals in deltas.items():
+        totals = dict(totals)
+        user_id = totals.pop('user_id')
+        changes = {column: delta for column, delta in totals.items() if delta}
+        if not changes:
+            continue
+        updates = {
+            column: Round(F(column) + delta, 4) if column == 'spend' else F(column) + delta
+            for column, delta in changes.items()
+        }
+        rows = PhoneNumberUsage.objects.filter(phone_number_id=number_id)
+        if rows.update(**updates):
+            continue
+        # No summary yet (e.g. a number bought before summaries existed): count it from scratch
+        rebuild_numbers([number_id], user_ids={number_id: user_id})
+
+
+def compute_numbers(number_ids):
+    """PhoneNumberUsage values for numbers, aggregated from the raw tables"""
+    values = {number_id: {} for number_id in number_ids}
+    for model, source in SOURCES.items():
+        if not source.number_field:
+            continue
+        aggregates = {'total': Count('pk'), 'spend': Sum(source.spend_field)}
+        if source.duration_field:
+            aggregates['duration'] = Sum(source.duration_field)
+        grouped = model.objects.filter(phone_number_id__in=number_ids).order_by().values(
+            'phone_number_id', source.direction_field
+        ).annotate(**aggregates)
+        for row in grouped:
+            totals = values[row['phone_number_id']]
+            for column in NUMBER_COUNTERS.get((source.channel, row[source.direction_field]), ()):
+                totals[column] = totals.get(column, 0) + row['total']
+            totals['call_duration'] = totals.get('call_duration', 0) + (row.get('duration') or 0)
+            totals['spend'] = totals.get('spend', ZERO) + (row['spend'] or ZERO)
+    return values
+
+
+def rebuild_numbers(number_ids, user_ids=None):
+    """Recount numbers' summaries from the raw tables; `user_ids` maps number ids to owners if known"""
+    number_ids = list(number_ids)
+    if user_ids is None:
+        user_ids = dict(UserPhoneNumber.objects.filter(pk__in=number_ids).values_list('pk', 'user_id'))
+    rows = [
+        PhoneNumberUsage(phone_number_id=number_id, user_id=user_ids[number_id], **totals)
+        for number_id, totals in compute_numbers(number_ids).items()
+        if number_id in user_ids
+    ]
+    with transaction.atomic():
+        PhoneNumberUsage.objects.filter(phone_number_id__in=number_ids).delete()
+        # A concurrent first write may have built the same summary already
+        PhoneNumberUsage.objects.bulk_create(rows, batch_size=1000, ignore_conflicts=True)
+    return len(rows)
+
+
+def top_numbers(user, order_by, limit=5):
+    """
+    The user's numbers ranked by a PhoneNumberUsage column, as
+    UserPhoneNumber objects carrying sms_count, call_count and
+    call_duration; an ORDER BY ... LIMIT on the (user, column) index.
+    """
+    numbers = []
+    for usage in PhoneNumberUsage.objects.filter(user=user).select_related('phone_number').order_by(
+        f'-{order_by}', 'pk'
+    )[:limit]:
+        number = usage.phone_number
+        number.sms_count = usage.sms_count
+        number.call_count = usage.call_count
+        number.call_duration = usage.call_duration
+        numbers.append(number)
+    return numbers
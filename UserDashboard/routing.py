@@ -0,0 +1,145 @@
+# routing.py
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .models import UserPhoneNumber
+from .phone import normalize_e164
+
+Route = namedtuple('Route', [
+    'number_id', 'user_id', 'status', 'supports_sms', 'supports_mms', 'supports_voice',
+])
+
+# Marks "no such number" in the shared cache, which cannot store None distinctly
+NO_ROUTE = 'no-route'
+
+
+class InboundRouter:
+    """
+    Maps an inbound E.164 number to the UserPhoneNumber that owns it.
+
+    Lookups hit an in-process LRU first, then an optional shared Django
+    cache, then the database. Local entries expire after `local_ttl`
+    seconds so other processes' invalidations are picked up; this
+    process's invalidations (purchase, status change, cancellation) take
+    effect immediately.
+    """
+
+    def __init__(self, local_ttl=30, max_entries=100000, negative_ttl=5,
+                 cache_alias=None, cache_timeout=300):
+        self.local_ttl = local_ttl
+        self.max_entries = max_entries
+        self.negative_ttl = negative_ttl
+        self.cache_alias = cache_alias
+        self.cache_timeout = cache_timeout
+        self._routes = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ['local_hits', 'shared_hits', 'misses', 'invalidations'], 0
+        )
+
+    @property
+    def shared_cache(self):
+        return caches[self.cache_alias] if self.cache_alias else None
+
+    def _cache_key(self, e164):
+        return f'inbound-route:{e164}'
+
+    def _count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def resolve(self, phone_number):
+        """Return the Route for an inbound number, or None if nobody owns it"""
+        e164 = normalize_e164(phone_number)
+        if not e164:
+            return None
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._routes.get(e164)
+            if entry is not None and entry[1] > now:
+                self._routes.move_to_end(e164)
+                self._stats['local_hits'] += 1
+                return entry[0]
+
+        shared = self.shared_cache
+        if shared is not None:
+            cached = shared.get(self._cache_key(e164))
+            if cached is not None:
+                self._count('shared_hits')
+                route = None if cached == NO_ROUTE else Route(*cached)
+                self._remember(e164, route)
+                return route
+
+        self._count('misses')
+        route = self._load(e164)
+        self._remember(e164, route)
+        if shared is not None:
+            shared.set(
+                self._cache_key(e164),
+                NO_ROUTE if route is None else tuple(route),
+                self.cache_timeout if route is not None else self.negative_ttl,
+            )
+        return route
+
+    def _load(self, e164):
+        rows = list(
+            UserPhoneNumber.objects.filter(phone_e164=e164)
+            .exclude(status='cancelled')
+            .order_by('-purchased_at')
+            .values_list('id', 'user_id', 'status', 'supports_sms', 'supports_mms', 'supports_voice')
+        )
+        if not rows:
+            return None
+        # A number can be re-bought after suspension; prefer the active holder
+        for row in rows:
+            if row[2] == 'active':
+                return Route(*row)
+        return Route(*rows[0])
+
+    def _remember(self, e164, route):
+        ttl = self.local_ttl if route is not None else self.negative_ttl
+        with self._lock:
+            self._routes[e164] = (route, time.monotonic() + ttl)
+            self._routes.move_to_end(e164)
+            while len(self._routes) > self.max_entries:
+                self._routes.popitem(last=False)
+
+    def invalidate(self, phone_number):
+        """Forget a number locally and in the shared cache"""
+        e164 = normalize_e164(phone_number)
+        if not e164:
+            return
+        with self._lock:
+            self._routes.pop(e164, None)
+            self._stats['invalidations'] += 1
+        shared = self.shared_cache
+        if shared is not None:
+            shared.delete(self._cache_key(e164))
+
+    def clear(self):
+        with self._lock:
+            self._routes.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._routes)
+        lookups = stats['local_hits'] + stats['shared_hits'] + stats['misses']
+        stats['hit_rate'] = (
+            (stats['local_hits'] + stats['shared_hits']) / lookups if lookups else 0.0
+        )
+        return stats
+
+
+router = InboundRouter(
+    local_ttl=getattr(settings, 'INBOUND_ROUTING_LOCAL_TTL', 30),
+    max_entries=getattr(settings, 'INBOUND_ROUTING_MAX_ENTRIES', 100000),
+    negative_ttl=getattr(settings, 'INBOUND_ROUTING_NEGATIVE_TTL', 5),
+    cache_alias=getattr(settings, 'INBOUND_ROUTING_CACHE', None),
+    cache_timeout=getattr(settings, 'INBOUND_ROUTING_CACHE_TIMEOUT', 300),
+)
@@ -0,0 +1,195 @@
+# search.py
+import re
+
+from django.db import connections
+from django.db.models import FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+from .models import SMSMessage
+
+SMS_TABLE = SMSMessage._meta.db_table
+SMS_FTS_TABLE = f'{SMS_TABLE}_fts'
+SMS_TSVECTOR_INDEX = 'UserDashboard_sms_body_tsv'
+
+PHONE_QUERY_RE = re.compile(r'^\+?[\d\s().-]+$')
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+# A bare number shorter than this is more likely a code, amount or year in
+# a message body than the tail of a phone number
+PHONE_QUERY_MIN_DIGITS = 7
+
+
+def is_phone_query(query):
+    """
+    True if the search box holds a (partial) phone number rather than words:
+    a leading '+' with at least three digits, or at least
+    PHONE_QUERY_MIN_DIGITS digits
+    """
+    query = query.strip()
+    if not PHONE_QUERY_RE.match(query):
+        return False
+    digits = sum(char.isdigit() for char in query)
+    if query.startswith('+'):
+        return digits >= 3
+    return digits >= PHONE_QUERY_MIN_DIGITS
+
+
+def _tokens(query):
+    return TOKEN_RE.findall(query)
+
+
+def _fts5_available(connection):
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if cursor.fetchone()[0]:
+            return True
+        # Some builds ship FTS5 without advertising it
+        try:
+            cursor.execute('CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(x)')
+            cursor.execute('DROP TABLE temp.fts5_probe')
+            return True
+        except Exception:
+            return False
+
+
+def search_backend(using='default'):
+    """Name the full-text backend for a database: 'fts5', 'postgres' or None"""
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        return 'postgres'
+    if connection.vendor == 'sqlite':
+        if not hasattr(connection, '_sms_fts5_available'):
+            connection._sms_fts5_available = _fts5_available(connection)
+        if connection._sms_fts5_available:
+            return 'fts5'
+    return None
+
+
+def install_search_index(using='default'):
+    """
+    Create the SMS body index if it is missing. On SQLite this is an FTS5
+    external-content table kept in sync by triggers, on PostgreSQL a GIN
+    index over to_tsvector(body). Safe to run repeatedly.
+    """
+    backend = search_backend(using)
+    connection = connections[using]
+
+    if backend == 'postgres':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS "{SMS_TSVECTOR_INDEX}" ON "{SMS_TABLE}" '
+                f"USING GIN (to_tsvector('simple', body))"
+            )
+        return backend
+
+    if backend != 'fts5':
+        return backend
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = %s",
+            [SMS_FTS_TABLE],
+        )
+        existed = cursor.fetchone() is not None
+        if existed:
+            cursor.execute(f'PRAGMA table_info("{SMS_FTS_TABLE}")')
+            if 'user_id' not in {row[1] for row in cursor.fetchall()}:
+                # Index from before user_id was carried: replace it
+                for suffix in ('ai', 'ad', 'au'):
+                    cursor.execute(f'DROP TRIGGER IF EXISTS "{SMS_FTS_TABLE}_{suffix}"')
+                cursor.execute(f'DROP TABLE "{SMS_FTS_TABLE}"')
+                existed = False
+
+        # user_id rides along UNINDEXED so a search is scoped inside the FTS query
+        cursor.execute(
+            f'CREATE VIRTUAL TABLE IF NOT EXISTS "{SMS_FTS_TABLE}" USING fts5('
+            f"body, user_id UNINDEXED, content='{SMS_TABLE}', content_rowid='id', "
+            f"tokenize='unicode61 remove_diacritics 2')"
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{SMS_FTS_TABLE}_ai" AFTER INSERT ON "{SMS_TABLE}" BEGIN '
+            f'INSERT INTO "{SMS_FTS_TABLE}"(rowid, body, user_id) VALUES (new.id, new.body, new.user_id); END'
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{SMS_FTS_TABLE}_ad" AFTER DELETE ON "{SMS_TABLE}" BEGIN '
+            f'INSERT INTO "{SMS_FTS_TABLE}"("{SMS_FTS_TABLE}", rowid, body, user_id) '
+            f"VALUES ('delete', old.id, old.body, old.user_id); END"
+        )
+        cursor.execute(
+            f'CREATE TRIGGER IF NOT EXISTS "{SMS_FTS_TABLE}_au" AFTER UPDATE OF body, user_id ON "{SMS_TABLE}" BEGIN '
+            f'INSERT INTO "{SMS_FTS_TABLE}"("{SMS_FTS_TABLE}", rowid, body, user_id) '
+            f"VALUES ('delete', old.id, old.body, old.user_id); "
+            f'INSERT INTO "{SMS_FTS_TABLE}"(rowid, body, user_id) VALUES (new.id, new.body, new.user_id); END'
+        )
+
+    if not existed:
+        rebuild_search_index(using)
+    return backend
+
+
+def rebuild_search_index(using='default'):
+    """Repopulate the index from SMSMessage (FTS5 only; GIN indexes maintain themselves)"""
+    if search_backend(using) != 'fts5':
+        return False
+    with connections[using].cursor() as cursor:
+        cursor.execute(f'INSERT INTO "{SMS_FTS_TABLE}"("{SMS_FTS_TABLE}") VALUES (\'rebuild\')')
+    return True
+
+
+def search_messages(queryset, query, user_id=None):
+    """
+    Restrict an SMSMessage queryset to messages whose body matches every
+    word of `query` (as prefixes), annotated with `rank` where higher is a
+    better match. Pass `user_id` so the index is only searched within that
+    user's messages. Page through hits by a keyset on ('-rank', '-pk'),
+    which costs one ranked query per page however deep the reader goes.
+    """
+    tokens = _tokens(query)
+    if not tokens:
+        return queryset.none()
+
+    backend = search_backend(queryset.db)
+
+    if backend == 'fts5':
+        match = ' '.join('"%s"*' % token.replace('"', '""') for token in tokens)
+        scope, params = '', [match]
+        if user_id is not None:
+            scope, params = ' AND user_id = %s', [match, user_id]
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT rowid FROM "{SMS_FTS_TABLE}" WHERE "{SMS_FTS_TABLE}" MATCH %s{scope}',
+                params,
+            )
+        ).annotate(
+            rank=RawSQL(
+                f'(SELECT -bm25("{SMS_FTS_TABLE}") FROM "{SMS_FTS_TABLE}" '
+                f'WHERE "{SMS_FTS_TABLE}" MATCH %s AND rowid = "{SMS_TABLE}"."id")',
+                [match],
+                output_field=FloatField(),
+            )
+        )
+
+    if backend == 'postgres':
+        tsquery = ' & '.join(f'{token}:*' for token in tokens)
+        scope, params = '', [tsquery]
+        if user_id is not None:
+            scope, params = 'user_id = %s AND ', [user_id, tsquery]
+        return queryset.filter(
+            pk__in=RawSQL(
+                f'SELECT id FROM "{SMS_TABLE}" '
+                f"WHERE {scope}to_tsvector('simple', body) @@ to_tsquery('simple', %s)",
+                params,
+            )
+        ).annotate(
+            rank=RawSQL(
+                "ts_rank(to_tsvector('simple', body), to_tsquery('simple', %s))",
+                [tsquery],
+                output_field=FloatField(),
+            )
+        )
+
+    # No full-text support on this database: plain substring match
+    condition = Q()
+    for token in tokens:
+        condition &= Q(body__icontains=token)
+    return queryset.filter(condition).annotate(rank=Value(0.0, output_field=FloatField()))
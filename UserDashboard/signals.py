@@ -0,0 +1,342 @@
+# signals.py
+from collections import Counter
+
+from django.db import transaction
+from django.db.models.signals import post_init, pre_save, post_save, post_delete
+
+from accounts.models import UserProfile
+
+from . import counters, facets, platform_stats, rollups, threads, vanity
+from .dispatch_signals import rows_bulk_created
+from .routing import router
+from .models import (
+    AvailablePhoneNumber, UserPhoneNumber, SMSMessage, CallLog, Notification,
+    WalletTransaction, PhoneNumberUsage, User
+)
+
+# ==================== USAGE COUNTERS ====================
+
+# model -> (counter field, tracked model field, predicate deciding if a row counts)
+COUNTED_MODELS = {
+    UserPhoneNumber: ('active_numbers', 'status', lambda obj: obj.status == 'active'),
+    SMSMessage: ('total_sms', None, lambda obj: True),
+    CallLog: ('total_calls', None, lambda obj: True),
+    Notification: ('unread_notifications', 'is_read', lambda obj: not obj.is_read),
+    WalletTransaction: ('pending_transactions', 'status', lambda obj: obj.status == 'pending'),
+}
+
+
+def _snapshot_counted(sender, instance, **kwargs):
+    """Remember whether a loaded row currently counts, without extra queries"""
+    _, tracked_field, predicate = COUNTED_MODELS[sender]
+    if tracked_field and tracked_field in instance.get_deferred_fields():
+        instance._counted = None
+    else:
+        instance._counted = predicate(instance)
+
+
+def _update_counters_on_save(sender, instance, created, update_fields=None, **kwargs):
+    """Keep the owner's counters in step with inserts and state changes"""
+    counter_field, tracked_field, predicate = COUNTED_MODELS[sender]
+    counted = predicate(instance)
+
+    if created:
+        delta = 1 if counted else 0
+    elif tracked_field is None or getattr(instance, '_counted', None) is None:
+        delta = 0
+    elif update_fields is not None and tracked_field not in update_fields:
+        return
+    else:
+        delta = int(counted) - int(instance._counted)
+
+    instance._counted = counted
+    counters.adjust(instance.user_id, **{counter_field: delta})
+
+
+def _update_counters_on_delete(sender, instance, **kwargs):
+    """Release a deleted row from its owner's counters"""
+    counter_field, _, predicate = COUNTED_MODELS[sender]
+    if getattr(instance, '_counted', None) is False or not predicate(instance):
+        return
+    counters.adjust(instance.user_id, create=False, **{counter_field: -1})
+
+
+def _update_counters_on_bulk_create(sender, instances, **kwargs):
+    """Count bulk-inserted rows with one UPDATE per affected user"""
+    if sender not in COUNTED_MODELS:
+        return
+    counter_field, _, predicate = COUNTED_MODELS[sender]
+    per_user = Counter(obj.user_id for obj in instances if predicate(obj))
+    for user_id, total in per_user.items():
+        counters.adjust(user_id, **{counter_field: total})
+    for obj in instances:
+        obj._counted = predicate(obj)
+
+
+rows_bulk_created.connect(_update_counters_on_bulk_create, dispatch_uid='counters_bulk_create')
+
+for _model in COUNTED_MODELS:
+    post_init.connect(_snapshot_counted, sender=_model, dispatch_uid=f'counters_init_{_model.__name__}')
+    post_save.connect(_update_counters_on_save, sender=_model, dispatch_uid=f'counters_save_{_model.__name__}')
+    post_delete.connect(_update_counters_on_delete, sender=_model, dispatch_uid=f'counters_delete_{_model.__name__}')
+
+
+# ==================== INBOUND ROUTING ====================
+
+def _invalidate_route(sender, instance, **kwargs):
+    """Drop a number's cached route on purchase, status change or cancellation"""
+    phone_number = instance.phone_e164 or instance.phone_number
+    router.invalidate(phone_number)
+    # Again after commit, in case a lookup re-cached the pre-commit row meanwhile
+    transaction.on_commit(lambda: router.invalidate(phone_number))
+
+
+post_save.connect(_invalidate_route, sender=UserPhoneNumber, dispatch_uid='routing_save')
+post_delete.connect(_invalidate_route, sender=UserPhoneNumber, dispatch_uid='routing_delete')
+
+
+# ==================== MARKETPLACE FACETS ====================
+
+FACET_FIELDS = ('is_available', 'iso_country', 'locality')
+
+
+def _facet_state(instance):
+    if instance.is_available:
+        return (instance.iso_country, instance.locality)
+    return None
+
+
+def _snapshot_facet(sender, instance, **kwargs):
+    if instance.get_deferred_fields().intersection(FACET_FIELDS):
+        instance._facet_state = Ellipsis  # unknown
+    else:
+        instance._facet_state = _facet_state(instance)
+
+
+def _update_facets_on_save(sender, instance, created, **kwargs):
+    """Move a number between facets when it is listed, sold or relocated"""
+    before = None if created else getattr(instance, '_facet_state', Ellipsis)
+    after = _facet_state(instance)
+    if before is Ellipsis:
+        # Loaded without the facet fields; recount just its country
+        facets.rebuild_facets([instance.iso_country])
+    elif before != after:
+        if before is not None:
+            facets.adjust_facets(before[0], before[1], -1)
+        if after is not None:
+            facets.adjust_facets(after[0], after[1], 1)
+    instance._facet_state = after
+
+
+def _update_facets_on_delete(sender, instance, **kwargs):
+    state = getattr(instance, '_facet_state', Ellipsis)
+    if state is Ellipsis:
+        facets.rebuild_facets([instance.iso_country])
+    elif state is not None:
+        facets.adjust_facets(state[0], state[1], -1)
+
+
+post_init.connect(_snapshot_facet, sender=AvailablePhoneNumber, dispatch_uid='facets_init')
+post_save.connect(_update_facets_on_save, sender=AvailablePhoneNumber, dispatch_uid='facets_save')
+post_delete.connect(_update_facets_on_delete, sender=AvailablePhoneNumber, dispatch_uid='facets_delete')
+
+
+# ==================== VANITY SEARCH INDEX ====================
+
+VANITY_FIELDS = ('is_available', 'phone_number')
+
+
+def _snapshot_vanity(sender, instance, **kwargs):
+    if instance.get_deferred_fields().intersection(VANITY_FIELDS):
+        instance._vanity_state = Ellipsis  # unknown
+    else:
+        instance._vanity_state = (instance.is_available, instance.phone_number)
+
+
+def _update_vanity_on_save(sender, instance, created, **kwargs):
+    """Postings exist only while a number is on the market"""
+    before = None if created else getattr(instance, '_vanity_state', Ellipsis)
+    after = (instance.is_available, instance.phone_number)
+    if before != after:
+        if before is not None:
+            vanity.unindex([instance.pk])
+        if instance.is_available:
+            vanity.index_numbers([instance])
+    instance._vanity_state = after
+
+
+post_init.connect(_snapshot_vanity, sender=AvailablePhoneNumber, dispatch_uid='vanity_init')
+post_save.connect(_update_vanity_on_save, sender=AvailablePhoneNumber, dispatch_uid='vanity_save')
+
+
+# ==================== DAILY USAGE ROLLUPS ====================
+
+def _snapshot_usage(sender, instance, **kwargs):
+    if instance.get_deferred_fields().intersection(rollups.tracked_fields(sender)):
+        instance._usage = Ellipsis  # unknown
+    else:
+        instance._usage = rollups.snapshot(instance)
+
+
+def _update_usage_on_save(sender, instance, created, **kwargs):
+    """Move a row's contribution when it is created or its price, duration or day changes"""
+    before = None if created else getattr(instance, '_usage', Ellipsis)
+    after = rollups.snapshot(instance)
+    instance._usage = after
+    if before == after:
+        return
+    if before is Ellipsis:
+        # Loaded without the tracked fields; recount the day it now falls on, and its number
+        day = rollups.local_day(instance.user_id, after[1])
+        rollups.rebuild([instance.user_id], since=day, until=day)
+        if after[6] is not None:
+            rollups.rebuild_numbers([after[6]])
+        return
+
+    deltas, number_deltas = {}, {}
+    if before is not None:
+        rollups.contribute(deltas, sender, before, sign=-1)
+        rollups.contribute_number(number_deltas, sender, before, sign=-1)
+    rollups.contribute(deltas, sender, after)
+    rollups.contribute_number(number_deltas, sender, after)
+    rollups.apply(deltas)
+    rollups.apply_numbers(number_deltas)
+
+
+def _update_usage_on_delete(sender, instance, **kwargs):
+    before = getattr(instance, '_usage', Ellipsis)
+    if before is Ellipsis:
+        current = rollups.snapshot(instance)
+        day = rollups.local_day(instance.user_id, current[1])
+        rollups.rebuild([instance.user_id], since=day, until=day)
+        if current[6] is not None:
+            rollups.rebuild_numbers([current[6]])
+        return
+    deltas, number_deltas = {}, {}
+    rollups.contribute(deltas, sender, before, sign=-1)
+    rollups.contribute_number(number_deltas, sender, before, sign=-1)
+    rollups.apply(deltas)
+    rollups.apply_numbers(number_deltas)
+
+
+def _update_usage_on_bulk_create(sender, instances, **kwargs):
+    """Roll bulk-inserted rows up with one UPDATE per user/day/direction and per number"""
+    if sender not in rollups.SOURCES:
+        return
+    deltas, number_deltas = {}, {}
+    for obj in instances:
+        obj._usage = rollups.snapshot(obj)
+        rollups.contribute(deltas, sender, obj._usage)
+        rollups.contribute_number(number_deltas, sender, obj._usage)
+    rollups.apply(deltas)
+    rollups.apply_numbers(number_deltas)
+
+
+def _create_number_usage(sender, instance, created, **kwargs):
+    """Every number gets an (empty) summary so it shows up in the leaderboards"""
+    if created:
+        PhoneNumberUsage.objects.get_or_create(phone_number_id=instance.pk, defaults={'user_id': instance.user_id})
+
+
+def _snapshot_zone(sender, instance, **kwargs):
+    instance._zone = None if 'timezone' in instance.get_deferred_fields() else instance.timezone
+
+
+def _rebucket_on_zone_change(sender, instance, created, **kwargs):
+    """Day buckets follow UserProfile.timezone; re-aggregate the user's history when it changes"""
+    changed = not created and getattr(instance, '_zone', None) != instance.timezone
+    # After commit, so no reader re-caches the old zone in between
+    transaction.on_commit(lambda: rollups.forget_zone(instance.user_id))
+    if changed:
+        transaction.on_commit(lambda: rollups.rebuild([instance.user_id]))
+    instance._zone = instance.timezone
+
+
+rows_bulk_created.connect(_update_usage_on_bulk_create, dispatch_uid='rollups_bulk_create')
+
+for _model in rollups.SOURCES:
+    post_init.connect(_snapshot_usage, sender=_model, dispatch_uid=f'rollups_init_{_model.__name__}')
+    post_save.connect(_update_usage_on_save, sender=_model, dispatch_uid=f'rollups_save_{_model.__name__}')
+    post_delete.connect(_update_usage_on_delete, sender=_model, dispatch_uid=f'rollups_delete_{_model.__name__}')
+
+post_save.connect(_create_number_usage, sender=UserPhoneNumber, dispatch_uid='rollups_number_usage')
+post_init.connect(_snapshot_zone, sender=UserProfile, dispatch_uid='rollups_zone_init')
+post_save.connect(_rebucket_on_zone_change, sender=UserProfile, dispatch_uid='rollups_zone_save')
+
+
+# ==================== PLATFORM STATS ====================
+
+PLATFORM_MODELS = (User, UserPhoneNumber, SMSMessage, CallLog, WalletTransaction)
+
+
+def _snapshot_user_active(sender, instance, **kwargs):
+    instance._platform_active = None if 'is_active' in instance.get_deferred_fields() else instance.is_active
+
+
+def _update_platform_on_save(sender, instance, created, **kwargs):
+    counter_deltas, daily_deltas = {}, {}
+    if created:
+        platform_stats.record(counter_deltas, daily_deltas, instance)
+    elif sender is User:
+        before = getattr(instance, '_platform_active', None)
+        if before is not None and before != instance.is_active:
+            counter_deltas['active_users'] = 1 if instance.is_active else -1
+    if sender is User:
+        instance._platform_active = instance.is_active
+    platform_stats.apply(counter_deltas, daily_deltas)
+
+
+def _update_platform_on_delete(sender, instance, **kwargs):
+    counter_deltas, daily_deltas = {}, {}
+    platform_stats.record(counter_deltas, daily_deltas, instance, sign=-1)
+    platform_stats.apply(counter_deltas, daily_deltas)
+
+
+def _update_platform_on_bulk_create(sender, instances, **kwargs):
+    if sender not in PLATFORM_MODELS:
+        return
+    counter_deltas, daily_deltas = {}, {}
+    for obj in instances:
+        platform_stats.record(counter_deltas, daily_deltas, obj)
+    platform_stats.apply(counter_deltas, daily_deltas)
+
+
+rows_bulk_created.connect(_update_platform_on_bulk_create, dispatch_uid='platform_bulk_create')
+post_init.connect(_snapshot_user_active, sender=User, dispatch_uid='platform_user_init')
+
+for _model in PLATFORM_MODELS:
+    post_save.connect(_update_platform_on_save, sender=_model, dispatch_uid=f'platform_save_{_model.__name__}')
+    post_delete.connect(_update_platform_on_delete, sender=_model, dispatch_uid=f'platform_delete_{_model.__name__}')
+
+
+# ==================== SMS THREADS ====================
+
+def _assign_thread(sender, instance, **kwargs):
+    """File a new message under its conversation before it is inserted"""
+    if instance._state.adding and instance.thread_id is None:
+        threads.assign([instance])
+
+
+def _update_thread_on_save(sender, instance, created, **kwargs):
+    if created:
+        threads.record([instance])
+
+
+def _update_thread_on_delete(sender, instance, **kwargs):
+    threads.forget(instance)
+
+
+def _update_threads_on_bulk_create(sender, instances, **kwargs):
+    """Thread bulk-inserted messages; callers normally assign() before inserting"""
+    if sender is not SMSMessage:
+        return
+    late = threads.assign(instances)
+    if late:
+        SMSMessage.objects.bulk_update(late, ['thread'], batch_size=1000)
+    threads.record(instances)
+
+
+rows_bulk_created.connect(_update_threads_on_bulk_create, dispatch_uid='threads_bulk_create')
+pre_save.connect(_assign_thread, sender=SMSMessage, dispatch_uid='threads_assign')
+post_save.connect(_update_thread_on_save, sender=SMSMessage, dispatch_uid='threads_save')
+post_delete.connect(_update_thread_on_delete, sender=SMSMessage, dispatch_uid='threads_delete')
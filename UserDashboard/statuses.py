@@ -0,0 +1,84 @@
+# statuses.py
+from collections import defaultdict
+
+from django.utils import timezone
+
+from .models import CallLog, SMSMessage
+
+# How far along its lifecycle each carrier status is. A row only moves to
+# a status of higher rank, so late or replayed callbacks cannot undo
+# progress (e.g. a delayed "sent" arriving after "delivered"). Outcomes of
+# equal rank do not replace each other.
+SMS_STATUS_RANKS = {
+    'accepted': 0, 'scheduled': 0,
+    'queued': 1,
+    'sending': 2,
+    'sent': 3, 'receiving': 3,
+    'delivered': 4, 'undelivered': 4, 'failed': 4, 'canceled': 4, 'partially_delivered': 4,
+    'received': 4,
+    'read': 5,
+}
+CALL_STATUS_RANKS = {
+    'queued': 0,
+    'initiated': 1,
+    'ringing': 2,
+    'in-progress': 3,
+    'completed': 4, 'busy': 4, 'failed': 4, 'no-answer': 4, 'canceled': 4,
+}
+RANKS = {
+    SMSMessage: SMS_STATUS_RANKS,
+    CallLog: CALL_STATUS_RANKS,
+}
+
+
+def rank(model, status):
+    """The status's position in the model's lifecycle, None if unknown"""
+    return RANKS[model].get(status)
+
+
+def earlier(model, status):
+    """Statuses a row may be in to move to `status`"""
+    target = rank(model, status)
+    if target is None:
+        return []
+    return [other for other, position in RANKS[model].items() if position < target]
+
+
+def furthest(model, statuses):
+    """The most advanced known status among `statuses` (None if none is known)"""
+    known = [status for status in statuses if rank(model, status) is not None]
+    return max(known, key=lambda status: rank(model, status), default=None)
+
+
+def _advance_query(model, sids, status):
+    previous = earlier(model, status)
+    if not previous or not sids:
+        return None, None
+    updates = {'status': status}
+    if any(field.name == 'updated_at' for field in model._meta.concrete_fields):
+        updates['updated_at'] = timezone.now()
+    return model.objects.filter(twilio_sid__in=list(sids), status__in=previous), updates
+
+
+def advance(model, sids, status):
+    """
+    Move the rows with these twilio_sids to `status` with one conditional
+    UPDATE ... WHERE status IN (earlier statuses); rows already at or past
+    it are left alone. Returns the number of rows moved.
+    """
+    queryset, updates = _advance_query(model, sids, status)
+    return queryset.update(**updates) if queryset is not None else 0
+
+
+async def aadvance(model, sids, status):
+    """advance() through the async ORM"""
+    queryset, updates = _advance_query(model, sids, status)
+    return await queryset.aupdate(**updates) if queryset is not None else 0
+
+
+def advance_many(model, targets):
+    """Apply {twilio_sid: status}, one UPDATE per distinct status; returns rows moved"""
+    by_status = defaultdict(list)
+    for sid, status in targets.items():
+        by_status[status].append(sid)
+    return sum(advance(model, sids, status) for status, sids in by_status.items())
@@ -1,3 +1,705 @@
-from django.test import TestCase
+import csv
+import io
+import json
+import shutil
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.paginator import EmptyPage
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from . import counters, dispatch, ledger, replay, reservations, retention, rollups, search, statuses, vanity, webhooks
+from .carriers import CarrierError, CarrierResult, FakeCarrierClient
+from .inventory_sources import FixtureInventorySource
+from .models import (
+    AvailablePhoneNumber, CallLog, Notification, PhoneNumberUsage, SMSMessage, TwilioWebhookLog,
+    UserDailyUsage, UserPhoneNumber, Wallet, WalletTransaction,
+)
+from .pagination import CursorPaginator
+from .phone import normalize_e164, suffix_q
+from .refresh import InventoryRefresher
+from .routing import router
+
+User = get_user_model()
+
+
+def make_user(email, balance='0.00'):
+    user = User.objects.create_user(email, 'password', is_active=True)
+    Wallet.objects.create(user=user, balance=Decimal(balance))
+    return user
+
+
+def make_number(user, phone_number='+15550000001'):
+    return UserPhoneNumber.objects.create(
+        user=user,
+        twilio_sid=f'PN{phone_number[1:]}',
+        phone_number=phone_number,
+        iso_country='US',
+        supports_sms=True,
+        monthly_price=Decimal('1.00'),
+        expires_at=timezone.now() + timedelta(days=30),
+    )
+
+
+def make_sms(user, number, sid, status='queued', direction='outbound', receiver='+15551110000',
+             body='Hello'):
+    return SMSMessage.objects.create(
+        twilio_sid=sid,
+        user=user,
+        phone_number=number,
+        sender=number.phone_number,
+        receiver=receiver,
+        body=body,
+        direction=direction,
+        status=status,
+        created_at=timezone.now(),
+    )
+
+
+class StatusRankTests(TestCase):
+    def setUp(self):
+        self.user = make_user('status@example.com')
+        self.number = make_number(self.user)
+        self.sms = make_sms(self.user, self.number, 'SMSTATUS1', status='sending')
+
+    def test_late_sent_does_not_undo_delivered(self):
+        self.assertEqual(statuses.advance(SMSMessage, ['SMSTATUS1'], 'delivered'), 1)
+        self.assertEqual(statuses.advance(SMSMessage, ['SMSTATUS1'], 'sent'), 0)
+        self.sms.refresh_from_db()
+        self.assertEqual(self.sms.status, 'delivered')
+
+    def test_equal_rank_outcomes_do_not_replace_each_other(self):
+        statuses.advance(SMSMessage, ['SMSTATUS1'], 'delivered')
+        self.assertEqual(statuses.advance(SMSMessage, ['SMSTATUS1'], 'failed'), 0)
+
+    def test_batch_applies_furthest_status(self):
+        logs = [
+            TwilioWebhookLog.objects.create(
+                event_sid='SMSTATUS1', event_type=webhooks.SMS_STATUS, status=status,
+                payload={'MessageSid': 'SMSTATUS1', 'MessageStatus': status},
+            )
+            for status in ('delivered', 'sent')
+        ]
+        self.assertEqual(webhooks.process(logs), (2, 0))
+        self.sms.refresh_from_db()
+        self.assertEqual(self.sms.status, 'delivered')
+
+    def test_unknown_call_status_is_ignored(self):
+        self.assertIsNone(statuses.rank(CallLog, 'bogus'))
+
+
+@override_settings(WEBHOOK_INGESTION='sync')
+class WebhookDedupTests(TestCase):
+    def setUp(self):
+        webhooks.recent_events.clear()
+        self.user = make_user('hooks@example.com')
+        self.number = make_number(self.user)
+
+    def post_inbound(self):
+        return self.client.post('/webhooks/twilio/inbound-sms/', {
+            'MessageSid': 'SMINBOUND1', 'From': '+15552223333', 'To': self.number.phone_number,
+            'Body': 'Hi there',
+        })
+
+    def test_duplicate_callback_is_acknowledged_but_applied_once(self):
+        self.assertEqual(self.post_inbound().status_code, 200)
+        webhooks.recent_events.clear()  # as if another process got the retry
+        self.assertEqual(self.post_inbound().status_code, 200)
+
+        self.assertEqual(TwilioWebhookLog.objects.filter(event_sid='SMINBOUND1').count(), 1)
+        self.assertEqual(SMSMessage.objects.filter(twilio_sid='SMINBOUND1').count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.user, notification_type='sms').count(), 1)
+
+    def test_retry_of_unapplied_callback_is_applied(self):
+        make_sms(self.user, self.number, 'SMRETRY1', status='sending')
+        log = webhooks.log_event(
+            webhooks.SMS_STATUS, 'SMRETRY1', {'MessageSid': 'SMRETRY1', 'MessageStatus': 'sent'}
+        )
+        self.assertIsNotNone(log)  # logged, but the request died before applying it
+
+        response = self.client.post(
+            '/webhooks/twilio/sms/', {'MessageSid': 'SMRETRY1', 'MessageStatus': 'sent'}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SMSMessage.objects.get(twilio_sid='SMRETRY1').status, 'sent')
+        self.assertTrue(TwilioWebhookLog.objects.get(pk=log.pk).processed)
+
+    def test_async_view_applies_like_the_sync_one(self):
+        response = self.client.post('/webhooks/twilio/async/inbound-sms/', {
+            'MessageSid': 'SMASYNC1', 'From': '+15552223333', 'To': self.number.phone_number,
+            'Body': 'Hi there',
+        })
+        self.assertEqual(response.status_code, 200)
+        log = TwilioWebhookLog.objects.get(event_sid='SMASYNC1')
+        sms = SMSMessage.objects.get(twilio_sid='SMASYNC1')
+        self.assertTrue(log.processed)
+        self.assertEqual(sms.created_at, log.received_at)
+        self.assertEqual(Notification.objects.filter(user=self.user, notification_type='sms').count(), 1)
+
+    def test_async_status_callbacks_only_move_forward(self):
+        make_sms(self.user, self.number, 'SMASYNC2', 'delivered')
+        for sid in ('SMASYNC2', 'SMMISSING'):
+            self.client.post('/webhooks/twilio/async/sms/', {'MessageSid': sid, 'MessageStatus': 'sent'})
+
+        self.assertEqual(SMSMessage.objects.get(twilio_sid='SMASYNC2').status, 'delivered')
+        self.assertTrue(TwilioWebhookLog.objects.get(event_sid='SMASYNC2').processed)
+        missing = TwilioWebhookLog.objects.get(event_sid='SMMISSING')
+        self.assertFalse(missing.processed)
+        self.assertEqual(missing.processing_error, 'SMS not found: SMMISSING')
+
+
+class CursorPageTests(TestCase):
+    def setUp(self):
+        user = make_user('pages@example.com')
+        for index in range(5):
+            Notification.objects.create(
+                user=user, notification_type='info', title=f'Note {index}', message='',
+            )
+        self.paginator = CursorPaginator(Notification.objects.all(), 2, count='capped')
+
+    def test_page_numbers_follow_the_cursors(self):
+        first = self.paginator.get_page()
+        self.assertEqual((first.number, first.start_index(), first.end_index()), (1, 1, 2))
+        self.assertEqual((first.next_page_number(), self.paginator.num_pages), (2, 3))
+        with self.assertRaises(EmptyPage):
+            first.previous_page_number()
+
+        second = self.paginator.get_page(first.next_cursor)
+        last = self.paginator.get_page(second.next_cursor)
+        self.assertEqual((last.number, last.start_index(), last.end_index()), (3, 5, 5))
+        self.assertFalse(last.has_next())
+
+        back = self.paginator.get_page(last.previous_cursor)
+        self.assertEqual(back.number, 2)
+        self.assertEqual([note.pk for note in back], [note.pk for note in second])
+        self.assertEqual(self.paginator.get_page(back.previous_cursor).number, 1)
+
+
+class SMSSearchTests(TestCase):
+    def setUp(self):
+        self.user = make_user('search@example.com')
+        number = make_number(self.user)
+        bodies = ['meeting moved', 'meeting meeting at noon', 'code 2024', 'the meeting', 'meetings all day']
+        for index, body in enumerate(bodies):
+            make_sms(self.user, number, f'SMFTS{index}', body=body)
+        other = make_user('nosy@example.com')
+        make_sms(other, make_number(other, '+15550000002'), 'SMFTSOTHER', body='meeting notes')
+
+    def hits(self, user_id):
+        return search.search_messages(SMSMessage.objects.all(), 'meet', user_id=user_id)
+
+    def test_search_is_scoped_to_the_user(self):
+        sids = set(self.hits(self.user.pk).values_list('twilio_sid', flat=True))
+        self.assertEqual(sids, {'SMFTS0', 'SMFTS1', 'SMFTS3', 'SMFTS4'})
+
+    def test_ranked_hits_page_by_cursor(self):
+        paginator = CursorPaginator(self.hits(self.user.pk), 3, ordering=('-rank', '-pk'))
+        first = paginator.get_page()
+        second = paginator.get_page(first.next_cursor)
+        seen = [sms.twilio_sid for sms in first] + [sms.twilio_sid for sms in second]
+
+        self.assertFalse(second.has_next())
+        self.assertEqual(sorted(seen), ['SMFTS0', 'SMFTS1', 'SMFTS3', 'SMFTS4'])
+        ranks = [sms.rank for sms in first] + [sms.rank for sms in second]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_only_phone_like_queries_match_numbers(self):
+        self.assertTrue(search.is_phone_query('+1555'))
+        self.assertTrue(search.is_phone_query('(555) 111-0000'))
+        self.assertFalse(search.is_phone_query('2024'))
+        self.assertFalse(search.is_phone_query('10.50'))
+
+        hits = search.search_messages(SMSMessage.objects.all(), '2024', user_id=self.user.pk)
+        self.assertEqual([sms.twilio_sid for sms in hits], ['SMFTS2'])
+
+
+class FlakyCarrier(FakeCarrierClient):
+    """Defers sends to `deferred` receivers"""
+
+    def __init__(self, deferred=()):
+        super().__init__(latency=0, fail_numbers=[])
+        self.deferred = set(deferred)
+
+    def send(self, message):
+        if message.receiver in self.deferred:
+            raise CarrierError('Carrier busy')
+        return super().send(message)
+
+
+class DispatchTests(TestCase):
+    def setUp(self):
+        self.user = make_user('dispatch@example.com')
+        self.number = make_number(self.user)
+
+    def test_claims_are_disjoint(self):
+        for index in range(5):
+            make_sms(self.user, self.number, f'SMQ{index}')
+        first = dispatch.claim_batch(3)
+        second = dispatch.claim_batch(3)
+        self.assertEqual(len(first), 3)
+        self.assertEqual(len(second), 2)
+        self.assertFalse({message.pk for message in first} & {message.pk for message in second})
+        self.assertEqual(dispatch.claim_batch(3), [])
+
+    def test_outcomes_are_recorded_per_message(self):
+        make_sms(self.user, self.number, 'SMOK', receiver='+15551110001')
+        make_sms(self.user, self.number, 'SMBAD', receiver='+15551110002')
+        client = FakeCarrierClient(latency=0, fail_numbers=['+15551110002'])
+
+        self.assertEqual(dispatch.dispatch_batch(client), (1, 1))
+        ok, bad = SMSMessage.objects.get(twilio_sid='SMOK'), SMSMessage.objects.get(twilio_sid='SMBAD')
+        self.assertEqual((ok.status, ok.claim_token), ('sent', None))
+        self.assertEqual((bad.status, bad.error_code), ('failed', 21610))
+
+    def test_failed_send_is_refunded_once(self):
+        sms = make_sms(self.user, self.number, 'SMREFUND', receiver='+15551110002')
+        SMSMessage.objects.filter(pk=sms.pk).update(price=Decimal('0.02'))
+        client = FakeCarrierClient(latency=0, fail_numbers=['+15551110002'])
+
+        self.assertEqual(dispatch.dispatch_batch(client), (0, 1))
+        refund = WalletTransaction.objects.get(reference=dispatch.refund_reference(sms))
+        self.assertEqual((refund.tx_type, refund.amount), ('refund', Decimal('0.02')))
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('0.02'))
+
+        sms.refresh_from_db()
+        dispatch._refund(sms)  # a retried failure
+        self.assertEqual(Wallet.objects.get(user=self.user).balance, Decimal('0.02'))
+
+    def test_send_result_does_not_revert_a_delivery_callback(self):
+        sms = make_sms(self.user, self.number, 'SMFAST')
+
+        class DeliveredFirst(FakeCarrierClient):
+            def send(self, message):
+                statuses.advance(SMSMessage, [message.twilio_sid], 'delivered')
+                return CarrierResult(True, message.twilio_sid, None, None)
+
+        dispatch.dispatch_batch(DeliveredFirst(latency=0))
+        sms.refresh_from_db()
+        self.assertEqual(sms.status, 'delivered')
+
+    @override_settings(SMS_DISPATCH_MAX_ATTEMPTS=2, SMS_DISPATCH_BACKOFF=60)
+    def test_deferred_send_backs_off_then_fails(self):
+        sms = make_sms(self.user, self.number, 'SMBUSY', receiver='+15551110003')
+        client = FlakyCarrier(deferred=['+15551110003'])
+
+        self.assertEqual(dispatch.dispatch_batch(client), (0, 0))
+        sms.refresh_from_db()
+        self.assertEqual((sms.status, sms.send_attempts), ('queued', 1))
+        self.assertGreater(sms.next_attempt_at, timezone.now())
+        self.assertEqual(dispatch.claim_batch(10), [])  # not due yet
+
+        SMSMessage.objects.filter(pk=sms.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(dispatch.dispatch_batch(client), (0, 1))
+        sms.refresh_from_db()
+        self.assertEqual((sms.status, sms.send_attempts), ('failed', 2))
+
+    def test_only_expired_leases_are_requeued(self):
+        sms = make_sms(self.user, self.number, 'SMLEASE')
+        claimed = dispatch.claim_batch(1)
+        self.assertEqual(dispatch.requeue_stale(), 0)
+
+        SMSMessage.objects.filter(pk=sms.pk).update(lease_expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(dispatch.requeue_stale(), 1)
+        sms.refresh_from_db()
+        self.assertEqual((sms.status, sms.send_attempts), ('queued', 1))
+
+        # The first worker lost its claim and cannot overwrite the next one's
+        dispatch.claim_batch(1)
+        self.assertFalse(dispatch._renew(claimed[0], 'default'))
+
+
+class LedgerTests(TestCase):
+    def setUp(self):
+        self.user = make_user('ledger@example.com', balance='10.00')
+
+    def balance(self):
+        return Wallet.objects.get(user=self.user).balance
+
+    def test_debit_records_balance_after(self):
+        tx = ledger.debit(self.user, '2.50', 'sms')
+        self.assertEqual(tx.balance_after, Decimal('7.50'))
+        self.assertEqual(self.balance(), Decimal('7.50'))
+
+    def test_overdraft_is_refused_without_side_effects(self):
+        with self.assertRaises(ledger.InsufficientFunds):
+            ledger.debit(self.user, '10.01', 'purchase')
+        self.assertEqual(self.balance(), Decimal('10.00'))
+        self.assertFalse(WalletTransaction.objects.filter(user=self.user).exists())
+
+    def test_debit_many_charges_once_with_running_balances(self):
+        entries = ledger.debit_many(self.user, [
+            WalletTransaction(tx_type='sms', amount=Decimal('1.00'), reference=f'SMS-TEST-{index}')
+            for index in range(3)
+        ])
+        self.assertEqual([entry.balance_after for entry in entries],
+                         [Decimal('9.00'), Decimal('8.00'), Decimal('7.00')])
+        self.assertEqual(self.balance(), Decimal('7.00'))
+
+    def test_settle_pending_credits_once(self):
+        pending = WalletTransaction.objects.create(
+            user=self.user, tx_type='fund', amount=Decimal('5.00'), status='pending'
+        )
+        settled = ledger.settle_pending(pending)
+        self.assertEqual(settled.status, 'success')
+        self.assertEqual(self.balance(), Decimal('15.00'))
+        with self.assertRaises(ledger.LedgerError):
+            ledger.settle_pending(pending)
+
+    def test_funding_waits_for_the_payment(self):
+        self.client.force_login(self.user)
+        response = self.client.post(
+            '/dashboard/wallet/fund/', {'amount': '5.00'}, content_type='application/json'
+        )
+        self.assertEqual(response.json()['status'], 'pending')
+        self.assertEqual(self.balance(), Decimal('10.00'))
+
+        with self.settings(WALLET_AUTO_APPROVE_FUNDING=True):
+            response = self.client.post(
+                '/dashboard/wallet/fund/', {'amount': '5.00'}, content_type='application/json'
+            )
+        self.assertEqual(response.json()['status'], 'success')
+        self.assertEqual(self.balance(), Decimal('15.00'))
+
+
+class ReservationTests(TestCase):
+    def setUp(self):
+        self.buyer = make_user('buyer@example.com', balance='20.00')
+        self.other = make_user('other@example.com', balance='20.00')
+        self.number = AvailablePhoneNumber.objects.create(
+            phone_number='+15557770000', iso_country='US',
+            twilio_price=Decimal('1.00'), your_price=Decimal('5.00'),
+        )
+
+    def test_hold_excludes_other_buyers(self):
+        reservations.reserve(self.number.pk, self.buyer)
+        with self.assertRaises(reservations.ReservationError):
+            reservations.reserve(self.number.pk, self.other)
+        with self.assertRaises(reservations.ReservationError):
+            reservations.checkout(self.number.pk, self.other)
+
+    def test_checkout_sells_and_charges(self):
+        reservations.reserve(self.number.pk, self.buyer)
+        user_number = reservations.checkout(self.number.pk, self.buyer)
+        self.number.refresh_from_db()
+        self.assertFalse(self.number.is_available)
+        self.assertEqual(user_number.user, self.buyer)
+        self.assertEqual(Wallet.objects.get(user=self.buyer).balance, Decimal('15.00'))
+
+    def test_lapsed_hold_can_be_taken(self):
+        reservations.reserve(self.number.pk, self.buyer, ttl=60)
+        AvailablePhoneNumber.objects.filter(pk=self.number.pk).update(
+            reserved_until=timezone.now() - timedelta(seconds=1)
+        )
+        reservations.reserve(self.number.pk, self.other)
+        with self.assertRaises(reservations.ReservationError):
+            reservations.checkout(self.number.pk, self.buyer)
+
+    def test_failed_purchase_releases_hold(self):
+        Wallet.objects.filter(user=self.buyer).update(balance=Decimal('1.00'))
+        self.client.force_login(self.buyer)
+        response = self.client.post(f'/dashboard/numbers/purchase/{self.number.pk}/')
+        self.assertFalse(response.json()['success'])
+        self.number.refresh_from_db()
+        self.assertTrue(self.number.is_available)
+        self.assertIsNone(self.number.reserved_by)
+
+
+class InventoryRefreshTests(TestCase):
+    def test_fixture_refresh_lists_new_numbers(self):
+        source = FixtureInventorySource(records=[
+            {'phone_number': f'+1555888{index:04d}', 'iso_country': 'US', 'twilio_price': '1.00'}
+            for index in range(5)
+        ] + [['not', 'an', 'object']], page_size=2)
+
+        stats = InventoryRefresher(source, max_workers=2).run_once()
+        self.assertEqual((stats['created'], stats['invalid']), (5, 1))
+        self.assertEqual(AvailablePhoneNumber.objects.filter(is_available=True).count(), 5)
+
+    def test_unchanged_rows_are_only_restamped_once_stale(self):
+        records = [
+            {'phone_number': f'+1555888{index:04d}', 'iso_country': 'US', 'twilio_price': '1.00'}
+            for index in range(2)
+        ]
+        InventoryRefresher(FixtureInventorySource(records=records)).run_once()
+        recent, old = timezone.now() - timedelta(minutes=5), timezone.now() - timedelta(hours=2)
+        AvailablePhoneNumber.objects.filter(phone_number='+15558880000').update(fetched_at=recent)
+        AvailablePhoneNumber.objects.filter(phone_number='+15558880001').update(fetched_at=old)
+
+        with override_settings(INVENTORY_TOUCH_AFTER=3600):
+            stats = InventoryRefresher(FixtureInventorySource(records=records)).run_once()
+        self.assertEqual(stats['unchanged'], 2)
+        self.assertEqual(AvailablePhoneNumber.objects.get(phone_number='+15558880000').fetched_at, recent)
+        self.assertGreater(AvailablePhoneNumber.objects.get(phone_number='+15558880001').fetched_at, recent)
+
+
+class VanityPatternTests(TestCase):
+    def setUp(self):
+        for phone_number in ('+18003569377', '+18001234567'):
+            AvailablePhoneNumber.objects.create(
+                phone_number=phone_number, iso_country='US',
+                twilio_price=Decimal('1.00'), your_price=Decimal('2.00'),
+            )
+
+    def matches(self, pattern):
+        numbers = vanity.filter_pattern(AvailablePhoneNumber.objects.all(), pattern)
+        return list(numbers.values_list('phone_number', flat=True))
+
+    def test_letters_dial_their_keypad_digits(self):
+        self.assertEqual(self.matches('1-800-FLOWERS'), ['+18003569377'])
+        self.assertEqual(self.matches('4567'), ['+18001234567'])
+
+    def test_pattern_without_digits_matches_nothing(self):
+        self.assertEqual(self.matches('-- ()'), [])
+
+
+class DailySeriesTests(TestCase):
+    def test_series_covers_exactly_the_requested_days(self):
+        user = make_user('series@example.com')
+        today = rollups.local_day(user.pk)
+        for days_ago in (0, 6, 7):
+            UserDailyUsage.objects.create(
+                user=user, day=today - timedelta(days=days_ago), channel='sms', direction='outbound', count=1,
+            )
+        days = [row['date'] for row in rollups.daily_series(user, 7)['sms']]
+        self.assertEqual(days, [today - timedelta(days=6), today])
+
+
+class ExportTests(TestCase):
+    def setUp(self):
+        self.user = make_user('export@example.com')
+        make_sms(self.user, make_number(self.user), 'SMEXPORT', body='=HYPERLINK("http://x")')
+        self.client.force_login(self.user)
+
+    def export(self, fmt):
+        response = self.client.get('/dashboard/sms/outbox/export/', {'format': fmt})
+        return b''.join(response.streaming_content).decode()
+
+    def test_csv_neutralises_formulas_but_not_phone_numbers(self):
+        header, row = list(csv.reader(io.StringIO(self.export('csv'))))
+        cells = dict(zip(header, row))
+        self.assertEqual(cells['body'], '\'=HYPERLINK("http://x")')
+        self.assertEqual((cells['sender'], cells['receiver']), ('+15550000001', '+15551110000'))
+
+    def test_jsonl_keeps_values_as_they_are(self):
+        record = json.loads(self.export('jsonl'))
+        self.assertEqual(record['body'], '=HYPERLINK("http://x")')
+
+
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        self.user = make_user('keyset@example.com')
+        number = make_number(self.user)
+        self.sms = [make_sms(self.user, number, f'SMPAGE{index}') for index in range(5)]
+        # Every row shares one timestamp, so only the pk tiebreak orders them
+        SMSMessage.objects.update(created_at=self.sms[0].created_at)
+
+    def paginator(self):
+        return CursorPaginator(SMSMessage.objects.filter(user=self.user), 2)
+
+    def walk(self):
+        page, seen = self.paginator().get_page(), []
+        while True:
+            seen += [sms.pk for sms in page]
+            if not page.has_next():
+                return seen
+            page = self.paginator().get_page(page.next_cursor)
+
+    def test_tied_rows_are_paged_without_gaps_or_repeats(self):
+        self.assertEqual(self.walk(), sorted((sms.pk for sms in self.sms), reverse=True))
+
+    def test_new_rows_do_not_shift_later_pages(self):
+        first = self.paginator().get_page()
+        make_sms(self.user, self.sms[0].phone_number, 'SMPAGENEW')
+        second = self.paginator().get_page(first.next_cursor)
+        self.assertEqual([sms.pk for sms in second], [self.sms[2].pk, self.sms[1].pk])
+
+    def test_malformed_cursor_falls_back_to_the_first_page(self):
+        page = self.paginator().get_page('not-a-cursor')
+        self.assertEqual([sms.pk for sms in page], [self.sms[4].pk, self.sms[3].pk])
+        self.assertFalse(page.has_previous())
+
+
+class PhoneLookupTests(TestCase):
+    def test_numbers_normalise_to_e164(self):
+        self.assertEqual(normalize_e164('(555) 123-4567'), '+15551234567')
+        self.assertEqual(normalize_e164('1 555 123 4567'), '+15551234567')
+        self.assertEqual(normalize_e164('0044 20 7946 0000'), '+442079460000')
+        self.assertEqual(normalize_e164('ACME'), '')
+
+    def test_suffix_lookup_matches_number_endings(self):
+        user = make_user('suffix@example.com')
+        make_number(user, '+15551234567')
+        make_number(user, '+15559994567')
+        make_number(user, '+15551230000')
+
+        def ending(digits):
+            numbers = UserPhoneNumber.objects.filter(suffix_q(['phone_rev'], digits))
+            return sorted(numbers.values_list('phone_number', flat=True))
+
+        self.assertEqual(ending('4567'), ['+15551234567', '+15559994567'])
+        self.assertEqual(ending('123-4567'), ['+15551234567'])
+        self.assertEqual(ending('--'), [])
+
+
+class InboundRoutingTests(TestCase):
+    def setUp(self):
+        router.clear()
+        self.user = make_user('routes@example.com')
+
+    def test_cached_route_follows_status_changes(self):
+        number = make_number(self.user, '+15553330000')
+        self.assertEqual(router.resolve('5553330000').number_id, number.pk)
+
+        number.status = 'cancelled'
+        number.save()
+        self.assertIsNone(router.resolve('+15553330000'))
+
+    def test_purchase_replaces_a_cached_miss(self):
+        self.assertIsNone(router.resolve('+15553330001'))
+        number = make_number(self.user, '+15553330001')
+        self.assertEqual(router.resolve('+15553330001').number_id, number.pk)
+
+    def test_repeat_lookups_are_served_from_the_cache(self):
+        make_number(self.user, '+15553330002')
+        router.resolve('+15553330002')
+        with self.assertNumQueries(0):
+            self.assertIsNotNone(router.resolve('+15553330002'))
+
+
+class UsageCounterTests(TestCase):
+    def test_counters_follow_inserts_state_changes_and_deletes(self):
+        user = make_user('counts@example.com')
+        number = make_number(user)
+        first = make_sms(user, number, 'SMCOUNT1')
+        make_sms(user, number, 'SMCOUNT2')
+        note = Notification.objects.create(user=user, notification_type='info', title='Hi', message='')
+
+        note.is_read = True
+        note.save()
+        first.delete()
+
+        counter = counters.get_counter(user)
+        self.assertEqual(
+            (counter.active_numbers, counter.total_sms, counter.unread_notifications), (1, 1, 0)
+        )
+        self.assertEqual(counters.rebuild([user.pk], verify_only=True), [])
+
+
+class UsageRollupTests(TestCase):
+    def setUp(self):
+        self.user = make_user('rollups@example.com')
+        self.number = make_number(self.user)
+
+    def usage(self, direction='outbound'):
+        return UserDailyUsage.objects.get(
+            user=self.user, day=rollups.local_day(self.user.pk), channel='sms', direction=direction
+        )
+
+    def test_rollups_follow_writes_and_match_a_rebuild(self):
+        first = make_sms(self.user, self.number, 'SMROLL1')
+        make_sms(self.user, self.number, 'SMROLL2')
+        SMSMessage.objects.filter(twilio_sid='SMROLL2').first().delete()
+        first.price = Decimal('0.0200')
+        first.save()
+
+        usage = self.usage()
+        self.assertEqual((usage.count, usage.spend), (1, Decimal('0.0200')))
+        number_usage = PhoneNumberUsage.objects.get(phone_number=self.number)
+        self.assertEqual((number_usage.sms_outbound, number_usage.spend), (1, Decimal('0.0200')))
+
+        rollups.rebuild([self.user.pk])
+        self.assertEqual((self.usage().count, self.usage().spend), (1, Decimal('0.0200')))
+
+
+@override_settings(WEBHOOK_INGESTION='sync')
+class RetentionTests(TestCase):
+    def setUp(self):
+        webhooks.recent_events.clear()
+        self.user = make_user('retention@example.com')
+        self.number = make_number(self.user)
+        self.root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.root)
+
+    def post_inbound(self):
+        return self.client.post('/webhooks/twilio/inbound-sms/', {
+            'MessageSid': 'SMARCHIVE1', 'From': '+15552223333', 'To': self.number.phone_number,
+            'Body': 'Old news',
+        })
+
+    def test_archived_event_still_deduplicates_late_retries(self):
+        self.post_inbound()
+        TwilioWebhookLog.objects.update(received_at=timezone.now() - timedelta(days=40))
+        self.assertEqual(retention.archive(older_than_days=30, root=self.root), 1)
+
+        archived = list(retention.iter_archived(root=self.root, event_sid='SMARCHIVE1'))
+        self.assertEqual(archived[0]['payload']['Body'], 'Old news')
+        tombstone = TwilioWebhookLog.objects.get(event_sid='SMARCHIVE1')
+        self.assertEqual((tombstone.payload, tombstone.archived_at is not None), ({}, True))
+
+        webhooks.recent_events.clear()
+        self.assertEqual(self.post_inbound().status_code, 200)
+        self.assertEqual(TwilioWebhookLog.objects.filter(event_sid='SMARCHIVE1').count(), 1)
+        self.assertEqual(Notification.objects.filter(user=self.user, notification_type='sms').count(), 1)
+        self.assertEqual(retention.archive(older_than_days=30, root=self.root), 0)
+
+    def test_expired_tombstones_are_purged(self):
+        self.post_inbound()
+        TwilioWebhookLog.objects.update(received_at=timezone.now() - timedelta(days=40))
+        retention.archive(older_than_days=30, root=self.root)
+
+        self.assertEqual(retention.purge_tombstones(older_than_days=60), 0)
+        self.assertEqual(retention.purge_tombstones(older_than_days=30), 1)
+        self.assertFalse(TwilioWebhookLog.objects.exists())
+
+
+@override_settings(WEBHOOK_REPLAY_MAX_ATTEMPTS=2, WEBHOOK_REPLAY_BACKOFF=60)
+class WebhookReplayTests(TestCase):
+    def setUp(self):
+        self.user = make_user('replay@example.com')
+        self.number = make_number(self.user)
+
+    def log_status(self, sid, status='delivered'):
+        return TwilioWebhookLog.objects.create(
+            event_sid=sid, event_type=webhooks.SMS_STATUS, status=status,
+            payload={'MessageSid': sid, 'MessageStatus': status}, processing_error='SMS not found',
+        )
+
+    def test_failed_replays_back_off_then_dead_letter(self):
+        log = self.log_status('SMLATE')
+        self.assertEqual(replay.replay_batch([log]), (0, 1, 0))
+        log.refresh_from_db()
+        self.assertEqual((log.attempts, log.claimed_at, log.claim_token), (1, None, None))
+        self.assertGreater(log.next_attempt_at, timezone.now())
+        self.assertFalse(replay.replayable().exists())
+
+        TwilioWebhookLog.objects.filter(pk=log.pk).update(next_attempt_at=timezone.now())
+        self.assertEqual(replay.replay_batch(list(replay.replayable())), (0, 1, 1))
+        log.refresh_from_db()
+        self.assertTrue(log.dead_letter)
+
+        # Once the cause is fixed, a requeued dead letter goes through
+        make_sms(self.user, self.number, 'SMLATE', status='sent')
+        replay.requeue_dead_letters()
+        self.assertEqual(replay.replay_batch(list(replay.replayable())), (1, 0, 0))
+        self.assertEqual(SMSMessage.objects.get(twilio_sid='SMLATE').status, 'delivered')
+
+    def test_a_log_is_claimed_by_one_worker_only(self):
+        log = self.log_status('SMCLAIM')
+        first = replay.claim([log])
+        self.assertEqual([claimed.pk for claimed in first], [log.pk])
+        self.assertEqual(replay.claim(list(TwilioWebhookLog.objects.filter(pk=log.pk))), [])
+        self.assertEqual(TwilioWebhookLog.objects.get(pk=log.pk).claim_token, first[0].claim_token)
+
+    def test_ingest_claims_are_disjoint(self):
+        for index in range(3):
+            TwilioWebhookLog.objects.create(
+                event_sid=f'SMQUEUE{index}', event_type=webhooks.SMS_STATUS, status='sent',
+                payload={'MessageSid': f'SMQUEUE{index}', 'MessageStatus': 'sent'},
+            )
+        first, second = webhooks.claim_batch(2), webhooks.claim_batch(2)
+        self.assertEqual((len(first), len(second)), (2, 1))
+        self.assertFalse({log.pk for log in first} & {log.pk for log in second})
+        self.assertNotEqual(first[0].claim_token, second[0].claim_token)
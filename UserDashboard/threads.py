@@ -0,0 +1,146 @@
+# threads.py
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, Max, Q, Value, When
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .models import SMSMessage, SMSThread
+
+SNIPPET_LENGTH = 160
+
+
+def counterparty(message):
+    """The other end of a message: who sent it in, or who it went out to"""
+    if message.direction == 'inbound':
+        return message.sender_e164 or message.sender
+    return message.receiver_e164 or message.receiver
+
+
+def snippet(body):
+    body = ' '.join((body or '').split())
+    return body if len(body) <= SNIPPET_LENGTH else body[:SNIPPET_LENGTH - 1] + '…'
+
+
+def assign(messages):
+    """
+    Set thread_id on messages that lack one, creating threads as needed,
+    with one lookup query for the whole batch. Does not save the messages.
+    """
+    pending = [message for message in messages if message.thread_id is None]
+    if not pending:
+        return []
+
+    keys = {(message.phone_number_id, counterparty(message)): message for message in pending}
+
+    def lookup():
+        rows = SMSThread.objects.filter(
+            phone_number_id__in={number_id for number_id, _ in keys},
+            counterparty__in={party for _, party in keys},
+        ).values_list('phone_number_id', 'counterparty', 'pk')
+        return {(number_id, party): pk for number_id, party, pk in rows}
+
+    found = lookup()
+    missing = [key for key in keys if key not in found]
+    if missing:
+        SMSThread.objects.bulk_create([
+            SMSThread(
+                user_id=keys[key].user_id, phone_number_id=key[0], counterparty=key[1],
+                last_message_at=keys[key].created_at or timezone.now(),
+            )
+            for key in missing
+        ], ignore_conflicts=True)
+        found = lookup()
+
+    for message in pending:
+        message.thread_id = found[(message.phone_number_id, counterparty(message))]
+    return pending
+
+
+def record(messages):
+    """
+    Fold newly stored messages into their threads: one UPDATE per thread
+    bumps the counts and, if a message is newer than the thread's last
+    activity, replaces the snippet.
+    """
+    per_thread = defaultdict(list)
+    for message in messages:
+        if message.thread_id is not None:
+            per_thread[message.thread_id].append(message)
+
+    for thread_id, batch in per_thread.items():
+        latest = max(batch, key=lambda message: message.created_at)
+        newer = Q(last_message_at__lte=latest.created_at) | Q(message_count=0)
+        # Columns the condition reads are assigned after it: MySQL evaluates SET clauses in order
+        SMSThread.objects.filter(pk=thread_id).update(
+            last_snippet=Case(When(newer, then=Value(snippet(latest.body))), default=F('last_snippet')),
+            last_direction=Case(When(newer, then=Value(latest.direction)), default=F('last_direction')),
+            last_message_at=Case(When(newer, then=Value(latest.created_at)), default=F('last_message_at')),
+            message_count=F('message_count') + len(batch),
+            unread_count=F('unread_count') + sum(1 for message in batch if message.direction == 'inbound'),
+        )
+
+
+def forget(message):
+    """Take a deleted message out of its thread's counts"""
+    if message.thread_id is None:
+        return
+    SMSThread.objects.filter(pk=message.thread_id).update(
+        message_count=Greatest(F('message_count') - 1, 0),
+        unread_count=Greatest(F('unread_count') - int(message.direction == 'inbound'), 0),
+    )
+
+
+def mark_read(thread):
+    SMSThread.objects.filter(pk=thread.pk).update(unread_count=0, last_read_at=timezone.now())
+    thread.unread_count = 0
+
+
+def rebuild(thread_ids):
+    """Recount threads from their messages (counts, unread since last read, last snippet)"""
+    threads = SMSThread.objects.in_bulk(list(thread_ids))
+    totals = SMSMessage.objects.filter(thread_id__in=list(threads)).order_by().values('thread_id').annotate(
+        total=Count('pk'), last_at=Max('created_at')
+    )
+    totals = {row['thread_id']: row for row in totals}
+
+    for thread_id, thread in threads.items():
+        row = totals.get(thread_id)
+        messages = SMSMessage.objects.filter(thread_id=thread_id)
+        unread = messages.filter(direction='inbound')
+        if thread.last_read_at:
+            unread = unread.filter(created_at__gt=thread.last_read_at)
+        latest = messages.order_by('-created_at', '-pk').only('body', 'direction', 'created_at').first()
+
+        thread.message_count = row['total'] if row else 0
+        thread.unread_count = unread.count()
+        if latest is not None:
+            thread.last_message_at = latest.created_at
+            thread.last_snippet = snippet(latest.body)
+            thread.last_direction = latest.direction
+
+    SMSThread.objects.bulk_update(
+        threads.values(),
+        ['message_count', 'unread_count', 'last_message_at', 'last_snippet', 'last_direction'],
+        batch_size=500,
+    )
+    return len(threads)
+
+
+def backfill(batch_size=1000):
+    """Attach threadless messages to threads in batches; returns the touched thread ids"""
+    touched = set()
+    while True:
+        batch = list(
+            SMSMessage.objects.filter(thread__isnull=True).only(
+                'pk', 'user_id', 'phone_number_id', 'direction', 'sender', 'receiver',
+                'sender_e164', 'receiver_e164', 'created_at', 'thread_id',
+            )[:batch_size]
+        )
+        if not batch:
+            return touched
+        assign(batch)
+        with transaction.atomic():
+            SMSMessage.objects.bulk_update(batch, ['thread'], batch_size=batch_size)
+        touched.update(message.thread_id for message in batch)
@@ -0,0 +1,83 @@
+# timeline.py
+import heapq
+from collections import namedtuple
+from datetime import datetime
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+from .models import CallLog, SMSMessage
+from .pagination import InvalidCursor, decode_cursor, encode_cursor, keyset_filter
+
+TimelineEntry = namedtuple('TimelineEntry', ['kind', 'at', 'item'])
+
+# (kind, model, time field). A number's rows of each kind are read off a
+# (phone_number, time) index; position in this tuple breaks timestamp ties.
+SOURCES = (
+    ('sms', SMSMessage, 'created_at'),
+    ('call', CallLog, 'start_time'),
+)
+RANKS = {kind: rank for rank, (kind, _, _) in enumerate(SOURCES)}
+MODELS = {kind: model for kind, model, _ in SOURCES}
+
+
+def encode(entry):
+    return encode_cursor([entry.at, entry.kind, entry.item.pk], 'n')
+
+
+def decode(cursor):
+    """A cursor made by encode() as (at, kind, pk); InvalidCursor if malformed"""
+    values, _, _ = decode_cursor(cursor)
+    if len(values) != 3 or values[1] not in RANKS:
+        raise InvalidCursor(cursor)
+    at, kind, pk = values
+    try:
+        return datetime.fromisoformat(at), kind, MODELS[kind]._meta.pk.to_python(pk)
+    except (TypeError, ValueError, ValidationError):
+        raise InvalidCursor(cursor)
+
+
+def _after(kind, time_field, position):
+    """
+    Rows of `kind` that sort after `position` in the merged order
+    (time desc, then SOURCES order, then pk desc).
+    """
+    at, cursor_kind, pk = position
+    if RANKS[kind] < RANKS[cursor_kind]:
+        return Q(**{f'{time_field}__lt': at})
+    if RANKS[kind] > RANKS[cursor_kind]:
+        return Q(**{f'{time_field}__lte': at})
+    return keyset_filter((f'-{time_field}', '-pk'), (at, pk), after=True)
+
+
+def page(number, cursor=None, per_page=50):
+    """
+    The next `per_page` SMS and calls of a number, newest first, after
+    `cursor` (None for the start). Each source contributes one LIMIT
+    per_page+1 index range scan from the cursor and the streams are
+    merged, so deep pages cost the same as the first. Returns
+    (entries, next_cursor); next_cursor is None at the end of history.
+    """
+    position = None
+    if cursor:
+        try:
+            position = decode(cursor)
+        except InvalidCursor:
+            position = None
+
+    streams = []
+    for kind, model, time_field in SOURCES:
+        queryset = model.objects.filter(phone_number=number)
+        if position is not None:
+            queryset = queryset.filter(_after(kind, time_field, position))
+        rows = queryset.order_by(f'-{time_field}', '-pk')[:per_page + 1]
+        streams.append([TimelineEntry(kind, getattr(row, time_field), row) for row in rows])
+
+    merged = heapq.merge(
+        *streams, key=lambda entry: (entry.at, -RANKS[entry.kind]), reverse=True
+    )
+    entries = [entry for _, entry in zip(range(per_page + 1), merged)]
+    if len(entries) <= per_page:
+        return entries, None
+    entries = entries[:per_page]
+    return entries, encode(entries[-1])
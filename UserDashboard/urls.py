@@ -10,22 +10,32 @@ urlpatterns = [
     # Wallet
     path('dashboard/wallet/', views.wallet_view, name='wallet'),
     path('dashboard/wallet/fund/', views.fund_wallet_view, name='fund_wallet'),
+    path('dashboard/wallet/statement/', views.api_wallet_statement, name='wallet_statement'),
+    path('dashboard/wallet/export/', views.export_wallet_view, name='export_wallet'),
     
     # Phone Numbers
     path('dashboard/marketplace/', views.phone_marketplace_view, name='marketplace'),
     path('dashboard/numbers/', views.my_numbers_view, name='my_numbers'),
     path('dashboard/numbers/<uuid:number_id>/', views.number_detail_view, name='number_detail'),
     path('dashboard/numbers/<uuid:number_id>/update/', views.update_number_view, name='update_number'),
+    path('dashboard/numbers/<uuid:number_id>/timeline/', views.api_number_timeline, name='number_timeline'),
     path('dashboard/numbers/purchase/<int:phone_number_id>/', views.purchase_number_view, name='purchase_number'),
+    path('dashboard/numbers/reserve/<int:phone_number_id>/', views.reserve_number_view, name='reserve_number'),
     
     # SMS
     path('dashboard/sms/inbox/', views.sms_inbox_view, name='sms_inbox'),
     path('dashboard/sms/outbox/', views.sms_outbox_view, name='sms_outbox'),
+    path('dashboard/sms/threads/', views.sms_threads_view, name='sms_threads'),
+    path('dashboard/sms/threads/<int:thread_id>/', views.sms_thread_view, name='sms_thread'),
+    path('dashboard/sms/inbox/export/', views.export_sms_view, {'direction': 'inbound'}, name='export_sms_inbox'),
+    path('dashboard/sms/outbox/export/', views.export_sms_view, {'direction': 'outbound'}, name='export_sms_outbox'),
     path('dashboard/sms/send/', views.send_sms_view, name='send_sms'),
     path('dashboard/sms/api/send/', views.api_send_sms, name='api_send_sms'),
+    path('dashboard/sms/api/send/bulk/', views.api_send_bulk_sms, name='api_send_bulk_sms'),
     
     # Calls
     path('dashboard/calls/', views.call_logs_view, name='call_logs'),
+    path('dashboard/calls/export/', views.export_calls_view, name='export_calls'),
     
     # Notifications
     path('dashboard/notifications/', views.notifications_view, name='notifications'),
@@ -45,9 +55,13 @@ urlpatterns = [
     path('webhooks/twilio/sms/', views.twilio_sms_webhook, name='twilio_sms_webhook'),
     path('webhooks/twilio/inbound-sms/', views.twilio_inbound_sms_webhook, name='twilio_inbound_sms_webhook'),
     path('webhooks/twilio/voice/', views.twilio_voice_webhook, name='twilio_voice_webhook'),
+    path('webhooks/twilio/async/sms/', views.twilio_sms_webhook_async, name='twilio_sms_webhook_async'),
+    path('webhooks/twilio/async/inbound-sms/', views.twilio_inbound_sms_webhook_async, name='twilio_inbound_sms_webhook_async'),
+    path('webhooks/twilio/async/voice/', views.twilio_voice_webhook_async, name='twilio_voice_webhook_async'),
     
     # Admin (dropshipping)
     path('admin/dashboard/', views.admin_dashboard_view, name='admin_dashboard'),
     path('admin/users/', views.admin_users_view, name='admin_users'),
     path('admin/transactions/', views.admin_transactions_view, name='admin_transactions'),
+    path('dashboard/admin/metrics/', views.api_admin_metrics, name='admin_metrics'),
 ]
\ No newline at end of file
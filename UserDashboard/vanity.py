@@ -0,0 +1,96 @@
+# vanity.py
+import re
+
+from django.db.models import Count
+
+from .models import AvailablePhoneNumber, NumberTrigram
+
+GRAM = 3
+NON_DIGITS = re.compile(r'\D')
+
+# Phone keypad letters, so "FLOWERS" searches as 3569377
+KEYPAD = str.maketrans({
+    letter: digit
+    for digit, letters in {
+        '2': 'ABC', '3': 'DEF', '4': 'GHI', '5': 'JKL',
+        '6': 'MNO', '7': 'PQRS', '8': 'TUV', '9': 'WXYZ',
+    }.items()
+    for letter in letters
+})
+
+
+def number_digits(phone_number):
+    return NON_DIGITS.sub('', phone_number or '')
+
+
+def pattern_digits(pattern):
+    """The digits a vanity pattern dials: letters become their keypad digits"""
+    return number_digits((pattern or '').upper().translate(KEYPAD))
+
+
+def trigrams(digits):
+    return {digits[i:i + GRAM] for i in range(len(digits) - GRAM + 1)}
+
+
+def index_numbers(numbers, batch_size=2000):
+    """
+    Add postings for AvailablePhoneNumber instances. Rows from
+    bulk_create on backends that do not return primary keys are looked
+    up by phone_number.
+    """
+    numbers = list(numbers)
+    missing = [number.phone_number for number in numbers if number.pk is None]
+    ids = dict(
+        AvailablePhoneNumber.objects.filter(phone_number__in=missing).values_list('phone_number', 'pk')
+    ) if missing else {}
+
+    rows = [
+        NumberTrigram(trigram=gram, number_id=number.pk or ids[number.phone_number])
+        for number in numbers
+        if number.pk or number.phone_number in ids
+        for gram in trigrams(number_digits(number.phone_number))
+    ]
+    NumberTrigram.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+    return len(rows)
+
+
+def unindex(numbers):
+    """Drop postings for numbers leaving the market: a list of ids or an id queryset"""
+    return NumberTrigram.objects.filter(number_id__in=numbers).delete()[0]
+
+
+def rebuild_index(chunk_size=2000):
+    """Recreate every posting from the available inventory"""
+    NumberTrigram.objects.all().delete()
+    available = AvailablePhoneNumber.objects.filter(is_available=True).only('pk', 'phone_number')
+    batch, total = [], 0
+    for number in available.iterator(chunk_size=chunk_size):
+        batch.append(number)
+        if len(batch) >= chunk_size:
+            total += index_numbers(batch)
+            batch = []
+    if batch:
+        total += index_numbers(batch)
+    return total
+
+
+def filter_pattern(queryset, pattern):
+    """
+    Narrow an AvailablePhoneNumber queryset to numbers containing the
+    digits `pattern` dials (letters map to the keypad); a pattern that
+    dials nothing matches nothing. Candidates are the numbers holding every trigram
+    of the pattern (an intersection of postings); the substring test then
+    only runs on those to rule out trigrams matched out of order.
+    """
+    digits = pattern_digits(pattern)
+    if not digits:
+        return queryset.none()
+    if len(digits) < GRAM:
+        # Too short to use the index, and too unselective for it to help
+        return queryset.filter(phone_number__contains=digits)
+
+    grams = trigrams(digits)
+    candidates = NumberTrigram.objects.filter(trigram__in=grams).values('number_id').annotate(
+        hits=Count('trigram')
+    ).filter(hits=len(grams)).values('number_id')
+    return queryset.filter(pk__in=candidates, phone_number__contains=digits)
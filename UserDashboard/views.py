@@ -5,23 +5,50 @@ from django.http import JsonResponse, HttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib import messages
+from django.db import transaction as db_transaction
 from django.db.models import Sum, Count, Q, F, DecimalField
 from django.db.models.functions import TruncMonth, TruncDay
 from django.core.paginator import Paginator
+from django.conf import settings
 from django.utils import timezone
 from datetime import timedelta
 import json
+import re
 import uuid
 from decimal import Decimal
 from .models import (
     Wallet, WalletTransaction, AvailablePhoneNumber, UserPhoneNumber,
     SMSMessage, MMSMedia, CallLog, CallRecording, TwilioWebhookLog,
-    Commission, Referral, Notification
+    Commission, Referral, Notification, PhoneNumberUsage, SMSThread
 )
+from . import counters, exports, facets, ledger, platform_stats, reservations, rollups, search, threads, timeline, vanity, webhooks, worker_metrics
+from .dispatch_signals import rows_bulk_created
+from .phone import normalize_e164, suffix_q
+from .routing import router
+from .pagination import CursorPaginator
 from django.contrib.auth import get_user_model
 
 User = get_user_model()
 
+
+def _cursor_page(request, queryset, per_page, ordering=('-created_at', '-pk')):
+    """Keyset-paginate a list view from the ?cursor= query parameter"""
+    paginator = CursorPaginator(
+        queryset,
+        per_page,
+        ordering=ordering,
+        count=getattr(settings, 'DASHBOARD_PAGINATION_COUNT', 'capped'),
+        count_cap=getattr(settings, 'DASHBOARD_PAGINATION_COUNT_CAP', 1000),
+    )
+    return paginator.get_page(request.GET.get('cursor'))
+
+def _export(request, queryset, fields, filename):
+    """Stream an export in ?format=csv|jsonl, gzip-compressed with ?gzip=1"""
+    fmt = request.GET.get('format', 'csv')
+    compress = request.GET.get('gzip', '') in ('1', 'true')
+    stamp = timezone.now().strftime('%Y%m%d')
+    return exports.export_response(queryset, fields, f'{filename}-{stamp}', fmt=fmt, compress=compress)
+
 # ==================== DASHBOARD VIEWS ====================
 
 @login_required
@@ -32,12 +59,13 @@ def dashboard_view(request):
     # Get wallet balance
     wallet = user.wallet
     
-    # Get stats
+    # Get stats (one row, kept current by signals)
+    counter = counters.get_counter(user)
     stats = {
-        'phone_numbers': user.phone_numbers.filter(status='active').count(),
-        'total_sms': user.sms_messages.count(),
-        'total_calls': user.calls.count(),
-        'unread_notifications': user.notifications.filter(is_read=False).count(),
+        'phone_numbers': counter.active_numbers,
+        'total_sms': counter.total_sms,
+        'total_calls': counter.total_calls,
+        'unread_notifications': counter.unread_notifications,
     }
     
     # Recent transactions
@@ -62,17 +90,12 @@ def dashboard_view(request):
     
     return render(request, 'user_dashboard/dashboard.html', context)
 
-@login_required
-def wallet_view(request):
-    """Wallet management view"""
-    user = request.user
-    wallet = user.wallet
-    
-    # Filter transactions
+def _filter_transactions(request):
+    """Wallet history filters, shared by the list view and the export"""
     transaction_type = request.GET.get('type', 'all')
     status_filter = request.GET.get('status', 'all')
     
-    transactions = user.transactions.all()
+    transactions = request.user.transactions.all()
     
     if transaction_type != 'all':
         transactions = transactions.filter(tx_type=transaction_type)
@@ -80,10 +103,19 @@ def wallet_view(request):
     if status_filter != 'all':
         transactions = transactions.filter(status=status_filter)
     
+    return transactions, transaction_type, status_filter
+
+@login_required
+def wallet_view(request):
+    """Wallet management view"""
+    user = request.user
+    wallet = user.wallet
+    
+    # Filter transactions
+    transactions, transaction_type, status_filter = _filter_transactions(request)
+    
     # Pagination
-    paginator = Paginator(transactions.order_by('-created_at'), 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _cursor_page(request, transactions, 20)
     
     context = {
         'wallet': wallet,
@@ -95,6 +127,47 @@ def wallet_view(request):
     
     return render(request, 'user_dashboard/wallet.html', context)
 
+@login_required
+@require_http_methods(["GET"])
+def export_wallet_view(request):
+    """Download the filtered wallet history as CSV or JSON Lines"""
+    transactions, _, _ = _filter_transactions(request)
+    return _export(request, transactions.order_by('-created_at', '-pk'), exports.WALLET_EXPORT_FIELDS, 'wallet')
+
+@login_required
+@require_http_methods(["GET"])
+def api_wallet_statement(request):
+    """Ledger entries with running balances, cursor-paginated off the (user, created_at) index"""
+    entries = request.user.transactions.all()
+    
+    transaction_type = request.GET.get('type', 'all')
+    if transaction_type != 'all':
+        entries = entries.filter(tx_type=transaction_type)
+    
+    page_obj = _cursor_page(request, entries.only(
+        'id', 'tx_type', 'amount', 'status', 'balance_after', 'reference', 'created_at'
+    ), 100)
+    
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'entries': [
+                {
+                    'id': str(entry.id),
+                    'tx_type': entry.tx_type,
+                    'amount': str(ledger.signed_amount(entry.tx_type, entry.amount)),
+                    'status': entry.status,
+                    'balance_after': str(entry.balance_after) if entry.balance_after is not None else None,
+                    'reference': entry.reference,
+                    'created_at': entry.created_at.isoformat(),
+                }
+                for entry in page_obj
+            ],
+            'next_cursor': page_obj.next_cursor,
+            'previous_cursor': page_obj.previous_cursor,
+        }
+    })
+
 @login_required
 def fund_wallet_view(request):
     """Fund wallet view"""
@@ -126,14 +199,18 @@ def fund_wallet_view(request):
                 }
             )
             
-            # In production, you would integrate with payment gateway here
-            # For demo, auto-approve after 2 seconds
+            # The payment gateway's callback settles the entry; only an explicit
+            # WALLET_AUTO_APPROVE_FUNDING (demos without a gateway) credits it now
+            if getattr(settings, 'WALLET_AUTO_APPROVE_FUNDING', False):
+                transaction = ledger.settle_pending(transaction)
+
             return JsonResponse({
                 'success': True,
-                'message': 'Payment initiated',
+                'message': 'Payment initiated' if transaction.status == 'pending' else 'Wallet funded',
                 'transaction_id': str(transaction.id),
                 'reference': reference,
                 'amount': str(amount),
+                'status': transaction.status,
             })
             
         except json.JSONDecodeError:
@@ -161,10 +238,13 @@ def phone_marketplace_view(request):
     supports_voice = request.GET.get('supports_voice', '')
     price_min = request.GET.get('price_min', '')
     price_max = request.GET.get('price_max', '')
+    pattern = request.GET.get('pattern', '').strip()
     sort_by = request.GET.get('sort_by', 'price_asc')
     
-    # Start with all available numbers
-    numbers = AvailablePhoneNumber.objects.filter(is_available=True)
+    # Start with all available numbers not held by someone else
+    numbers = AvailablePhoneNumber.objects.filter(
+        reservations.free_for(request.user), is_available=True
+    )
     
     # Apply filters
     if country:
@@ -185,6 +265,10 @@ def phone_marketplace_view(request):
     if price_max:
         numbers = numbers.filter(your_price__lte=Decimal(price_max))
     
+    if pattern:
+        # Vanity search ("777", "2024", "FLOWERS") through the digit trigram index
+        numbers = vanity.filter_pattern(numbers, pattern)
+    
     # Apply sorting
     if sort_by == 'price_asc':
         numbers = numbers.order_by('your_price')
@@ -195,15 +279,20 @@ def phone_marketplace_view(request):
     elif sort_by == 'featured':
         numbers = numbers.order_by('-is_featured', 'your_price')
     
-    # Get unique countries for filter dropdown
-    countries = AvailablePhoneNumber.objects.filter(is_available=True).values_list(
-        'iso_country', flat=True
-    ).distinct().order_by('iso_country')
+    # Filter dropdowns come from the facet cache, not DISTINCT over inventory
+    facet_data = facets.get_facets()
+    country_counts = facet_data['countries']
+    countries = [code for code, _ in country_counts]
     
-    # Get unique localities for filter dropdown
-    localities = AvailablePhoneNumber.objects.filter(
-        is_available=True, locality__isnull=False
-    ).values_list('locality', flat=True).distinct().order_by('locality')
+    if country:
+        locality_counts = facet_data['localities'].get(country, [])
+    else:
+        merged = {}
+        for places in facet_data['localities'].values():
+            for place, count in places:
+                merged[place] = merged.get(place, 0) + count
+        locality_counts = sorted(merged.items())
+    localities = [place for place, _ in locality_counts]
     
     # Pagination
     paginator = Paginator(numbers, 24)
@@ -214,6 +303,8 @@ def phone_marketplace_view(request):
         'page_obj': page_obj,
         'countries': countries,
         'localities': localities,
+        'country_counts': country_counts,
+        'locality_counts': locality_counts,
         'filters': {
             'country': country,
             'locality': locality,
@@ -221,6 +312,7 @@ def phone_marketplace_view(request):
             'supports_voice': supports_voice,
             'price_min': price_min,
             'price_max': price_max,
+            'pattern': pattern,
             'sort_by': sort_by,
         }
     }
@@ -228,70 +320,62 @@ def phone_marketplace_view(request):
     return render(request, 'user_dashboard/marketplace.html', context)
 
 @login_required
-def purchase_number_view(request, phone_number_id):
-    """Purchase a phone number"""
+def reserve_number_view(request, phone_number_id):
+    """Hold a phone number for checkout"""
     if request.method == 'POST':
         try:
-            number = get_object_or_404(AvailablePhoneNumber, id=phone_number_id, is_available=True)
-            
-            # Check wallet balance
-            wallet = request.user.wallet
-            if wallet.balance < number.your_price:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Insufficient balance'
-                })
-            
-            # Generate Twilio SID (in production, this would be from Twilio API)
-            twilio_sid = f"PN{uuid.uuid4().hex[:32].upper()}"
-            
-            # Create user phone number
-            user_number = UserPhoneNumber.objects.create(
-                user=request.user,
-                twilio_sid=twilio_sid,
-                phone_number=number.phone_number,
-                iso_country=number.iso_country,
-                supports_sms=number.supports_sms,
-                supports_mms=number.supports_mms,
-                supports_voice=number.supports_voice,
-                capabilities=number.capabilities,
-                monthly_price=number.monthly_price,
-                expires_at=timezone.now() + timedelta(days=30)
-            )
+            reserved_until = reservations.reserve(phone_number_id, request.user)
             
-            # Mark as unavailable
-            number.is_available = False
-            number.save()
-            
-            # Create transaction
-            transaction = WalletTransaction.objects.create(
-                user=request.user,
-                tx_type='purchase',
-                amount=number.your_price,
-                reference=f"PURCHASE-{uuid.uuid4().hex[:8].upper()}",
-                status='success',
-                metadata={
-                    'phone_number': number.phone_number,
-                    'twilio_sid': twilio_sid,
-                }
-            )
-            
-            # Create notification
-            Notification.objects.create(
-                user=request.user,
-                notification_type='success',
-                title='Phone Number Purchased',
-                message=f'You have successfully purchased {number.phone_number}',
-                action_url=f'/dashboard/numbers/{user_number.id}/'
-            )
+            return JsonResponse({
+                'success': True,
+                'message': 'Number reserved',
+                'reserved_until': reserved_until.isoformat(),
+            })
             
+        except reservations.ReservationError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            })
+    
+    return JsonResponse({
+        'success': False,
+        'error': 'Invalid request method'
+    })
+
+@login_required
+def purchase_number_view(request, phone_number_id):
+    """Purchase a phone number"""
+    if request.method == 'POST':
+        try:
+            # Take (or extend) the hold, then finalize it; a conditional
+            # UPDATE on the one row means two buyers can't both win
+            reservations.reserve(phone_number_id, request.user)
+            try:
+                user_number = reservations.checkout(phone_number_id, request.user)
+            except Exception:
+                # The checkout rolled back; don't keep others off the number
+                # until the hold lapses
+                reservations.release(phone_number_id, request.user)
+                raise
+
             return JsonResponse({
                 'success': True,
                 'message': 'Number purchased successfully',
                 'number_id': str(user_number.id),
-                'phone_number': number.phone_number,
+                'phone_number': user_number.phone_number,
             })
             
+        except reservations.ReservationError as e:
+            return JsonResponse({
+                'success': False,
+                'error': str(e)
+            })
+        except ledger.InsufficientFunds:
+            return JsonResponse({
+                'success': False,
+                'error': 'Insufficient balance'
+            })
         except Exception as e:
             return JsonResponse({
                 'success': False,
@@ -318,10 +402,14 @@ def my_numbers_view(request):
     # Search
     search_query = request.GET.get('search', '')
     if search_query:
-        numbers = numbers.filter(
-            Q(phone_number__icontains=search_query) |
-            Q(friendly_name__icontains=search_query)
-        )
+        # Any digits may be the tail of one of the user's own numbers
+        if search.PHONE_QUERY_RE.match(search_query.strip()):
+            numbers = numbers.filter(
+                suffix_q(['phone_rev'], search_query) |
+                Q(friendly_name__icontains=search_query)
+            )
+        else:
+            numbers = numbers.filter(friendly_name__icontains=search_query)
     
     # Pagination
     paginator = Paginator(numbers, 20)
@@ -347,30 +435,78 @@ def number_detail_view(request, number_id):
     # Get recent calls
     recent_calls = number.calls.all().order_by('-start_time')[:10]
     
-    # Get usage stats
-    sms_stats = number.sms_messages.aggregate(
-        total=Count('id'),
-        inbound=Count('id', filter=Q(direction='inbound')),
-        outbound=Count('id', filter=Q(direction='outbound')),
-    )
+    # Get usage stats (one row, kept current by signals). A number with no
+    # summary yet shows zeros; its first write or rebuild_number_usage fills it in
+    usage = PhoneNumberUsage.objects.filter(phone_number=number).first()
+    if usage is None:
+        usage = PhoneNumberUsage(phone_number=number, user=request.user)
     
-    call_stats = number.calls.aggregate(
-        total=Count('id'),
-        inbound=Count('id', filter=Q(direction='inbound')),
-        outbound=Count('id', filter=Q(direction='outbound')),
-        total_duration=Sum('duration'),
-    )
+    sms_stats = {
+        'total': usage.sms_count,
+        'inbound': usage.sms_inbound,
+        'outbound': usage.sms_outbound,
+    }
+    
+    call_stats = {
+        'total': usage.call_count,
+        'inbound': usage.calls_inbound,
+        'outbound': usage.calls_outbound,
+        'total_duration': usage.call_duration,
+    }
+    
+    # First page of the merged activity feed; api_number_timeline continues from timeline_cursor
+    timeline_entries, timeline_cursor = timeline.page(number, per_page=20)
     
     context = {
         'number': number,
         'recent_sms': recent_sms,
         'recent_calls': recent_calls,
+        'timeline': timeline_entries,
+        'timeline_cursor': timeline_cursor,
         'sms_stats': sms_stats,
         'call_stats': call_stats,
+        'total_spend': usage.spend,
     }
     
     return render(request, 'user_dashboard/number_detail.html', context)
 
+def _timeline_item(entry):
+    item = entry.item
+    data = {
+        'kind': entry.kind,
+        'id': str(item.pk),
+        'at': entry.at.isoformat(),
+        'direction': item.direction,
+        'status': item.status,
+        'price': str(item.price) if item.price is not None else None,
+    }
+    if entry.kind == 'sms':
+        data.update(sender=item.sender, receiver=item.receiver, body=item.body, segments=item.segments)
+    else:
+        data.update(from_number=item.from_number, to_number=item.to_number, duration=item.duration)
+    return data
+
+@login_required
+@require_http_methods(["GET"])
+def api_number_timeline(request, number_id):
+    """SMS and calls of a number in one newest-first feed, for infinite scroll"""
+    number = get_object_or_404(UserPhoneNumber, id=number_id, user=request.user)
+    
+    try:
+        limit = min(max(int(request.GET.get('limit', 50)), 1), 200)
+    except ValueError:
+        limit = 50
+    
+    entries, next_cursor = timeline.page(number, request.GET.get('cursor'), per_page=limit)
+    
+    return JsonResponse({
+        'success': True,
+        'data': {
+            'entries': [_timeline_item(entry) for entry in entries],
+            'next_cursor': next_cursor,
+        }
+    })
+
 @login_required
 def update_number_view(request, number_id):
     """Update number settings"""
@@ -414,16 +550,41 @@ def update_number_view(request, number_id):
 
 # ==================== SMS MANAGEMENT ====================
 
-@login_required
-def sms_inbox_view(request):
-    """SMS inbox view"""
-    # Get user's numbers
-    user_numbers = request.user.phone_numbers.filter(status='active')
+SMS_SEGMENT_PRICE = Decimal('0.01')
+
+TEMPLATE_FIELD_RE = re.compile(r'\{(\w+)\}')
+
+
+def _price_sms(body):
+    """Return (segments, cost) for an outbound SMS body"""
+    segments = (len(body) // 160) + 1
+    return segments, SMS_SEGMENT_PRICE * segments
+
+
+def _render_sms_template(template, variables):
+    """Fill {name} placeholders; raises KeyError for a missing variable"""
+    return TEMPLATE_FIELD_RE.sub(lambda match: str(variables[match.group(1)]), template)
+
+def _search_sms(sms_messages, search_query, user_id=None):
+    """Apply the inbox/outbox search box, returning the queryset and its page ordering"""
+    if not search_query:
+        return sms_messages, ('-created_at', '-pk')
     
-    # Get SMS messages
+    if search.is_phone_query(search_query):
+        # "Ends with" match on the reversed-digit indexes
+        sms_messages = sms_messages.filter(
+            suffix_q(['sender_rev', 'receiver_rev'], search_query)
+        )
+        return sms_messages, ('-created_at', '-pk')
+    
+    # Ranked full-text hits over the message body
+    return search.search_messages(sms_messages, search_query, user_id=user_id), ('-rank', '-pk')
+
+def _filter_sms(request, direction):
+    """Inbox/outbox filters, shared by the list views and the export: (queryset, ordering, filters)"""
     sms_messages = SMSMessage.objects.filter(
         user=request.user,
-        direction='inbound'
+        direction=direction
     ).order_by('-created_at')
     
     # Filter by number
@@ -438,26 +599,31 @@ def sms_inbox_view(request):
     
     # Search
     search_query = request.GET.get('search', '')
-    if search_query:
-        sms_messages = sms_messages.filter(
-            Q(body__icontains=search_query) |
-            Q(sender__icontains=search_query) |
-            Q(receiver__icontains=search_query)
-        )
+    sms_messages, ordering = _search_sms(sms_messages, search_query, user_id=request.user.pk)
+    
+    filters = {
+        'number': number_filter,
+        'status': status_filter,
+        'search': search_query,
+    }
+    return sms_messages, ordering, filters
+
+@login_required
+def sms_inbox_view(request):
+    """SMS inbox view"""
+    # Get user's numbers
+    user_numbers = request.user.phone_numbers.filter(status='active')
+    
+    # Get SMS messages
+    sms_messages, ordering, filters = _filter_sms(request, 'inbound')
     
     # Pagination
-    paginator = Paginator(sms_messages, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _cursor_page(request, sms_messages, 50, ordering=ordering)
     
     context = {
         'page_obj': page_obj,
         'user_numbers': user_numbers,
-        'filters': {
-            'number': number_filter,
-            'status': status_filter,
-            'search': search_query,
-        }
+        'filters': filters,
     }
     
     return render(request, 'user_dashboard/sms_inbox.html', context)
@@ -468,47 +634,66 @@ def sms_outbox_view(request):
     # Get user's numbers
     user_numbers = request.user.phone_numbers.filter(status='active')
     
-    # Get SMS messages
-    sms_messages = SMSMessage.objects.filter(
-        user=request.user,
-        direction='outbound'
-    ).order_by('-created_at')
-    
-    # Filters (same as inbox)
-    number_filter = request.GET.get('number', 'all')
-    status_filter = request.GET.get('status', 'all')
-    search_query = request.GET.get('search', '')
-    
-    if number_filter != 'all':
-        sms_messages = sms_messages.filter(phone_number_id=number_filter)
-    
-    if status_filter != 'all':
-        sms_messages = sms_messages.filter(status=status_filter)
-    
-    if search_query:
-        sms_messages = sms_messages.filter(
-            Q(body__icontains=search_query) |
-            Q(sender__icontains=search_query) |
-            Q(receiver__icontains=search_query)
-        )
+    # Get SMS messages (same filters as inbox)
+    sms_messages, ordering, filters = _filter_sms(request, 'outbound')
     
     # Pagination
-    paginator = Paginator(sms_messages, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _cursor_page(request, sms_messages, 50, ordering=ordering)
     
     context = {
         'page_obj': page_obj,
         'user_numbers': user_numbers,
-        'filters': {
-            'number': number_filter,
-            'status': status_filter,
-            'search': search_query,
-        }
+        'filters': filters,
     }
     
     return render(request, 'user_dashboard/sms_outbox.html', context)
 
+@login_required
+def sms_threads_view(request):
+    """SMS inbox grouped into conversations, most recently active first"""
+    user_numbers = request.user.phone_numbers.filter(status='active')
+
+    sms_threads = SMSThread.objects.filter(user=request.user).select_related('phone_number')
+    number_filter = request.GET.get('number')
+    if number_filter:
+        sms_threads = sms_threads.filter(phone_number_id=number_filter)
+
+    page_obj = _cursor_page(request, sms_threads, 50, ordering=('-last_message_at', '-pk'))
+
+    context = {
+        'page_obj': page_obj,
+        'user_numbers': user_numbers,
+        'filters': {'number': number_filter},
+    }
+
+    return render(request, 'user_dashboard/sms_threads.html', context)
+
+@login_required
+def sms_thread_view(request, thread_id):
+    """One conversation, newest messages first; opening it marks it read"""
+    thread = get_object_or_404(
+        SMSThread.objects.select_related('phone_number'), id=thread_id, user=request.user
+    )
+
+    page_obj = _cursor_page(request, thread.messages.all(), 50, ordering=('-created_at', '-pk'))
+    if thread.unread_count:
+        threads.mark_read(thread)
+
+    context = {
+        'thread': thread,
+        'page_obj': page_obj,
+    }
+
+    return render(request, 'user_dashboard/sms_thread.html', context)
+
+@login_required
+@require_http_methods(["GET"])
+def export_sms_view(request, direction):
+    """Download the filtered inbox or outbox as CSV or JSON Lines"""
+    sms_messages, ordering, _ = _filter_sms(request, direction)
+    filename = 'sms-inbox' if direction == 'inbound' else 'sms-outbox'
+    return _export(request, sms_messages.order_by(*ordering), exports.SMS_EXPORT_FIELDS, filename)
+
 @login_required
 def send_sms_view(request):
     """Send SMS view"""
@@ -536,65 +721,54 @@ def send_sms_view(request):
                 supports_sms=True
             )
             
-            # Check wallet balance (assume $0.01 per SMS segment)
-            segments = (len(message) // 160) + 1
-            sms_cost = Decimal('0.01') * segments
-            
-            wallet = request.user.wallet
-            if wallet.balance < sms_cost:
-                return JsonResponse({
-                    'success': False,
-                    'error': 'Insufficient balance'
-                })
+            # Price the message (assume $0.01 per SMS segment)
+            segments, sms_cost = _price_sms(message)
             
             # Generate Twilio SID
             twilio_sid = f"SM{uuid.uuid4().hex[:32].upper()}"
             
-            # Create SMS record
-            sms = SMSMessage.objects.create(
-                twilio_sid=twilio_sid,
-                user=request.user,
-                phone_number=phone_number,
-                sender=phone_number.phone_number,
-                receiver=to_number,
-                body=message,
-                direction='outbound',
-                status='queued',
-                segments=segments,
-                price=sms_cost,
-                created_at=timezone.now()
-            )
-            
-            # Create transaction
-            transaction = WalletTransaction.objects.create(
-                user=request.user,
-                tx_type='sms',
-                amount=sms_cost,
-                reference=f"SMS-{uuid.uuid4().hex[:8].upper()}",
-                status='success',
-                metadata={
-                    'sms_id': str(sms.id),
-                    'to_number': to_number,
-                    'segments': segments,
-                }
-            )
-            
-            # In production, this would call Twilio API
-            # For demo, simulate sending
-            import time
-            time.sleep(1)
-            
-            # Update SMS status
-            sms.status = 'sent'
-            sms.save()
+            with db_transaction.atomic():
+                # Queue SMS record; run_sms_dispatcher hands it to the carrier
+                sms = SMSMessage.objects.create(
+                    twilio_sid=twilio_sid,
+                    user=request.user,
+                    phone_number=phone_number,
+                    sender=phone_number.phone_number,
+                    receiver=to_number,
+                    body=message,
+                    direction='outbound',
+                    status='queued',
+                    segments=segments,
+                    price=sms_cost,
+                    created_at=timezone.now()
+                )
+                
+                # Charge the wallet
+                ledger.debit(
+                    request.user,
+                    sms_cost,
+                    'sms',
+                    reference=f"SMS-{uuid.uuid4().hex[:8].upper()}",
+                    metadata={
+                        'sms_id': str(sms.id),
+                        'to_number': to_number,
+                        'segments': segments,
+                    }
+                )
             
             return JsonResponse({
                 'success': True,
-                'message': 'SMS sent successfully',
+                'message': 'SMS queued for delivery',
                 'sms_id': str(sms.id),
+                'status': sms.status,
                 'cost': str(sms_cost),
             })
             
+        except ledger.InsufficientFunds:
+            return JsonResponse({
+                'success': False,
+                'error': 'Insufficient balance'
+            })
         except json.JSONDecodeError:
             return JsonResponse({
                 'success': False,
@@ -620,10 +794,8 @@ def send_sms_view(request):
 
 # ==================== CALL MANAGEMENT ====================
 
-@login_required
-def call_logs_view(request):
-    """Call logs view"""
-    # Get call logs
+def _filter_calls(request):
+    """Call log filters, shared by the list view and the export: (queryset, filters)"""
     call_logs = CallLog.objects.filter(user=request.user).order_by('-start_time')
     
     # Filter by number
@@ -644,32 +816,49 @@ def call_logs_view(request):
     # Search
     search_query = request.GET.get('search', '')
     if search_query:
-        call_logs = call_logs.filter(
-            Q(from_number__icontains=search_query) |
-            Q(to_number__icontains=search_query)
-        )
+        if search.is_phone_query(search_query):
+            call_logs = call_logs.filter(suffix_q(['from_rev', 'to_rev'], search_query))
+        else:
+            call_logs = call_logs.filter(
+                Q(from_number__icontains=search_query) |
+                Q(to_number__icontains=search_query)
+            )
+    
+    filters = {
+        'number': number_filter,
+        'direction': direction_filter,
+        'status': status_filter,
+        'search': search_query,
+    }
+    return call_logs, filters
+
+@login_required
+def call_logs_view(request):
+    """Call logs view"""
+    # Get call logs
+    call_logs, filters = _filter_calls(request)
     
     # Get user numbers for filter
     user_numbers = request.user.phone_numbers.filter(status='active')
     
     # Pagination
-    paginator = Paginator(call_logs, 50)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _cursor_page(request, call_logs, 50, ordering=('-start_time', '-pk'))
     
     context = {
         'page_obj': page_obj,
         'user_numbers': user_numbers,
-        'filters': {
-            'number': number_filter,
-            'direction': direction_filter,
-            'status': status_filter,
-            'search': search_query,
-        }
+        'filters': filters,
     }
     
     return render(request, 'user_dashboard/call_logs.html', context)
 
+@login_required
+@require_http_methods(["GET"])
+def export_calls_view(request):
+    """Download the filtered call logs as CSV or JSON Lines"""
+    call_logs, _ = _filter_calls(request)
+    return _export(request, call_logs.order_by('-start_time', '-pk'), exports.CALL_EXPORT_FIELDS, 'calls')
+
 # ==================== NOTIFICATIONS ====================
 
 @login_required
@@ -691,14 +880,14 @@ def notifications_view(request):
     
     # Mark all as read
     if request.GET.get('mark_all_read') == 'true':
-        notifications.update(is_read=True)
+        # Bulk update skips signals, so settle the counter by hand
+        marked = notifications.filter(is_read=False).update(is_read=True)
+        counters.adjust(request.user.pk, unread_notifications=-marked)
         messages.success(request, 'All notifications marked as read')
         return redirect('notifications')
     
     # Pagination
-    paginator = Paginator(notifications, 30)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _cursor_page(request, notifications, 30)
     
     context = {
         'page_obj': page_obj,
@@ -791,51 +980,15 @@ def analytics_view(request):
     else:
         days = 30
     
-    start_date = timezone.now() - timedelta(days=days)
-    
-    # SMS analytics
-    sms_data = SMSMessage.objects.filter(
-        user=user,
-        created_at__gte=start_date
-    ).annotate(
-        date=TruncDay('created_at')
-    ).values('date', 'direction').annotate(
-        count=Count('id'),
-        total_price=Sum('price')
-    ).order_by('date')
-    
-    # Call analytics
-    call_data = CallLog.objects.filter(
-        user=user,
-        start_time__gte=start_date
-    ).annotate(
-        date=TruncDay('start_time')
-    ).values('date', 'direction').annotate(
-        count=Count('id'),
-        total_duration=Sum('duration'),
-        total_price=Sum('price')
-    ).order_by('date')
-    
-    # Wallet analytics
-    wallet_data = WalletTransaction.objects.filter(
-        user=user,
-        created_at__gte=start_date
-    ).annotate(
-        date=TruncDay('created_at')
-    ).values('date', 'tx_type').annotate(
-        count=Count('id'),
-        total_amount=Sum('amount')
-    ).order_by('date')
-    
-    # Top numbers by usage
-    top_sms_numbers = user.phone_numbers.annotate(
-        sms_count=Count('sms_messages'),
-        call_count=Count('calls')
-    ).order_by('-sms_count')[:5]
-    
-    top_call_numbers = user.phone_numbers.annotate(
-        call_duration=Sum('calls__duration')
-    ).order_by('-call_duration')[:5]
+    # Per-day totals come from the UserDailyUsage rollup, bucketed in the user's timezone
+    series = rollups.daily_series(user, days)
+    sms_data = series['sms']
+    call_data = series['call']
+    wallet_data = series['wallet']
+    
+    # Top numbers by usage, off the per-number summary's (user, column) indexes
+    top_sms_numbers = rollups.top_numbers(user, 'sms_count')
+    top_call_numbers = rollups.top_numbers(user, 'call_duration')
     
     context = {
         'sms_data': list(sms_data),
@@ -860,14 +1013,15 @@ def api_dashboard_stats(request):
     # Get wallet
     wallet = user.wallet
     
-    # Get counts
+    # Get counts (one row, kept current by signals)
+    counter = counters.get_counter(user)
     stats = {
         'wallet_balance': float(wallet.balance),
-        'phone_numbers': user.phone_numbers.filter(status='active').count(),
-        'total_sms': user.sms_messages.count(),
-        'total_calls': user.calls.count(),
-        'unread_notifications': user.notifications.filter(is_read=False).count(),
-        'pending_transactions': user.transactions.filter(status='pending').count(),
+        'phone_numbers': counter.active_numbers,
+        'total_sms': counter.total_sms,
+        'total_calls': counter.total_calls,
+        'unread_notifications': counter.unread_notifications,
+        'pending_transactions': counter.pending_transactions,
     }
     
     return JsonResponse({'success': True, 'data': stats})
@@ -899,58 +1053,218 @@ def api_send_sms(request):
         )
         
         # Calculate cost
-        segments = (len(message) // 160) + 1
-        sms_cost = Decimal('0.01') * segments
+        segments, sms_cost = _price_sms(message)
         
-        # Check balance
-        wallet = request.user.wallet
-        if wallet.balance < sms_cost:
+        # Queue SMS record; run_sms_dispatcher hands it to the carrier
+        twilio_sid = f"SM{uuid.uuid4().hex[:32].upper()}"
+        with db_transaction.atomic():
+            sms = SMSMessage.objects.create(
+                twilio_sid=twilio_sid,
+                user=request.user,
+                phone_number=phone_number,
+                sender=phone_number.phone_number,
+                receiver=to_number,
+                body=message,
+                direction='outbound',
+                status='queued',
+                segments=segments,
+                price=sms_cost,
+                created_at=timezone.now()
+            )
+            
+            # Charge the wallet
+            ledger.debit(
+                request.user,
+                sms_cost,
+                'sms',
+                reference=f"SMS-{uuid.uuid4().hex[:8].upper()}",
+                metadata={
+                    'sms_id': str(sms.id),
+                    'to_number': to_number,
+                    'segments': segments,
+                }
+            )
+        
+        return JsonResponse({
+            'success': True,
+            'message': 'SMS queued for delivery',
+            'data': {
+                'sms_id': str(sms.id),
+                'message_sid': twilio_sid,
+                'status': sms.status,
+                'cost': float(sms_cost),
+                'segments': segments,
+            }
+        })
+        
+    except ledger.InsufficientFunds:
+        return JsonResponse({
+            'success': False,
+            'error': 'Insufficient balance'
+        })
+    except json.JSONDecodeError:
+        return JsonResponse({
+            'success': False,
+            'error': 'Invalid JSON'
+        })
+    except Exception as e:
+        return JsonResponse({
+            'success': False,
+            'error': str(e)
+        })
+
+@login_required
+@require_http_methods(["POST"])
+def api_send_bulk_sms(request):
+    """API endpoint to queue one message (or per-recipient templates) to many recipients"""
+    try:
+        data = json.loads(request.body)
+        
+        phone_number_id = data.get('phone_number_id')
+        template = data.get('message', '')
+        recipients = data.get('recipients')
+        # Bodies are only treated as templates when asked to or given variables,
+        # so a plain message may contain a literal "{x}"
+        render_all = bool(data.get('render_template'))
+        
+        if not phone_number_id or not isinstance(recipients, list) or not recipients:
             return JsonResponse({
                 'success': False,
-                'error': 'Insufficient balance'
+                'error': 'Missing required fields'
             })
         
-        # Create SMS record
-        twilio_sid = f"SM{uuid.uuid4().hex[:32].upper()}"
-        sms = SMSMessage.objects.create(
-            twilio_sid=twilio_sid,
+        max_recipients = getattr(settings, 'SMS_BULK_MAX_RECIPIENTS', 50000)
+        if len(recipients) > max_recipients:
+            return JsonResponse({
+                'success': False,
+                'error': f'At most {max_recipients} recipients per request'
+            })
+        
+        # Get phone number
+        phone_number = get_object_or_404(
+            UserPhoneNumber,
+            id=phone_number_id,
             user=request.user,
-            phone_number=phone_number,
-            sender=phone_number.phone_number,
-            receiver=to_number,
-            body=message,
-            direction='outbound',
-            status='sent',  # In production, would start as 'queued'
-            segments=segments,
-            price=sms_cost,
-            created_at=timezone.now()
+            status='active',
+            supports_sms=True
         )
         
-        # Create transaction
-        WalletTransaction.objects.create(
-            user=request.user,
-            tx_type='sms',
-            amount=sms_cost,
-            reference=f"SMS-{uuid.uuid4().hex[:8].upper()}",
-            status='success',
-            metadata={
-                'sms_id': str(sms.id),
-                'to_number': to_number,
+        # Validate and price every recipient in one pass
+        now = timezone.now()
+        results = []
+        messages_to_send = []
+        total_cost = Decimal('0.00')
+        seen = set()
+        
+        for recipient in recipients:
+            if isinstance(recipient, dict):
+                to_number = recipient.get('to', '')
+                body = recipient.get('body') or template
+                variables = recipient.get('variables') or {}
+            else:
+                to_number, body, variables = recipient, template, {}
+            
+            result = {'to': to_number, 'success': False}
+            results.append(result)
+            
+            to_e164 = normalize_e164(to_number)
+            if not to_e164:
+                result['error'] = 'Invalid phone number'
+                continue
+            if to_e164 in seen:
+                result['error'] = 'Duplicate recipient'
+                continue
+            seen.add(to_e164)
+            
+            if variables or render_all:
+                try:
+                    body = _render_sms_template(body, variables)
+                except KeyError as e:
+                    result['error'] = f'Missing template variable: {e.args[0]}'
+                    continue
+            
+            if not body:
+                result['error'] = 'Empty message'
+                continue
+            
+            segments, sms_cost = _price_sms(body)
+            total_cost += sms_cost
+            
+            sms = SMSMessage(
+                twilio_sid=f"SM{uuid.uuid4().hex[:32].upper()}",
+                user=request.user,
+                phone_number=phone_number,
+                sender=phone_number.phone_number,
+                receiver=to_number,
+                body=body,
+                direction='outbound',
+                status='queued',
+                segments=segments,
+                price=sms_cost,
+                created_at=now,
+                updated_at=now,
+            )
+            sms.fill_phone_columns()
+            messages_to_send.append(sms)
+            result.update({
+                'success': True,
+                'message_sid': sms.twilio_sid,
                 'segments': segments,
-            }
-        )
+                'cost': float(sms_cost),
+            })
+        
+        if not messages_to_send:
+            return JsonResponse({
+                'success': False,
+                'error': 'No valid recipients',
+                'data': {'results': results}
+            })
+        
+        chunk_size = getattr(settings, 'SMS_BULK_CHUNK_SIZE', 1000)
+        
+        with db_transaction.atomic():
+            threads.assign(messages_to_send)
+            SMSMessage.objects.bulk_create(messages_to_send, batch_size=chunk_size)
+            rows_bulk_created.send(sender=SMSMessage, instances=messages_to_send)
+            
+            # Single balance update for the whole campaign, one ledger row per message
+            ledger.debit_many(request.user, [
+                WalletTransaction(
+                    tx_type='sms',
+                    amount=sms.price,
+                    reference=f"SMS-{uuid.uuid4().hex[:12].upper()}",
+                    metadata={
+                        'sms_id': str(sms.id) if sms.id else None,
+                        'message_sid': sms.twilio_sid,
+                        'to_number': sms.receiver,
+                        'segments': sms.segments,
+                        'bulk': True,
+                    }
+                )
+                for sms in messages_to_send
+            ], batch_size=chunk_size)
+        
+        sms_ids = {sms.twilio_sid: sms.id for sms in messages_to_send}
+        for result in results:
+            if result['success'] and sms_ids.get(result['message_sid']):
+                result['sms_id'] = str(sms_ids[result['message_sid']])
         
         return JsonResponse({
             'success': True,
-            'message': 'SMS sent successfully',
+            'message': f'{len(messages_to_send)} SMS queued for delivery',
             'data': {
-                'sms_id': str(sms.id),
-                'message_sid': twilio_sid,
-                'cost': float(sms_cost),
-                'segments': segments,
+                'queued': len(messages_to_send),
+                'rejected': len(results) - len(messages_to_send),
+                'total_cost': float(total_cost),
+                'results': results,
             }
         })
         
+    except ledger.InsufficientFunds:
+        return JsonResponse({
+            'success': False,
+            'error': 'Insufficient balance'
+        })
     except json.JSONDecodeError:
         return JsonResponse({
             'success': False,
@@ -969,35 +1283,13 @@ def api_send_sms(request):
 def twilio_sms_webhook(request):
     """Handle Twilio SMS webhooks"""
     try:
-        # Log the webhook
+        # Log the webhook; in queue mode the ingestion workers apply it
         event_sid = request.POST.get('MessageSid', f"WEBHOOK-{uuid.uuid4().hex[:16]}")
+        webhook_log = webhooks.log_event(webhooks.SMS_STATUS, event_sid, request.POST)
         
-        webhook_log = TwilioWebhookLog.objects.create(
-            event_sid=event_sid,
-            event_type='sms_status_update',
-            account_sid=request.POST.get('AccountSid'),
-            payload=dict(request.POST)
-        )
-        
-        # Process SMS status update
-        message_sid = request.POST.get('MessageSid')
-        message_status = request.POST.get('MessageStatus')
-        
-        if message_sid and message_status:
-            try:
-                sms = SMSMessage.objects.get(twilio_sid=message_sid)
-                sms.status = message_status.lower()
-                sms.save()
-                
-                # Mark webhook as processed
-                webhook_log.processed = True
-                webhook_log.save()
-                
-                return HttpResponse(status=200)
-                
-            except SMSMessage.DoesNotExist:
-                webhook_log.processing_error = f"SMS not found: {message_sid}"
-                webhook_log.save()
+        # None: a retry of a callback already applied
+        if webhook_log is not None and webhooks.ingestion_mode() != 'queue':
+            webhooks.apply_now(webhook_log)
         
         return HttpResponse(status=200)
         
@@ -1009,59 +1301,14 @@ def twilio_sms_webhook(request):
 def twilio_inbound_sms_webhook(request):
     """Handle inbound SMS from Twilio"""
     try:
-        # Log webhook
         event_sid = request.POST.get('MessageSid', f"INBOUND-{uuid.uuid4().hex[:16]}")
+        webhook_log = webhooks.log_event(webhooks.INBOUND_SMS, event_sid, request.POST)
         
-        webhook_log = TwilioWebhookLog.objects.create(
-            event_sid=event_sid,
-            event_type='inbound_sms',
-            account_sid=request.POST.get('AccountSid'),
-            payload=dict(request.POST)
-        )
-        
-        # Extract data
-        from_number = request.POST.get('From')
-        to_number = request.POST.get('To')
-        body = request.POST.get('Body')
-        message_sid = request.POST.get('MessageSid')
+        # None: a retry of a callback already applied
+        if webhook_log is not None and webhooks.ingestion_mode() != 'queue':
+            webhooks.apply_now(webhook_log)
         
-        # Find the phone number
-        try:
-            phone_number = UserPhoneNumber.objects.get(phone_number=to_number)
-            user = phone_number.user
-            
-            # Create inbound SMS record
-            sms = SMSMessage.objects.create(
-                twilio_sid=message_sid,
-                user=user,
-                phone_number=phone_number,
-                sender=from_number,
-                receiver=to_number,
-                body=body,
-                direction='inbound',
-                status='received',
-                segments=1,
-                created_at=timezone.now()
-            )
-            
-            # Create notification
-            Notification.objects.create(
-                user=user,
-                notification_type='sms',
-                title='New SMS Received',
-                message=f'From {from_number}: {body[:50]}...',
-                action_url=f'/dashboard/sms/{sms.id}/'
-            )
-            
-            webhook_log.processed = True
-            webhook_log.save()
-            
-            return HttpResponse(status=200)
-            
-        except UserPhoneNumber.DoesNotExist:
-            webhook_log.processing_error = f"Phone number not found: {to_number}"
-            webhook_log.save()
-            return HttpResponse(status=200)
+        return HttpResponse(status=200)
         
     except Exception as e:
         return HttpResponse(status=500)
@@ -1072,36 +1319,85 @@ def twilio_voice_webhook(request):
     """Handle Twilio voice webhooks"""
     try:
         event_sid = request.POST.get('CallSid', f"VOICE-{uuid.uuid4().hex[:16]}")
+        webhook_log = webhooks.log_event(webhooks.VOICE_STATUS, event_sid, request.POST)
         
-        webhook_log = TwilioWebhookLog.objects.create(
-            event_sid=event_sid,
-            event_type='voice_status_update',
-            account_sid=request.POST.get('AccountSid'),
-            payload=dict(request.POST)
-        )
+        # None: a retry of a callback already applied
+        if webhook_log is not None and webhooks.ingestion_mode() != 'queue':
+            webhooks.apply_now(webhook_log)
         
-        # Process call status
-        call_sid = request.POST.get('CallSid')
-        call_status = request.POST.get('CallStatus')
+        return HttpResponse(status=200)
         
-        if call_sid and call_status:
-            try:
-                call = CallLog.objects.get(twilio_sid=call_sid)
-                call.status = call_status.lower()
-                call.save()
-                
-                webhook_log.processed = True
-                webhook_log.save()
-                
-            except CallLog.DoesNotExist:
-                webhook_log.processing_error = f"Call not found: {call_sid}"
-                webhook_log.save()
+    except Exception as e:
+        return HttpResponse(status=500)
+
+# Async counterparts for ASGI deployments: the log is written through the
+# async ORM and applied by the same process() as the sync views
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def twilio_sms_webhook_async(request):
+    """Handle Twilio SMS webhooks (async)"""
+    try:
+        event_sid = request.POST.get('MessageSid', f"WEBHOOK-{uuid.uuid4().hex[:16]}")
+        webhook_log = await webhooks.alog_event(webhooks.SMS_STATUS, event_sid, request.POST)
+        
+        if webhook_log is not None and webhooks.ingestion_mode() != 'queue':
+            await webhooks.aapply_now(webhook_log)
+        
+        return HttpResponse(status=200)
+        
+    except Exception as e:
+        return HttpResponse(status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def twilio_inbound_sms_webhook_async(request):
+    """Handle inbound SMS from Twilio (async)"""
+    try:
+        event_sid = request.POST.get('MessageSid', f"INBOUND-{uuid.uuid4().hex[:16]}")
+        webhook_log = await webhooks.alog_event(webhooks.INBOUND_SMS, event_sid, request.POST)
+        
+        if webhook_log is not None and webhooks.ingestion_mode() != 'queue':
+            await webhooks.aapply_now(webhook_log)
+        
+        return HttpResponse(status=200)
+        
+    except Exception as e:
+        return HttpResponse(status=500)
+
+@csrf_exempt
+@require_http_methods(["POST"])
+async def twilio_voice_webhook_async(request):
+    """Handle Twilio voice webhooks (async)"""
+    try:
+        event_sid = request.POST.get('CallSid', f"VOICE-{uuid.uuid4().hex[:16]}")
+        webhook_log = await webhooks.alog_event(webhooks.VOICE_STATUS, event_sid, request.POST)
+        
+        if webhook_log is not None and webhooks.ingestion_mode() != 'queue':
+            await webhooks.aapply_now(webhook_log)
         
         return HttpResponse(status=200)
         
     except Exception as e:
         return HttpResponse(status=500)
 
+@login_required
+@require_http_methods(["GET"])
+def api_admin_metrics(request):
+    """Runtime metrics of this process's in-memory subsystems, and those published by workers"""
+    if not request.user.is_staff:
+        return JsonResponse({'success': False, 'error': 'Forbidden'}, status=403)
+    
+    data = {
+        'inbound_routing': router.stats(),
+        'inventory_refresh': worker_metrics.published('inventory_refresh'),
+        'webhook_dedup': webhooks.recent_events.stats(),
+        'webhook_coalescing': webhooks.status_coalescer.stats(),
+        'webhook_replay': worker_metrics.published('webhook_replay'),
+    }
+    
+    return JsonResponse({'success': True, 'data': data})
+
 # ==================== UTILITY VIEWS ====================
 
 @login_required
@@ -1162,16 +1458,16 @@ def admin_dashboard_view(request):
     if not request.user.is_staff:
         return redirect('dashboard')
     
-    # Admin stats
-    stats = {
-        'total_users': User.objects.count(),
-        'active_users': User.objects.filter(is_active=True).count(),
-        'total_numbers': UserPhoneNumber.objects.count(),
-        'total_sms': SMSMessage.objects.count(),
-        'total_calls': CallLog.objects.count(),
-        'total_revenue': WalletTransaction.objects.filter(
-            tx_type__in=['purchase', 'sms', 'mms', 'call', 'renewal']
-        ).aggregate(total=Sum('amount'))['total'] or Decimal('0.00'),
+    # Running totals and daily trends come from the platform stats tables
+    stats = platform_stats.totals()
+    days = request.GET.get('days', '30')
+    trend = platform_stats.daily(min(int(days), 365) if days.isdigit() and int(days) else 30)
+    trend_chart = {
+        'labels': [point['date'].isoformat() for point in trend],
+        'signups': [point['signups'] for point in trend],
+        'sms': [point['sms_inbound'] + point['sms_outbound'] for point in trend],
+        'calls': [point['calls_inbound'] + point['calls_outbound'] for point in trend],
+        'revenue': [point['revenue'] for point in trend],
     }
     
     # Recent signups
@@ -1182,6 +1478,8 @@ def admin_dashboard_view(request):
     
     context = {
         'stats': stats,
+        'trend': trend,
+        'trend_chart': trend_chart,  # for {{ trend_chart|json_script:"trend-data" }}
         'recent_signups': recent_signups,
         'recent_transactions': recent_transactions,
     }
@@ -1244,9 +1542,7 @@ def admin_transactions_view(request):
         transactions = transactions.filter(status=status_filter)
     
     # Pagination
-    paginator = Paginator(transactions, 100)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    page_obj = _cursor_page(request, transactions, 100)
     
     context = {
         'page_obj': page_obj,
@@ -0,0 +1,595 @@
+# webhooks.py
+import logging
+import threading
+import uuid
+from collections import OrderedDict, defaultdict
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import IntegrityError, close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import CallLog, Notification, SMSMessage, TwilioWebhookLog
+from .routing import router
+from .dispatch_signals import rows_bulk_created
+from . import retention, statuses, threads
+
+logger = logging.getLogger(__name__)
+
+SMS_STATUS = 'sms_status_update'
+INBOUND_SMS = 'inbound_sms'
+VOICE_STATUS = 'voice_status_update'
+
+
+def ingestion_mode():
+    """'sync' applies a callback inside the request; 'queue' only logs it for the workers"""
+    return getattr(settings, 'WEBHOOK_INGESTION', 'sync')
+
+
+def field(payload, key, default=None):
+    """One value of a logged payload (older rows hold every value as a list)"""
+    value = payload.get(key, default)
+    if isinstance(value, list):
+        return value[0] if value else default
+    return value
+
+
+# The payload field whose value is part of an event's identity
+STATUS_FIELDS = {
+    SMS_STATUS: 'MessageStatus',
+    VOICE_STATUS: 'CallStatus',
+}
+
+
+class RecentEvents:
+    """
+    Bounded LRU of recently applied (event_sid, event_type, status) keys,
+    so a carrier retry is dropped without a database round trip. A key is
+    only remembered once its log has been applied, so a retry of a
+    callback that failed gets through. The unique constraint on
+    TwilioWebhookLog catches what this misses (evicted keys, other processes).
+    """
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._keys = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(
+            ['accepted', 'memory_duplicates', 'database_duplicates', 'reapplied'], 0
+        )
+
+    def seen(self, key):
+        with self._lock:
+            if key in self._keys:
+                self._keys.move_to_end(key)
+                self._stats['memory_duplicates'] += 1
+                return True
+            return False
+
+    def remember(self, key):
+        with self._lock:
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            while len(self._keys) > self.max_entries:
+                self._keys.popitem(last=False)
+
+    def count(self, stat):
+        with self._lock:
+            self._stats[stat] += 1
+
+    def clear(self):
+        with self._lock:
+            self._keys.clear()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['size'] = len(self._keys)
+        duplicates = stats['memory_duplicates'] + stats['database_duplicates']
+        total = stats['accepted'] + duplicates
+        stats['duplicate_rate'] = duplicates / total if total else 0.0
+        return stats
+
+
+recent_events = RecentEvents(getattr(settings, 'WEBHOOK_DEDUP_MAX_ENTRIES', 100000))
+
+
+def _event_key(event_type, event_sid, post):
+    status_field = STATUS_FIELDS.get(event_type)
+    status = (post.get(status_field) or '').lower()[:20] if status_field else ''
+    return (event_sid, event_type, status)
+
+
+def _log_key(log):
+    return (log.event_sid, log.event_type, log.status)
+
+
+def _logged(key):
+    return TwilioWebhookLog.objects.filter(event_sid=key[0], event_type=key[1], status=key[2])
+
+
+def _duplicate(key, existing):
+    """
+    What a retry of an already logged event returns: None once that log
+    was applied, else the log itself so the caller applies it again
+    (e.g. the first request failed before, or while, applying it).
+    """
+    recent_events.count('database_duplicates')
+    if existing is None or existing.processed:
+        recent_events.remember(key)
+        return None
+    recent_events.count('reapplied')
+    return existing
+
+
+def log_event(event_type, event_sid, post):
+    """
+    Log a callback and return the log to apply, or None if this exact
+    event (same SID, type and reported status) was already applied and
+    this is a carrier retry.
+    """
+    key = _event_key(event_type, event_sid, post)
+    if recent_events.seen(key):
+        return None
+
+    try:
+        with transaction.atomic():
+            log = TwilioWebhookLog.objects.create(
+                event_sid=event_sid,
+                event_type=event_type,
+                status=key[2],
+                account_sid=post.get('AccountSid'),
+                payload=retention.compact_payload(post),
+            )
+    except IntegrityError:
+        return _duplicate(key, _logged(key).first())
+
+    recent_events.count('accepted')
+    return log
+
+
+# ==================== BATCH APPLY ====================
+
+def _status_targets(model, logs, sid_field, status_field):
+    """{sid: [logs]} and {sid: furthest status reported in those logs}"""
+    pending = defaultdict(list)
+    for log in logs:
+        if field(log.payload, sid_field) and field(log.payload, status_field):
+            pending[field(log.payload, sid_field)].append(log)
+    targets = {
+        sid: statuses.furthest(model, [field(log.payload, status_field).lower() for log in sid_logs])
+        for sid, sid_logs in pending.items()
+    }
+    return pending, targets
+
+
+def _apply_sms_status(logs, errors):
+    """Move each MessageSid to the furthest status reported, one conditional UPDATE per status"""
+    pending, targets = _status_targets(SMSMessage, logs, 'MessageSid', 'MessageStatus')
+    found = set(SMSMessage.objects.filter(twilio_sid__in=list(pending)).values_list('twilio_sid', flat=True))
+    for sid, sid_logs in pending.items():
+        if sid not in found:
+            for log in sid_logs:
+                errors[log.pk] = f"SMS not found: {sid}"
+
+    statuses.advance_many(SMSMessage, {
+        sid: status for sid, status in targets.items() if sid in found and status is not None
+    })
+
+
+def _apply_voice_status(logs, errors):
+    """
+    Move each CallSid to the furthest status reported; first callbacks of
+    routed inbound calls create the CallLog
+    """
+    pending, targets = _status_targets(CallLog, logs, 'CallSid', 'CallStatus')
+    found = set(CallLog.objects.filter(twilio_sid__in=list(pending)).values_list('twilio_sid', flat=True))
+    created = []
+    for sid, sid_logs in pending.items():
+        if sid in found:
+            continue
+
+        payload = sid_logs[-1].payload
+        route = None
+        if field(payload, 'Direction') == 'inbound':
+            route = router.resolve(field(payload, 'To'))
+        if route is None:
+            for log in sid_logs:
+                errors[log.pk] = f"Call not found: {sid}"
+            continue
+
+        call = CallLog(
+            twilio_sid=sid,
+            user_id=route.user_id,
+            phone_number_id=route.number_id,
+            from_number=field(payload, 'From', ''),
+            to_number=field(payload, 'To', ''),
+            direction='inbound',
+            status=targets[sid] or field(payload, 'CallStatus').lower(),
+            start_time=sid_logs[0].received_at,
+        )
+        call.fill_phone_columns()
+        created.append(call)
+
+    statuses.advance_many(CallLog, {
+        sid: status for sid, status in targets.items() if sid in found and status is not None
+    })
+    if created:
+        CallLog.objects.bulk_create(created, batch_size=500)
+        rows_bulk_created.send(sender=CallLog, instances=created)
+
+
+def _inbound_message(log, route):
+    """The unsaved SMSMessage for a routed inbound_sms log"""
+    payload = log.payload
+    return SMSMessage(
+        twilio_sid=field(payload, 'MessageSid'),
+        user_id=route.user_id,
+        phone_number_id=route.number_id,
+        sender=field(payload, 'From', ''),
+        receiver=field(payload, 'To'),
+        body=field(payload, 'Body', ''),
+        direction='inbound',
+        status='received',
+        segments=1,
+        created_at=log.received_at,
+    )
+
+
+def _inbound_notification(message):
+    """The unsaved Notification telling the owner about a stored inbound message"""
+    return Notification(
+        user_id=message.user_id,
+        notification_type='sms',
+        title='New SMS Received',
+        message=f'From {message.sender}: {message.body[:50]}...',
+        action_url=f'/dashboard/sms/{message.pk}/',
+    )
+
+
+def _apply_inbound_sms(logs, errors):
+    """Store routed inbound messages and their notifications with one bulk_create each"""
+    sids = {field(log.payload, 'MessageSid') for log in logs}
+    stored = set(SMSMessage.objects.filter(twilio_sid__in=sids).values_list('twilio_sid', flat=True))
+
+    messages = []
+    for log in logs:
+        payload = log.payload
+        sid, to_number = field(payload, 'MessageSid'), field(payload, 'To')
+        if not sid:
+            errors[log.pk] = "Missing MessageSid"
+            continue
+        if sid in stored:
+            continue
+        route = router.resolve(to_number)
+        if route is None:
+            errors[log.pk] = f"Phone number not found: {to_number}"
+            continue
+
+        message = _inbound_message(log, route)
+        message.fill_phone_columns()
+        messages.append(message)
+        stored.add(sid)
+
+    if not messages:
+        return
+    threads.assign(messages)
+    SMSMessage.objects.bulk_create(messages, batch_size=500)
+    if any(message.pk is None for message in messages):
+        # Backends without RETURNING leave bulk-created pks unset
+        pks = dict(SMSMessage.objects.filter(
+            twilio_sid__in=[message.twilio_sid for message in messages]
+        ).values_list('twilio_sid', 'pk'))
+        for message in messages:
+            message.pk = pks[message.twilio_sid]
+    rows_bulk_created.send(sender=SMSMessage, instances=messages)
+
+    notifications = [_inbound_notification(message) for message in messages]
+    Notification.objects.bulk_create(notifications, batch_size=500)
+    rows_bulk_created.send(sender=Notification, instances=notifications)
+
+
+APPLIERS = {
+    INBOUND_SMS: _apply_inbound_sms,
+    SMS_STATUS: _apply_sms_status,
+    VOICE_STATUS: _apply_voice_status,
+}
+
+
+def process(logs):
+    """
+    Apply logged callbacks in one transaction: inbound messages first,
+    then status changes, each kind with set-based writes. Logs that went
+    through are marked processed with one UPDATE; the rest keep their
+    processing_error. Returns (processed, failed).
+    """
+    logs = sorted(logs, key=lambda log: log.received_at)
+    by_type = defaultdict(list)
+    errors = {}
+    for log in logs:
+        if log.event_type in APPLIERS:
+            by_type[log.event_type].append(log)
+        else:
+            errors[log.pk] = f"Unknown event type: {log.event_type}"
+
+    with transaction.atomic():
+        for event_type, apply in APPLIERS.items():
+            if by_type[event_type]:
+                apply(by_type[event_type], errors)
+
+        done = [log for log in logs if log.pk not in errors]
+        failed = [log for log in logs if log.pk in errors]
+        TwilioWebhookLog.objects.filter(pk__in=[log.pk for log in done]).update(
+            processed=True, processing_error=None
+        )
+        for log in done:
+            log.processed = True
+            log.processing_error = None
+        # Failed logs are released to the replayer
+        for log in failed:
+            log.processing_error = errors[log.pk]
+            log.claimed_at = log.claim_token = None
+        TwilioWebhookLog.objects.bulk_update(
+            failed, ['processing_error', 'claimed_at', 'claim_token'], batch_size=500
+        )
+
+    # Committed: retries of these can now be dropped without a query
+    for log in done:
+        recent_events.remember(_log_key(log))
+    return len(done), len(failed)
+
+
+# ==================== STATUS COALESCING ====================
+
+class StatusCoalescer:
+    """
+    Holds status callbacks for `window` seconds and applies them together,
+    so a burst of callbacks for one SID (queued, sent, delivered...) costs
+    one write. Logs still pending when a process dies stay unprocessed
+    and unclaimed, so the ingestion workers pick them up.
+    """
+
+    def __init__(self, window):
+        self.window = window
+        self._pending = []
+        self._timer = None
+        self._lock = threading.Lock()
+        self._stats = dict.fromkeys(['callbacks', 'flushes'], 0)
+
+    def add(self, log):
+        with self._lock:
+            self._pending.append(log)
+            self._stats['callbacks'] += 1
+            if self._timer is None:
+                self._timer = threading.Timer(self.window, self._flush_in_thread)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            logs, self._pending = self._pending, []
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        if logs:
+            process(logs)
+            with self._lock:
+                self._stats['flushes'] += 1
+
+    def _flush_in_thread(self):
+        try:
+            self.flush()
+        except Exception:
+            logger.exception('Coalesced status flush failed')
+        finally:
+            connections.close_all()
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats, pending=len(self._pending), window=self.window)
+        stats['callbacks_per_flush'] = stats['callbacks'] / stats['flushes'] if stats['flushes'] else 0.0
+        return stats
+
+
+status_coalescer = StatusCoalescer(getattr(settings, 'WEBHOOK_COALESCE_WINDOW', 0))
+
+
+def apply_now(log):
+    """Apply a callback logged in 'sync' mode, through the coalescing window if one is set"""
+    if status_coalescer.window and log.event_type in STATUS_FIELDS:
+        status_coalescer.add(log)
+    else:
+        process([log])
+
+
+# ==================== ASYNC (ASGI) PATH ====================
+
+async def alog_event(event_type, event_sid, post):
+    """log_event() through the async ORM"""
+    key = _event_key(event_type, event_sid, post)
+    if recent_events.seen(key):
+        return None
+
+    try:
+        log = await TwilioWebhookLog.objects.acreate(
+            event_sid=event_sid,
+            event_type=event_type,
+            status=key[2],
+            account_sid=post.get('AccountSid'),
+            payload=retention.compact_payload(post),
+        )
+    except IntegrityError:
+        return _duplicate(key, await _logged(key).afirst())
+
+    recent_events.count('accepted')
+    return log
+
+
+async def _aapply_sms_status(log):
+    payload = log.payload
+    sid, status = field(payload, 'MessageSid'), field(payload, 'MessageStatus')
+    if not sid or not status:
+        return None
+    if await statuses.aadvance(SMSMessage, [sid], status.lower()):
+        return None
+    # Nothing moved: either already at or past this status, or not stored
+    if await SMSMessage.objects.filter(twilio_sid=sid).aexists():
+        return None
+    return f"SMS not found: {sid}"
+
+
+async def _aapply_voice_status(log):
+    payload = log.payload
+    sid, status = field(payload, 'CallSid'), field(payload, 'CallStatus')
+    if not sid or not status:
+        return None
+    if await CallLog.objects.filter(twilio_sid=sid).aexists():
+        await statuses.aadvance(CallLog, [sid], status.lower())
+        return None
+
+    # First callback of a routed inbound call creates the CallLog
+    route = None
+    if field(payload, 'Direction') == 'inbound':
+        route = await sync_to_async(router.resolve)(field(payload, 'To'))
+    if route is None:
+        return f"Call not found: {sid}"
+
+    await CallLog.objects.acreate(
+        twilio_sid=sid,
+        user_id=route.user_id,
+        phone_number_id=route.number_id,
+        from_number=field(payload, 'From', ''),
+        to_number=field(payload, 'To', ''),
+        direction='inbound',
+        status=status.lower(),
+        start_time=log.received_at,
+    )
+    return None
+
+
+@sync_to_async
+def _store_inbound_sms(log, route):
+    """Write an inbound message and its notification in one transaction"""
+    with transaction.atomic():
+        message = _inbound_message(log, route)
+        message.save()
+        _inbound_notification(message).save()
+
+
+async def _aapply_inbound_sms(log):
+    sid, to_number = field(log.payload, 'MessageSid'), field(log.payload, 'To')
+    if not sid:
+        return "Missing MessageSid"
+    if await SMSMessage.objects.filter(twilio_sid=sid).aexists():
+        return None
+    route = await sync_to_async(router.resolve)(to_number)
+    if route is None:
+        return f"Phone number not found: {to_number}"
+    await _store_inbound_sms(log, route)
+    return None
+
+
+ASYNC_APPLIERS = {
+    INBOUND_SMS: _aapply_inbound_sms,
+    SMS_STATUS: _aapply_sms_status,
+    VOICE_STATUS: _aapply_voice_status,
+}
+
+
+async def aapply_now(log):
+    """
+    apply_now() for async views: one callback through the async ORM, so
+    concurrent requests are not queued behind a single batch apply.
+    Stores the same rows as process() does.
+    """
+    if status_coalescer.window and log.event_type in STATUS_FIELDS:
+        status_coalescer.add(log)
+        return
+
+    apply = ASYNC_APPLIERS.get(log.event_type)
+    error = await apply(log) if apply else f"Unknown event type: {log.event_type}"
+    logs = TwilioWebhookLog.objects.filter(pk=log.pk)
+    if error:
+        log.processing_error = error
+        await logs.aupdate(processing_error=error, claimed_at=None, claim_token=None)
+        return
+    log.processed, log.processing_error = True, None
+    await logs.aupdate(processed=True, processing_error=None)
+    recent_events.remember(_log_key(log))
+
+
+# ==================== QUEUE WORKERS ====================
+
+def ingest_queue():
+    """Logged callbacks nobody has claimed or applied yet"""
+    return TwilioWebhookLog.objects.filter(
+        processed=False, processing_error__isnull=True, claimed_at__isnull=True
+    )
+
+
+def claim_batch(batch_size):
+    """
+    Claim up to `batch_size` queued logs under a fresh token and return
+    them, oldest first; concurrent workers claim disjoint batches the same
+    way dispatch.claim_batch does for outbound SMS.
+    """
+    claim = dict(claimed_at=timezone.now(), claim_token=uuid.uuid4())
+    queue = ingest_queue().order_by('received_at')
+
+    if connections['default'].features.has_select_for_update_skip_locked:
+        with transaction.atomic():
+            ids = list(queue.select_for_update(skip_locked=True).values_list('pk', flat=True)[:batch_size])
+            TwilioWebhookLog.objects.filter(pk__in=ids).update(**claim)
+    else:
+        ids = list(queue.values_list('pk', flat=True)[:batch_size])
+        # One conditional UPDATE; only rows still unclaimed are taken
+        TwilioWebhookLog.objects.filter(pk__in=ids, claimed_at__isnull=True).update(**claim)
+
+    return list(TwilioWebhookLog.objects.filter(pk__in=ids, claim_token=claim['claim_token']))
+
+
+def requeue_stale(older_than=300):
+    """
+    Release logs claimed by an ingestion worker or replayer that died
+    before applying them: untried ones go back on the ingest queue,
+    failed ones back to the replayer
+    """
+    cutoff = timezone.now() - timedelta(seconds=older_than)
+    return TwilioWebhookLog.objects.filter(
+        processed=False, claimed_at__lt=cutoff
+    ).update(claimed_at=None, claim_token=None)
+
+
+class IngestWorker(threading.Thread):
+    """One ingestion thread: claim a batch of logged callbacks, apply it, repeat"""
+
+    def __init__(self, stop_event, batch_size=500, poll_interval=0.5, once=False):
+        super().__init__(daemon=True)
+        self.stop_event = stop_event
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.once = once
+        self.processed = 0
+        self.failed = 0
+
+    def run(self):
+        try:
+            while not self.stop_event.is_set():
+                close_old_connections()
+                try:
+                    logs = claim_batch(self.batch_size)
+                    processed, failed = process(logs) if logs else (0, 0)
+                except Exception:
+                    logger.exception('Webhook batch failed')
+                    processed = failed = 0
+                    self.stop_event.wait(self.poll_interval)
+                self.processed += processed
+                self.failed += failed
+
+                if not processed and not failed:
+                    if self.once:
+                        break
+                    self.stop_event.wait(self.poll_interval)
+        finally:
+            connections.close_all()
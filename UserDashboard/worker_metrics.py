@@ -0,0 +1,42 @@
+# worker_metrics.py
+import logging
+import time
+
+from django.db import DatabaseError
+
+from .models import WorkerMetrics
+
+logger = logging.getLogger(__name__)
+
+
+def publish(name, stats):
+    """Store a worker's metrics snapshot; a failed write is logged, never raised"""
+    try:
+        WorkerMetrics.objects.update_or_create(name=name, defaults={'stats': stats})
+    except DatabaseError:
+        logger.exception('Could not publish %s metrics', name)
+
+
+def published(name):
+    """The last snapshot a worker published (with its published_at), or None"""
+    row = WorkerMetrics.objects.filter(name=name).values('stats', 'updated_at').first()
+    if row is None:
+        return None
+    return {**row['stats'], 'published_at': row['updated_at'].isoformat()}
+
+
+class Publisher:
+    """Publishes a metrics object's snapshot under `name`, at most every `interval` seconds unless forced"""
+
+    def __init__(self, name, metrics, interval=1.0):
+        self.name = name
+        self.metrics = metrics
+        self.interval = interval
+        self._last = None
+
+    def __call__(self, force=False):
+        now = time.monotonic()
+        if not force and self._last is not None and now - self._last < self.interval:
+            return
+        self._last = now
+        publish(self.name, self.metrics.snapshot())
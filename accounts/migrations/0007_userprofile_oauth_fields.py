@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-17 02:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0006_alter_activationtoken_clean_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='google_auth',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='google_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='google_picture',
+            field=models.URLField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='microsoft_auth',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='userprofile',
+            name='microsoft_id',
+            field=models.CharField(blank=True, max_length=100, null=True),
+        ),
+    ]
@@ -93,6 +93,12 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        'OPTIONS': {
+            # Take the write lock at BEGIN and wait for it, rather than failing
+            # with "database is locked" when concurrent transactions upgrade
+            'transaction_mode': 'IMMEDIATE',
+            'timeout': 20,
+        },
     }
 }
 
@@ -149,6 +155,11 @@ LOGIN_URL = '/login/'
 # Activation settings
 ACTIVATION_EXPIRE_DAYS = 7
 
+# Wallet funding: entries stay pending until the payment gateway settles them.
+# True credits every funding request at once, with no payment taken; only for
+# demos that have no gateway.
+WALLET_AUTO_APPROVE_FUNDING = False
+
 
 # Session settings
 SESSION_COOKIE_AGE = 1209600  # 2 weeks in seconds